@@ -0,0 +1,209 @@
+from typing import Iterator, List, Sequence, Tuple, Union
+import math
+
+import numpy as np
+import torch
+from torch.utils.data import Sampler
+
+
+class LengthBucketBatchSampler(Sampler):
+    def __init__(
+        self,
+        lengths: Sequence[int],
+        batch_size: int,
+        shuffle: bool = True,
+        drop_last: bool = False,
+        bucket_size_multiplier: int = 100,
+        generator: torch.Generator = None,
+    ):
+        """Batch sampler that groups samples with similar lengths in the same
+        batch. Thus, when the batch is padded to its longest sample (see
+        ``PadCollate``), the padding is small.
+
+        If ``shuffle`` is True, the samples are shuffled and split into
+        buckets of ``batch_size * bucket_size_multiplier`` samples. Inside
+        each bucket, the samples are sorted by length and split into batches.
+        Finally, the order of all batches is shuffled. If ``shuffle`` is
+        False, all samples are sorted by length and split into batches.
+
+        Parameters
+        ----------
+        lengths : Sequence[int]
+            The length (number of time steps) of each sample of the dataset
+        batch_size : int
+            The number of samples in each batch
+        shuffle : bool, optional
+            If True, shuffle the samples (and batches) at every epoch
+        drop_last : bool, optional
+            If True, drop the last batch of each bucket if it is smaller than
+            ``batch_size``.
+        bucket_size_multiplier : int, optional
+            The size of the buckets, in number of batches. Larger buckets give
+            batches with more similar lengths, but less randomness.
+        generator : torch.Generator, optional
+            Generator used to shuffle the samples and batches
+
+        Examples
+        --------
+        >>> dataset = SeriesFolderCSVDataset("train_folder", label="class")
+        >>> sampler = LengthBucketBatchSampler(
+                dataset.sample_lengths, batch_size=32
+            )
+        >>> loader = DataLoader(
+                dataset, batch_sampler=sampler, collate_fn=PadCollate()
+            )
+        >>> data, labels, lengths = next(iter(loader))
+        """
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.bucket_size_multiplier = bucket_size_multiplier
+        self.generator = generator
+
+    def _split(self, indices: np.ndarray) -> List[List[int]]:
+        """Sort the indices by length and split them into batches."""
+        indices = indices[np.argsort(self.lengths[indices], kind="stable")]
+        batches = [
+            indices[i : i + self.batch_size].tolist()
+            for i in range(0, len(indices), self.batch_size)
+        ]
+        if self.drop_last and batches and len(batches[-1]) < self.batch_size:
+            batches = batches[:-1]
+        return batches
+
+    def __iter__(self) -> Iterator[List[int]]:
+        if not self.shuffle:
+            yield from self._split(np.arange(len(self.lengths)))
+            return
+
+        permutation = torch.randperm(
+            len(self.lengths), generator=self.generator
+        ).numpy()
+        bucket_size = self.batch_size * self.bucket_size_multiplier
+        batches = []
+        for i in range(0, len(permutation), bucket_size):
+            batches.extend(self._split(permutation[i : i + bucket_size]))
+
+        for i in torch.randperm(len(batches), generator=self.generator):
+            yield batches[i]
+
+    def __len__(self) -> int:
+        if not self.drop_last:
+            return math.ceil(len(self.lengths) / self.batch_size)
+        if not self.shuffle:
+            return len(self.lengths) // self.batch_size
+        # Each bucket drops its last incomplete batch
+        bucket_size = self.batch_size * self.bucket_size_multiplier
+        num_full_buckets, remainder = divmod(len(self.lengths), bucket_size)
+        return (
+            num_full_buckets * self.bucket_size_multiplier
+            + remainder // self.batch_size
+        )
+
+
+class PadCollate:
+    def __init__(
+        self,
+        padding: str = "zeros",
+        label_pad_value: Union[int, float] = -100,
+    ):
+        """Collate function for samples with different lengths. Each sample
+        is padded (along its last axis) to the length of the longest sample of
+        the batch, not of the dataset. The lengths of the samples are also
+        returned, as a tensor of shape (B, ).
+
+        Samples may be arrays of shape (C, T) or 2-element tuples with the data
+        and the label. If the label has one value per time step (i.e., one of
+        its axes has size T, as in ``SeriesFolderCSVDataset``), it is padded
+        along that axis with ``label_pad_value``. Else, the labels are just
+        stacked.
+
+        The batch returned is ``(data, lengths)`` or
+        ``(data, labels, lengths)``, where data has shape (B, C, T_max).
+
+        Parameters
+        ----------
+        padding : str, optional
+            How to pad the data. It could be "zeros" (pad with zeros) or
+            "cyclic" (repeat the sample until the length is reached, as done
+            with ``pad=True`` in ``SeriesFolderCSVDataset``).
+        label_pad_value : Union[int, float], optional
+            Value used to pad the labels. The default value is the
+            ``ignore_index`` of ``torch.nn.CrossEntropyLoss``.
+        """
+        assert padding in ["zeros", "cyclic"], f"Invalid padding: {padding}"
+        self.padding = padding
+        self.label_pad_value = label_pad_value
+
+    def _pad(
+        self,
+        x: np.ndarray,
+        length: int,
+        axis: int = -1,
+        pad_value: Union[int, float] = 0,
+        cyclic: bool = False,
+    ) -> np.ndarray:
+        """Pad ``x`` along ``axis`` to ``length``."""
+        x = np.asarray(x)
+        missing = length - x.shape[axis]
+        if missing == 0:
+            return x
+        if cyclic:
+            repetitions = [1] * x.ndim
+            repetitions[axis] = length // x.shape[axis] + 1
+            return np.take(np.tile(x, repetitions), range(length), axis=axis)
+        pad_width = [(0, 0)] * x.ndim
+        pad_width[axis] = (0, missing)
+        return np.pad(x, pad_width, constant_values=pad_value)
+
+    def _time_axis(self, label: np.ndarray, length: int) -> int:
+        """Return the axis of the label with one value per time step, or
+        None, if there is no such axis."""
+        label = np.asarray(label)
+        if label.ndim == 0:
+            return None
+        if label.shape[-1] == length:
+            return label.ndim - 1
+        if label.shape[0] == length:
+            return 0
+        return None
+
+    def __call__(
+        self,
+        batch: List[Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]],
+    ) -> Tuple[torch.Tensor, ...]:
+        has_labels = isinstance(batch[0], (tuple, list))
+        datas = [sample[0] if has_labels else sample for sample in batch]
+        lengths = [np.shape(data)[-1] for data in datas]
+        max_length = max(lengths)
+
+        data = torch.as_tensor(
+            np.stack(
+                [
+                    self._pad(
+                        d, max_length, cyclic=self.padding == "cyclic"
+                    )
+                    for d in datas
+                ]
+            )
+        )
+        lengths = torch.as_tensor(lengths, dtype=torch.long)
+
+        if not has_labels:
+            return data, lengths
+
+        labels = []
+        for (_, label), length in zip(batch, lengths.tolist()):
+            axis = self._time_axis(label, length)
+            if axis is not None:
+                label = self._pad(
+                    label,
+                    max_length,
+                    axis=axis,
+                    pad_value=self.label_pad_value,
+                    cyclic=self.padding == "cyclic",
+                )
+            labels.append(np.asarray(label))
+        labels = torch.as_tensor(np.stack(labels))
+        return data, labels, lengths
@@ -4,3 +4,4 @@ from .har import (
     TNCHARDataModule,
     TFCDataModule
 )
+from .features import FrozenBackboneDataModule
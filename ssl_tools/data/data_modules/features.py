@@ -0,0 +1,335 @@
+from pathlib import Path
+from typing import Any, Dict
+import os
+import shutil
+
+import lightning as L
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+from ssl_tools.utils.cache import cache_key, temporary_path
+from ssl_tools.utils.embeddings import (
+    EmbeddingShardWriter,
+    compute_embeddings,
+    load_embeddings,
+    module_fingerprint,
+    write_embeddings,
+)
+from ssl_tools.utils.types import PathLike
+
+
+# Attributes of a data module that do not change the samples of its splits
+_LOADER_ATTRIBUTES = {
+    "datasets",
+    "trainer",
+    "batch_size",
+    "num_workers",
+    "pin_memory",
+    "persistent_workers",
+    "prefetch_factor",
+    "read_workers",
+    "read_backend",
+    "shared_memory",
+    "stationarity_workers",
+    "prepare_data_per_node",
+    "allow_zero_length_dataloader_with_multiple_devices",
+}
+
+# Suffixes of the files of a data directory that hold the data
+_DATA_SUFFIXES = {".csv", ".npy", ".npz"}
+
+
+def _describe(value: Any, depth: int = 0) -> Any:
+    """A JSON-serializable description of a value (e.g., an option or a
+    transform of a data module). Objects are described by their class and
+    their public attributes, up to a few levels of nesting.
+
+    Parameters
+    ----------
+    value : Any
+        The value
+    depth : int, optional
+        The nesting level of the value
+
+    Returns
+    -------
+    Any
+        The description
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (Path, np.dtype, torch.dtype)):
+        return str(value)
+    if depth >= 4:
+        return type(value).__qualname__
+    if isinstance(value, (list, tuple)):
+        return [_describe(v, depth + 1) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _describe(v, depth + 1) for k, v in value.items()}
+    if isinstance(value, (np.ndarray, torch.Tensor)):
+        return f"{type(value).__qualname__}{tuple(value.shape)}"
+    # Functions and classes
+    if hasattr(value, "__qualname__"):
+        return f"{value.__module__}.{value.__qualname__}"
+    name = f"{type(value).__module__}.{type(value).__qualname__}"
+    attributes = {
+        k: _describe(v, depth + 1)
+        for k, v in getattr(value, "__dict__", {}).items()
+        if not k.startswith("_")
+    }
+    return {"class": name, **attributes}
+
+
+def data_module_fingerprint(data_module: L.LightningDataModule) -> dict:
+    """Describe the data of a data module: its class, the options that change
+    the samples (e.g., data path, features, transforms, padding and casting;
+    loader options are ignored) and the name, size and modification time of
+    the data files (``.csv``, ``.npy`` and ``.npz``) in its ``data_path`` (if
+    any). Hidden files and directories (e.g., the length index of
+    ``SeriesFolderCSVDataset``) and caches are ignored. It is used to detect
+    when cached representations were computed from other data.
+
+    Parameters
+    ----------
+    data_module : L.LightningDataModule
+        The data module
+
+    Returns
+    -------
+    dict
+        A JSON-serializable description of the data.
+    """
+    options = {
+        k: v
+        for k, v in vars(data_module).items()
+        if not k.startswith("_") and k not in _LOADER_ATTRIBUTES
+    }
+    description = _describe(options)
+    description["class"] = (
+        f"{type(data_module).__module__}.{type(data_module).__qualname__}"
+    )
+
+    data_path = getattr(data_module, "data_path", None)
+    if data_path is not None and Path(data_path).exists():
+        data_path = Path(data_path).resolve()
+        # Caches stored inside the data directory are not part of the data
+        cache_dirs = [
+            Path(v).resolve()
+            for k, v in options.items()
+            if k.endswith("cache_dir") and v is not None
+        ]
+        files = []
+        paths = [data_path] if data_path.is_file() else data_path.rglob("*")
+        for f in sorted(paths):
+            relative = f.relative_to(data_path.parent)
+            hidden = [
+                part
+                for part in f.relative_to(data_path).parts
+                if part.startswith(".")
+            ]
+            if (
+                f.suffix not in _DATA_SUFFIXES
+                or hidden
+                or any(d in f.parents for d in cache_dirs)
+                or not f.is_file()
+            ):
+                continue
+            stat = os.stat(f)
+            files.append([str(relative), stat.st_size, stat.st_mtime_ns])
+        description["files"] = files
+    return description
+
+
+class FrozenBackboneDataModule(L.LightningDataModule):
+    def __init__(
+        self,
+        data_module: L.LightningDataModule,
+        backbone: torch.nn.Module,
+        cache_dir: PathLike = None,
+        batch_size: int = None,
+    ):
+        """Data module with the representations of a frozen backbone,
+        instead of the raw data. The representations of each split of
+        ``data_module`` are computed once (in ``setup``), with a single pass
+        of the backbone over the split, and kept in memory. The batches are
+        2-element tuples with the representations and the labels, thus the
+        head could be trained directly on them (see ``precomputed_features``
+        of ``SSLDiscriminator``), without running the backbone at every
+        epoch.
+
+        The representations are computed in the device of the trainer, if
+        the data module is attached to one, else in the CPU. The transforms of
+        ``data_module`` are applied only once, when the representations are
+        computed, thus random augmentations are not repeated over epochs.
+
+        Parameters
+        ----------
+        data_module : L.LightningDataModule
+            The data module with the raw data. It must have a ``datasets``
+            dictionary (filled by ``setup``) and a
+            ``_get_loader(split_name, shuffle)`` method, as the data modules
+            of ``ssl_tools.data.data_modules``.
+        backbone : torch.nn.Module
+            The frozen backbone. Its ``forward`` must return the
+            representations of a batch.
+        cache_dir : PathLike, optional
+            If not None, the representations are also stored in this
+            directory (see ``EmbeddingShardWriter``), in a subdirectory for
+            each state of the backbone, each data of ``data_module`` (see
+            ``data_module_fingerprint``) and each split. Thus, they are reused
+            by the next runs with the same backbone weights and data. In
+            distributed runs, only the first process writes them, and the
+            other processes wait for it.
+        batch_size : int, optional
+            The batch size of the loaders of the representations. If None,
+            the batch size of ``data_module`` is used.
+        """
+        super().__init__()
+        self.data_module = data_module
+        self.backbone = backbone
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.batch_size = batch_size or data_module.batch_size
+        self.datasets: Dict[str, TensorDataset] = {}
+
+    def _get_device(self) -> torch.device:
+        """The device where the backbone is executed."""
+        trainer = getattr(self, "trainer", None)
+        if trainer is not None:
+            return trainer.strategy.root_device
+        return torch.device("cpu")
+
+    def _write_cache(
+        self,
+        path: Path,
+        metadata: dict,
+        loader: DataLoader,
+        device: torch.device,
+    ):
+        """Write the representations of a split to the cache, if it does not
+        have them yet. They are written to a temporary directory, which then
+        replaces ``path``, thus readers never see a partial cache entry.
+
+        Parameters
+        ----------
+        path : Path
+            The directory of the cache entry
+        metadata : dict
+            The metadata of the cache entry (see ``EmbeddingShardWriter``)
+        loader : DataLoader
+            The loader of the split
+        device : torch.device
+            The device where the backbone is executed
+        """
+        if EmbeddingShardWriter(path, metadata=metadata).complete:
+            return
+        tmp_path = temporary_path(path)
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        writer = EmbeddingShardWriter(tmp_path, metadata=metadata)
+        write_embeddings(self.backbone, loader, writer, device=device)
+        writer.close()
+        # Partial results (of an interrupted run) are discarded
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    def _compute_features(self, split_name: str) -> TensorDataset:
+        """Compute (or load from the cache) the representations and labels of
+        a split of the underlying data module.
+
+        Parameters
+        ----------
+        split_name : str
+            The name of the split
+
+        Returns
+        -------
+        TensorDataset
+            A dataset with the representations and the labels of the split.
+        """
+        loader = self.data_module._get_loader(split_name, shuffle=False)
+        device = self._get_device()
+
+        if self.cache_dir is None:
+            features, labels = compute_embeddings(
+                self.backbone, loader, device=device
+            )
+        else:
+            data = data_module_fingerprint(self.data_module)
+            path = (
+                self.cache_dir
+                / module_fingerprint(self.backbone)
+                / cache_key(data)
+                / split_name
+            )
+            metadata = {
+                "split": split_name,
+                "num_samples": len(self.data_module.datasets[split_name]),
+                "data_module": data,
+            }
+            trainer = getattr(self, "trainer", None)
+            if trainer is None or trainer.is_global_zero:
+                self._write_cache(path, metadata, loader, device)
+            # The other processes wait for the cache written by the first one
+            if trainer is not None:
+                trainer.strategy.barrier("frozen_backbone_features")
+            features, labels = load_embeddings(path, mmap_mode=None)
+
+        return TensorDataset(
+            torch.from_numpy(features), torch.from_numpy(labels)
+        )
+
+    def setup(self, stage: str):
+        """Compute the representations of the splits of the given stage.
+        ``self.datasets`` will be a dictionary with the split name as key and
+        a dataset with the representations and labels as value.
+
+        Parameters
+        ----------
+        stage : str
+            The stage of the setup ("fit", "test" or "predict")
+        """
+        self.data_module.setup(stage)
+        for split_name in self.data_module.datasets:
+            if split_name not in self.datasets:
+                self.datasets[split_name] = self._compute_features(split_name)
+
+    def _get_loader(self, split_name: str, shuffle: bool) -> DataLoader:
+        """Get a dataloader for the given split.
+
+        Parameters
+        ----------
+        split_name : str
+            The name of the split. This must be one of: "train", "validation",
+            "test" or "predict".
+        shuffle : bool
+            Shuffle the data or not.
+
+        Returns
+        -------
+        DataLoader
+            A dataloader for the given split.
+        """
+        # The features are in memory, thus no workers are needed
+        return DataLoader(
+            self.datasets[split_name],
+            batch_size=self.batch_size,
+            shuffle=shuffle,
+        )
+
+    def train_dataloader(self) -> DataLoader:
+        return self._get_loader("train", shuffle=True)
+
+    def val_dataloader(self) -> DataLoader:
+        return self._get_loader("validation", shuffle=False)
+
+    def test_dataloader(self) -> DataLoader:
+        return self._get_loader("test", shuffle=False)
+
+    def predict_dataloader(self) -> DataLoader:
+        return self._get_loader("predict", shuffle=False)
+
+    def __str__(self):
+        return f"FrozenBackboneDataModule(data_module={self.data_module}, batch_size={self.batch_size})"
+
+    def __repr__(self) -> str:
+        return str(self)
@@ -1,19 +1,24 @@
 from ssl_tools.data.datasets import (
     MultiModalSeriesCSVDataset,
     SeriesFolderCSVDataset,
+    SeriesNumpyDataset,
     TNCDataset,
     TFCDataset,
 )
 
+import torch
 from torch.utils.data import DataLoader
 from typing import Callable, Dict, Iterable, Union, List
+from ssl_tools.data.batching import LengthBucketBatchSampler, PadCollate
 
 from pathlib import Path
 from ssl_tools.transforms.time_1d import AddGaussianNoise
 from ssl_tools.transforms.signal_1d import AddRemoveFrequency
 
 import os
+from ssl_tools.utils.cache import cache_key
 from ssl_tools.utils.types import PathLike
+from ssl_tools.utils.rng import seed_worker
 
 import lightning as L
 
@@ -80,6 +85,61 @@ def parse_num_workers(num_workers: int) -> int:
     return num_workers if num_workers is not None else os.cpu_count()
 
 
+def build_dataloader(
+    dataset,
+    num_workers: int = 0,
+    pin_memory: bool = None,
+    persistent_workers: bool = True,
+    prefetch_factor: int = None,
+    **kwargs,
+) -> DataLoader:
+    """Create a ``DataLoader`` with the loader options shared by the data
+    modules. Worker processes are reseeded with ``seed_worker``.
+
+    Parameters
+    ----------
+    dataset : Dataset
+        The dataset
+    num_workers : int, optional
+        Number of workers to load data. If 0, data is loaded in the main
+        process.
+    pin_memory : bool, optional
+        If True, batches are copied to page-locked memory, which speeds up
+        the copies to the GPU. If None, it is True only if CUDA is available.
+    persistent_workers : bool, optional
+        If True, the workers are kept alive between epochs, instead of being
+        created (and copying the dataset) at the start of every epoch. Only
+        used if ``num_workers`` is greater than 0. Note that the workers are
+        then reseeded only once, thus random transforms continue their
+        random streams in the next epochs.
+    prefetch_factor : int, optional
+        Number of batches loaded in advance by each worker. If None, the
+        default of ``DataLoader`` is used. Only used if ``num_workers`` is
+        greater than 0.
+    **kwargs
+        Other arguments of ``DataLoader`` (e.g., ``batch_size``,
+        ``shuffle``, ``batch_sampler`` or ``collate_fn``)
+
+    Returns
+    -------
+    DataLoader
+        The dataloader.
+    """
+    if pin_memory is None:
+        pin_memory = torch.cuda.is_available()
+    if num_workers > 0:
+        kwargs["persistent_workers"] = persistent_workers
+        if prefetch_factor is not None:
+            kwargs["prefetch_factor"] = prefetch_factor
+    return DataLoader(
+        dataset,
+        num_workers=num_workers,
+        pin_memory=pin_memory,
+        worker_init_fn=seed_worker,
+        **kwargs,
+    )
+
+
 class UserActivityFolderDataModule(L.LightningDataModule):
     def __init__(
         self,
@@ -97,9 +157,19 @@ class UserActivityFolderDataModule(L.LightningDataModule):
         pad: bool = False,
         transforms: Union[List[Callable], Dict[str, List[Callable]]] = None,
         cast_to: str = "float32",
+        data_format: str = "csv",
+        read_workers: int = 1,
+        read_backend: str = "thread",
+        csv_engine: str = "c",
+        shared_memory: bool = False,
+        cache_dir: PathLike = None,
         # Loader params
         batch_size: int = 1,
         num_workers: int = None,
+        bucket_batching: bool = False,
+        pin_memory: bool = None,
+        persistent_workers: bool = True,
+        prefetch_factor: int = None,
     ):
         """Define the dataloaders for train, validation and test splits for
         HAR datasets. The data must be in the following folder structure:
@@ -146,6 +216,10 @@ class UserActivityFolderDataModule(L.LightningDataModule):
         The dataset will return a 2-element tuple with the data and the label,
         if the ``label`` parameter is specified, otherwise return only the data.
 
+        If ``data_format`` is "npy", the data of each split is read from a
+        single ``.npy`` file (``x_<split>.npy``) with shape (N, C, T), using a
+        ``SeriesNumpyDataset``, which memory-maps the file. In this case,
+        if ``label`` is specified, the labels are read from ``y_<split>.npy``.
 
         Parameters
         ----------
@@ -153,7 +227,8 @@ class UserActivityFolderDataModule(L.LightningDataModule):
             The location of the directory with CSV files.
         features: List[str]
             A list with column names that will be used as features. If None,
-            all columns except the label will be used as features.
+            all columns except the label will be used as features. Not used
+            if ``data_format`` is "npy".
         pad: bool, optional
             If True, the data will be padded to the length of the longest
             sample. Note that padding will be applyied after the transforms,
@@ -170,12 +245,68 @@ class UserActivityFolderDataModule(L.LightningDataModule):
                 one of: "train", "validation", "test" or "predict".
         cast_to: str, optional
             Cast the numpy data to the specified type
+        data_format: str, optional
+            The format of the data. It could be "csv" (a folder with a CSV
+            file per sample, for each split) or "npy" (a ``.npy`` file per
+            split).
+        read_workers: int, optional
+            Maximum number of workers used to read the CSV files of a split
+            (``SeriesFolderCSVDataset``). If None, use all cores.
+        read_backend: str, optional
+            The pool of workers used to read the CSV files. It could be
+            "thread" or "process".
+        csv_engine: str, optional
+            The engine used to parse the CSV files: "c" or "pyarrow"
+            (requires the optional pyarrow package). See
+            ``SeriesFolderCSVDataset``.
+        shared_memory: bool, optional
+            If True, the samples of each split are packed into shared memory,
+            thus they are not copied by each worker of the dataloaders (see
+            ``SeriesFolderCSVDataset``). Only used if ``data_format`` is
+            "csv".
+        cache_dir: PathLike, optional
+            Directory used to cache the samples of each split as ``.npy``
+            files, which are memory-mapped in further loads (see
+            ``SeriesFolderCSVDataset``). If None, no cache is used. Only used
+            if ``data_format`` is "csv".
         batch_size : int, optional
             The size of the batch
         num_workers : int, optional
             Number of workers to load data. If None, then use all cores
+        bucket_batching : bool, optional
+            If True, samples with similar lengths are grouped in the same
+            batch (``LengthBucketBatchSampler``) and each batch is padded to
+            its longest sample (``PadCollate``), instead of the longest sample
+            of the dataset. Batches will be ``(data, lengths)`` (or
+            ``(data, labels, lengths)``, if ``label`` is specified), where
+            ``lengths`` is a tensor with the original length of each sample.
+            It can not be used with ``pad``, and the datasets must have a
+            ``sample_lengths`` attribute.
+        pin_memory : bool, optional
+            If True, the batches are copied to page-locked memory, which
+            speeds up the copies to the GPU. If None, it is True only if CUDA
+            is available.
+        persistent_workers : bool, optional
+            If True, the workers of each dataloader are kept alive between
+            epochs, instead of being created (and copying the dataset) at the
+            start of every epoch. Only used if ``num_workers`` is greater
+            than 0.
+        prefetch_factor : int, optional
+            Number of batches loaded in advance by each worker. If None, the
+            default of ``DataLoader`` is used (2).
         """
         super().__init__()
+        assert data_format in [
+            "csv",
+            "npy",
+        ], f"Invalid data_format: {data_format}"
+        if bucket_batching and pad:
+            raise ValueError(
+                "bucket_batching can not be used with pad=True: every sample "
+                + "would already be padded to the longest sample of the "
+                + "dataset, thus the bucketing and the per-batch padding "
+                + "would have no effect"
+            )
 
         # ---- Dataset Parameters ----
         # Allowing multiple datasets
@@ -184,17 +315,30 @@ class UserActivityFolderDataModule(L.LightningDataModule):
         self.label = label
         self.pad = pad
         self.transforms = parse_transforms(transforms)
+        self.data_format = data_format
+        self.read_workers = read_workers
+        self.read_backend = read_backend
+        self.csv_engine = csv_engine
+        self.shared_memory = shared_memory
+        self.cache_dir = cache_dir
 
         # ---- Loader Parameters ----
         self.batch_size = batch_size
         self.num_workers = parse_num_workers(num_workers)
         self.cast_to = cast_to
+        self.bucket_batching = bucket_batching
+        self.pin_memory = pin_memory
+        self.persistent_workers = persistent_workers
+        self.prefetch_factor = prefetch_factor
 
         # ---- Class specific ----
         self.datasets = {}
 
-    def _load_dataset(self, split_name: str) -> SeriesFolderCSVDataset:
-        """Create a ``SeriesFolderCSVDataset`` dataset with the given split.
+    def _load_dataset(
+        self, split_name: str
+    ) -> Union[SeriesFolderCSVDataset, SeriesNumpyDataset]:
+        """Create a ``SeriesFolderCSVDataset`` (or a ``SeriesNumpyDataset``,
+        if ``data_format`` is "npy") dataset with the given split.
 
         Parameters
         ----------
@@ -204,7 +348,7 @@ class UserActivityFolderDataModule(L.LightningDataModule):
 
         Returns
         -------
-        SeriesFolderCSVDataset
+        Union[SeriesFolderCSVDataset, SeriesNumpyDataset]
             The dataset with the given split.
         """
         assert split_name in [
@@ -217,6 +361,18 @@ class UserActivityFolderDataModule(L.LightningDataModule):
         if split_name == "predict":
             split_name = "test"
 
+        if self.data_format == "npy":
+            return SeriesNumpyDataset(
+                self.data_path / f"x_{split_name}.npy",
+                label_path=(
+                    self.data_path / f"y_{split_name}.npy"
+                    if self.label is not None
+                    else None
+                ),
+                transforms=self.transforms[split_name],
+                cast_to=self.cast_to,
+            )
+
         return SeriesFolderCSVDataset(
             self.data_path / split_name,
             features=self.features,
@@ -224,6 +380,11 @@ class UserActivityFolderDataModule(L.LightningDataModule):
             pad=self.pad,
             transforms=self.transforms[split_name],
             cast_to=self.cast_to,
+            read_workers=self.read_workers,
+            read_backend=self.read_backend,
+            csv_engine=self.csv_engine,
+            shared_memory=self.shared_memory,
+            cache_dir=self.cache_dir,
         )
 
     def setup(self, stage: str):
@@ -242,7 +403,9 @@ class UserActivityFolderDataModule(L.LightningDataModule):
         Raises
         ------
         ValueError
-            If the stage is not one of: "fit", "test" or "predict"
+            If the stage is not one of: "fit", "test" or "predict", or if
+            ``bucket_batching`` is True and a dataset does not expose the
+            length of its samples (``sample_lengths``)
         """
         if stage == "fit":
             self.datasets["train"] = self._load_dataset("train")
@@ -254,6 +417,16 @@ class UserActivityFolderDataModule(L.LightningDataModule):
         else:
             raise ValueError(f"Invalid setup stage: {stage}")
 
+        if self.bucket_batching:
+            for split_name, dataset in self.datasets.items():
+                if not hasattr(dataset, "sample_lengths"):
+                    raise ValueError(
+                        "bucket_batching requires datasets with a "
+                        + "sample_lengths attribute, but the "
+                        + f"{split_name} dataset "
+                        + f"({type(dataset).__name__}) does not have it"
+                    )
+
     def _get_loader(
         self, split_name: str, shuffle: bool
     ) -> DataLoader:
@@ -272,12 +445,31 @@ class UserActivityFolderDataModule(L.LightningDataModule):
         DataLoader
             A dataloader for the given split.
         """
-        return DataLoader(
+        if self.bucket_batching:
+            dataset = self.datasets[split_name]
+            sampler = LengthBucketBatchSampler(
+                dataset.sample_lengths,
+                batch_size=self.batch_size,
+                shuffle=shuffle,
+            )
+            return build_dataloader(
+                dataset,
+                batch_sampler=sampler,
+                collate_fn=PadCollate(),
+                num_workers=self.num_workers,
+                pin_memory=self.pin_memory,
+                persistent_workers=self.persistent_workers,
+                prefetch_factor=self.prefetch_factor,
+            )
+
+        return build_dataloader(
             self.datasets[split_name],
             batch_size=self.batch_size,
-            num_workers=self.num_workers,
             shuffle=shuffle,
-            pin_memory=True,
+            num_workers=self.num_workers,
+            pin_memory=self.pin_memory,
+            persistent_workers=self.persistent_workers,
+            prefetch_factor=self.prefetch_factor,
         )
 
     def train_dataloader(self) -> DataLoader:
@@ -317,11 +509,24 @@ class TNCHARDataModule(UserActivityFolderDataModule):
         batch_size: int = 1,
         num_workers: int = None,
         cast_to: str = "float32",
+        data_format: str = "csv",
+        read_workers: int = 1,
+        read_backend: str = "thread",
+        csv_engine: str = "c",
+        shared_memory: bool = False,
+        cache_dir: PathLike = None,
         # TNC parameters
         window_size: int = 60,
         mc_sample_size: int = 20,
         significance_level: float = 0.01,
         repeat: int = 1,
+        precompute_stationarity: bool = False,
+        stationarity_bucket_size: int = None,
+        stationarity_cache_dir: PathLike = None,
+        stationarity_workers: int = None,
+        pin_memory: bool = None,
+        persistent_workers: bool = True,
+        prefetch_factor: int = None,
     ):
         """Define the dataloaders for train, validation and test splits for
         TNC datasets. The data must be in the following folder structure:
@@ -392,6 +597,30 @@ class TNCHARDataModule(UserActivityFolderDataModule):
                 one of: "train", "validation", "test" or "predict".
         cast_to: str, optional
             Cast the numpy data to the specified type
+        data_format: str, optional
+            The format of the data. It could be "csv" (a folder with a CSV
+            file per sample, for each split) or "npy" (a ``.npy`` file per
+            split, memory-mapped using ``SeriesNumpyDataset``).
+        read_workers: int, optional
+            Maximum number of workers used to read the CSV files of a split
+            (``SeriesFolderCSVDataset``). If None, use all cores.
+        read_backend: str, optional
+            The pool of workers used to read the CSV files. It could be
+            "thread" or "process".
+        csv_engine: str, optional
+            The engine used to parse the CSV files: "c" or "pyarrow"
+            (requires the optional pyarrow package). See
+            ``SeriesFolderCSVDataset``.
+        shared_memory: bool, optional
+            If True, the samples of each split are packed into shared memory,
+            thus they are not copied by each worker of the dataloaders (see
+            ``SeriesFolderCSVDataset``). Only used if ``data_format`` is
+            "csv".
+        cache_dir: PathLike, optional
+            Directory used to cache the samples of each split as ``.npy``
+            files, which are memory-mapped in further loads (see
+            ``SeriesFolderCSVDataset``). If None, no cache is used. Only used
+            if ``data_format`` is "csv".
         batch_size : int, optional
             The size of the batch
         num_workers : int, optional
@@ -408,6 +637,32 @@ class TNCHARDataModule(UserActivityFolderDataModule):
             default 0.01
         repeat : int, optional
             Simple repeat the element of the dataset ``repeat`` times,
+        precompute_stationarity : bool, optional
+            If True, the ADF tests are run once, when each split is loaded,
+            and only looked up when sampling (see ``TNCDataset``).
+        stationarity_bucket_size : int, optional
+            The number of time steps that share the same precomputed ADF
+            result. If None, the ``window_size`` is used.
+        stationarity_cache_dir : PathLike, optional
+            Directory where the precomputed ADF results of each split are
+            persisted (``<split_name>-<hash>.stationarity.npz``, where the hash
+            identifies the data of the split). If None, they are not
+            persisted.
+        stationarity_workers : int, optional
+            Number of processes used to precompute the ADF results. If None,
+            use all cores.
+        pin_memory : bool, optional
+            If True, the batches are copied to page-locked memory, which
+            speeds up the copies to the GPU. If None, it is True only if CUDA
+            is available.
+        persistent_workers : bool, optional
+            If True, the workers of each dataloader are kept alive between
+            epochs, instead of being created (and copying the dataset) at the
+            start of every epoch. Only used if ``num_workers`` is greater
+            than 0.
+        prefetch_factor : int, optional
+            Number of batches loaded in advance by each worker. If None, the
+            default of ``DataLoader`` is used (2).
         """
         super().__init__(
             data_path,
@@ -418,12 +673,72 @@ class TNCHARDataModule(UserActivityFolderDataModule):
             batch_size=batch_size,
             num_workers=num_workers,
             cast_to=cast_to,
+            data_format=data_format,
+            read_workers=read_workers,
+            read_backend=read_backend,
+            csv_engine=csv_engine,
+            shared_memory=shared_memory,
+            cache_dir=cache_dir,
+            pin_memory=pin_memory,
+            persistent_workers=persistent_workers,
+            prefetch_factor=prefetch_factor,
         )
 
         self.window_size = window_size
         self.mc_sample_size = mc_sample_size
         self.significance_level = significance_level
         self.repeat = repeat
+        self.precompute_stationarity = precompute_stationarity
+        self.stationarity_bucket_size = stationarity_bucket_size
+        self.stationarity_cache_dir = (
+            Path(stationarity_cache_dir)
+            if stationarity_cache_dir is not None
+            else None
+        )
+        self.stationarity_workers = stationarity_workers
+
+    def _get_stationarity_cache_path(self, split_name: str) -> Path:
+        """Return the path of the file where the stationarity index of a split
+        is persisted. The name of the file is a hash of the path of the split
+        data, the name, size and modification time of its files and the
+        parameters that change the loaded series. ``TNCDataset`` also checks
+        a hash of the series values before reusing the file.
+
+        Parameters
+        ----------
+        split_name : str
+            The name of the split.
+
+        Returns
+        -------
+        Path
+            The ``.npz`` file where the index is (or will be) stored.
+        """
+        if split_name == "predict":
+            split_name = "test"
+        if self.data_format == "npy":
+            path = (self.data_path / f"x_{split_name}.npy").resolve()
+            files = [path]
+        else:
+            path = (self.data_path / split_name).resolve()
+            files = sorted(path.glob("*.csv"))
+        stats = []
+        for f in files:
+            stat = os.stat(f)
+            stats.append([f.name, stat.st_size, stat.st_mtime_ns])
+        key = {
+            "path": str(path),
+            "files": stats,
+            "features": (
+                list(self.features) if self.features is not None else None
+            ),
+            "pad": self.pad,
+            "cast_to": str(self.cast_to) if self.cast_to else None,
+        }
+        return (
+            self.stationarity_cache_dir
+            / f"{split_name}-{cache_key(key)}.stationarity.npz"
+        )
 
     def _load_dataset(self, split_name: str) -> TNCDataset:
         """Create a ``TNCDataset`` dataset with the given split.
@@ -447,6 +762,14 @@ class TNCHARDataModule(UserActivityFolderDataModule):
             significance_level=self.significance_level,
             repeat=self.repeat,
             cast_to=self.cast_to,
+            precompute_stationarity=self.precompute_stationarity,
+            stationarity_bucket_size=self.stationarity_bucket_size,
+            stationarity_cache=(
+                self._get_stationarity_cache_path(split_name)
+                if self.stationarity_cache_dir is not None
+                else None
+            ),
+            stationarity_workers=self.stationarity_workers,
         )
         return dataset
 
@@ -468,9 +791,16 @@ class MultiModalHARSeriesDataModule(L.LightningDataModule):
         features_as_channels: bool = True,
         transforms: Union[List[Callable], Dict[str, List[Callable]]] = None,
         cast_to: str = "float32",
+        cache_dir: PathLike = None,
+        chunk_size: int = None,
+        csv_engine: str = "c",
+        shared_memory: bool = False,
         # Loader params
         batch_size: int = 1,
         num_workers: int = None,
+        pin_memory: bool = None,
+        persistent_workers: bool = True,
+        prefetch_factor: int = None,
     ):
         """Define the dataloaders for train, validation and test splits for
         HAR datasets. This datasets assumes that the data is in a single CSV
@@ -528,10 +858,38 @@ class MultiModalHARSeriesDataModule(L.LightningDataModule):
             - Dict[str, List[Callable]]: A dictionary with the split name as
                 key and a list of transforms as value. The split name must be
                 one of: "train", "validation", "test" or "predict".
+        cache_dir : PathLike, optional
+            Directory used to cache the parsed CSV files as ``.npy`` files,
+            which are memory-mapped in further loads. If None, no cache is used.
+        chunk_size : int, optional
+            If specified, the CSV files are read in chunks of ``chunk_size``
+            rows, written directly into a preallocated array (or into the
+            cache file), to reduce the peak memory. See
+            ``MultiModalSeriesCSVDataset``.
+        csv_engine : str, optional
+            The engine used to parse the CSV files: "c" or "pyarrow"
+            (requires the optional pyarrow package, and does not support
+            ``chunk_size``). See ``MultiModalSeriesCSVDataset``.
+        shared_memory : bool, optional
+            If True, the data of each split is copied to shared memory, thus
+            it is not copied by each worker of the dataloaders (see
+            ``MultiModalSeriesCSVDataset``).
         batch_size : int, optional
             The size of the batch
         num_workers : int, optional
             Number of workers to load data. If None, then use all cores
+        pin_memory : bool, optional
+            If True, the batches are copied to page-locked memory, which
+            speeds up the copies to the GPU. If None, it is True only if CUDA
+            is available.
+        persistent_workers : bool, optional
+            If True, the workers of each dataloader are kept alive between
+            epochs, instead of being created (and copying the dataset) at the
+            start of every epoch. Only used if ``num_workers`` is greater
+            than 0.
+        prefetch_factor : int, optional
+            Number of batches loaded in advance by each worker. If None, the
+            default of ``DataLoader`` is used (2).
         """
         super().__init__()
         self.data_path = Path(data_path)
@@ -540,8 +898,15 @@ class MultiModalHARSeriesDataModule(L.LightningDataModule):
         self.features_as_channels = features_as_channels
         self.transforms = parse_transforms(transforms)
         self.cast_to = cast_to
+        self.cache_dir = cache_dir
+        self.chunk_size = chunk_size
+        self.csv_engine = csv_engine
+        self.shared_memory = shared_memory
         self.batch_size = batch_size
         self.num_workers = parse_num_workers(num_workers)
+        self.pin_memory = pin_memory
+        self.persistent_workers = persistent_workers
+        self.prefetch_factor = prefetch_factor
 
         self.datasets = {}
 
@@ -576,6 +941,10 @@ class MultiModalHARSeriesDataModule(L.LightningDataModule):
             features_as_channels=self.features_as_channels,
             cast_to=self.cast_to,
             transforms=self.transforms[split_name],
+            cache_dir=self.cache_dir,
+            chunk_size=self.chunk_size,
+            csv_engine=self.csv_engine,
+            shared_memory=self.shared_memory,
         )
 
     def setup(self, stage: str):
@@ -624,12 +993,14 @@ class MultiModalHARSeriesDataModule(L.LightningDataModule):
         DataLoader
             A dataloader for the given split.
         """
-        return DataLoader(
+        return build_dataloader(
             self.datasets[split_name],
             batch_size=self.batch_size,
-            num_workers=self.num_workers,
             shuffle=shuffle,
-            pin_memory=True,
+            num_workers=self.num_workers,
+            pin_memory=self.pin_memory,
+            persistent_workers=self.persistent_workers,
+            prefetch_factor=self.prefetch_factor,
         )
 
     def train_dataloader(self) -> DataLoader:
@@ -676,9 +1047,18 @@ class TFCDataModule(L.LightningDataModule):
         cast_to: str = "float32",
         jitter_ratio: float = 2,
         only_time_frequency: bool = False,
+        only_time: bool = False,
+        cache_dir: PathLike = None,
+        chunk_size: int = None,
+        csv_engine: str = "c",
+        shared_memory: bool = False,
+        cache_frequency: bool = False,
         # Loader params
         batch_size: int = 32,
         num_workers: int = None,
+        pin_memory: bool = None,
+        persistent_workers: bool = True,
+        prefetch_factor: int = None,
     ):
         """Define a dataloader for ``TFCDataset``. This is a wrapper around
         ``TFCDataset`` class that defines the dataloaders for Pytorch Lightning.
@@ -731,17 +1111,56 @@ class TFCDataModule(L.LightningDataModule):
             If True, the data returned will be a 2-element tuple with the
             (time, frequency) data as the first element and the label as the
             second element, by default False
+        only_time : bool, optional
+            If True, the data returned will be a 2-element tuple with the
+            time-domain data (without augmentation) and the label. The FFT and
+            the augmentations must be computed by the model, in its device
+            (see ``augment_on_device`` of ``TFC``). The transforms of this
+            data module are not used.
+        cache_dir : PathLike, optional
+            Directory used to cache the parsed CSV files as ``.npy`` files,
+            which are memory-mapped in further loads. If None, no cache is used.
+        chunk_size : int, optional
+            If specified, the CSV files are read in chunks of ``chunk_size``
+            rows, written directly into a preallocated array (or into the
+            cache file), to reduce the peak memory. See
+            ``MultiModalSeriesCSVDataset``.
+        csv_engine : str, optional
+            The engine used to parse the CSV files: "c" or "pyarrow"
+            (requires the optional pyarrow package, and does not support
+            ``chunk_size``). See ``MultiModalSeriesCSVDataset``.
+        shared_memory : bool, optional
+            If True, the data of each split is copied to shared memory, thus
+            it is not copied by each worker of the dataloaders (see
+            ``MultiModalSeriesCSVDataset``).
+        cache_frequency : bool, optional
+            If True, the frequency-domain data of each split is computed once
+            (and stored in ``cache_dir``, if specified), instead of for every
+            sample at every epoch. See ``TFCDataset``.
         batch_size : int, optional
             The size of the batch, by default 1
         num_workers : int, optional
             Number of workers to load data, by default None (use all cores)
+        pin_memory : bool, optional
+            If True, the batches are copied to page-locked memory, which
+            speeds up the copies to the GPU. If None, it is True only if CUDA
+            is available.
+        persistent_workers : bool, optional
+            If True, the workers of each dataloader are kept alive between
+            epochs, instead of being created (and copying the dataset) at the
+            start of every epoch. Only used if ``num_workers`` is greater
+            than 0.
+        prefetch_factor : int, optional
+            Number of batches loaded in advance by each worker. If None, the
+            default of ``DataLoader`` is used (2).
         """
         super().__init__()
         self.data_path = Path(data_path)
         self.batch_size = batch_size
-        self.num_workers = (
-            num_workers if num_workers is not None else os.cpu_count()
-        )
+        self.num_workers = parse_num_workers(num_workers)
+        self.pin_memory = pin_memory
+        self.persistent_workers = persistent_workers
+        self.prefetch_factor = prefetch_factor
         self.feature_prefixes = feature_prefixes
         self.label = label
         self.features_as_channels = features_as_channels
@@ -750,6 +1169,12 @@ class TFCDataModule(L.LightningDataModule):
         self.cast_to = cast_to
         self.length_alignment = length_alignment
         self.only_time_frequency = only_time_frequency
+        self.only_time = only_time
+        self.cache_dir = cache_dir
+        self.chunk_size = chunk_size
+        self.csv_engine = csv_engine
+        self.shared_memory = shared_memory
+        self.cache_frequency = cache_frequency
 
         # Time transforms
         if isinstance(time_transforms, list) or time_transforms is None:
@@ -833,6 +1258,10 @@ class TFCDataModule(L.LightningDataModule):
             label=self.label,
             features_as_channels=self.features_as_channels,
             cast_to=self.cast_to,
+            cache_dir=self.cache_dir,
+            chunk_size=self.chunk_size,
+            csv_engine=self.csv_engine,
+            shared_memory=self.shared_memory,
         )
         
         # Wraps the MultiModalSeriesCSVDataset with a TFCDataset
@@ -843,6 +1272,8 @@ class TFCDataModule(L.LightningDataModule):
             frequency_transforms=self.frequency_transforms[split_name],
             cast_to=self.cast_to,
             only_time_frequency=self.only_time_frequency,
+            only_time=self.only_time,
+            cache_frequency=self.cache_frequency,
         )
         return tfc_dataset
 
@@ -892,12 +1323,14 @@ class TFCDataModule(L.LightningDataModule):
         DataLoader
             A dataloader for the given split.
         """
-        return DataLoader(
+        return build_dataloader(
             self.datasets[split_name],
             batch_size=self.batch_size,
-            num_workers=self.num_workers,
             shuffle=shuffle,
-            pin_memory=True,
+            num_workers=self.num_workers,
+            pin_memory=self.pin_memory,
+            persistent_workers=self.persistent_workers,
+            prefetch_factor=self.prefetch_factor,
         )
 
     def train_dataloader(self) -> DataLoader:
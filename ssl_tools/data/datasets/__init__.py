@@ -1,3 +1,7 @@
-from .series_dataset import MultiModalSeriesCSVDataset, SeriesFolderCSVDataset
+from .series_dataset import (
+    MultiModalSeriesCSVDataset,
+    SeriesFolderCSVDataset,
+    SeriesNumpyDataset,
+)
 from .tfc import TFCDataset
 from .tnc import TNCDataset
\ No newline at end of file
@@ -4,10 +4,261 @@ from collections.abc import Iterable
 
 import numpy as np
 import pandas as pd
-import contextlib
+import json
+import logging
+import os
+import re
+import time
+
+from ssl_tools.utils.cache import atomic_write, cache_key, temporary_path
+from ssl_tools.utils.parallel import parallel_map
+from ssl_tools.utils.shared_memory import SharedMemoryMixin
+from ssl_tools.utils.types import PathLike
+
+logger = logging.getLogger(__name__)
+
+
+def _count_csv_rows(path: PathLike) -> int:
+    """Count the number of data rows of a CSV file (except the header), as
+    ``pd.read_csv`` parses them. Files with only plain lines are counted by
+    their line breaks, without parsing. Files with blank lines, quotes or
+    ``\\r`` line breaks, where the parser may skip or join lines, are counted
+    by parsing only their first column.
+
+    Parameters
+    ----------
+    path : PathLike
+        The path to the CSV file
+
+    Returns
+    -------
+    int
+        The number of rows of the CSV file, excluding the header.
+    """
+    num_lines = 0
+    with open(path, "rb") as f:
+        for line in f:
+            content = line.rstrip(b"\r\n")
+            if not content.strip() or b'"' in content or b"\r" in content:
+                chunks = pd.read_csv(path, usecols=[0], chunksize=2**16)
+                return sum(len(chunk) for chunk in chunks)
+            num_lines += 1
+    return max(num_lines - 1, 0)
+
+
+def _max_csv_rows(path: PathLike, chunk_size: int = 2**20) -> int:
+    """An upper bound of the number of data rows of a CSV file, without
+    parsing it: the number of line breaks (``\\n``, ``\\r\\n`` or ``\\r``),
+    except the header. The parser may produce less rows, as it skips blank
+    lines and quoted fields may have line breaks.
+
+    Parameters
+    ----------
+    path : PathLike
+        The path to the CSV file
+    chunk_size : int, optional
+        The number of bytes read at a time
+
+    Returns
+    -------
+    int
+        The maximum number of rows of the CSV file, excluding the header.
+    """
+    num_lines = 0
+    last_chunk = b""
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            # A "\r\n" split between chunks is counted twice
+            num_lines += (
+                chunk.count(b"\n") + chunk.count(b"\r") - chunk.count(b"\r\n")
+            )
+            last_chunk = chunk
+    # The last line may not end with a line break
+    if last_chunk and not last_chunk.endswith((b"\n", b"\r")):
+        num_lines += 1
+    return max(num_lines - 1, 0)
+
+
+def _check_csv_engine(engine: str):
+    """Check if ``engine`` is a supported ``pd.read_csv`` engine ("c" or
+    "pyarrow") and if it is installed (pyarrow is optional)."""
+    assert engine in ["c", "pyarrow"], f"Invalid csv_engine: {engine}"
+    if engine == "pyarrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError(
+                "csv_engine='pyarrow' requires the pyarrow package "
+                + "(pip install pyarrow)"
+            ) from e
+
+
+def _read_csv_header(path: PathLike) -> List[str]:
+    """Read only the header (the column names) of a CSV file."""
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def _read_csv_columns(
+    path: PathLike,
+    columns: List[str],
+    features: List[str],
+    cast_to: str = None,
+    engine: str = "c",
+    **kwargs,
+):
+    """Parse only some columns of a CSV file, with the feature columns parsed
+    straight into ``cast_to`` (the other columns, e.g. the label, have their
+    type inferred).
+
+    Parameters
+    ----------
+    path : PathLike
+        The path to the CSV file
+    columns : List[str]
+        The columns to parse (features and others)
+    features : List[str]
+        The feature columns (a subset of ``columns``)
+    cast_to : str, optional
+        The type of the feature columns. If None, it is inferred.
+    engine : str, optional
+        The parser engine ("c" or "pyarrow")
+    **kwargs
+        Other arguments of ``pd.read_csv`` (e.g., ``chunksize``)
+
+    Returns
+    -------
+    Union[pd.DataFrame, Iterator[pd.DataFrame]]
+        The dataframe (or an iterator of dataframes, if ``chunksize`` is
+        specified) with the columns, in the order of the file.
+    """
+    dtype = None
+    if cast_to:
+        dtype = {name: np.dtype(cast_to) for name in features}
+    return pd.read_csv(
+        path, usecols=list(columns), dtype=dtype, engine=engine, **kwargs
+    )
+
+
+_COLUMN_PATTERN = re.compile(r"^(?P<prefix>.+)-(?P<index>\d+)$")
+
+
+def resolve_column_schema(
+    columns: List[str],
+    feature_prefixes: List[str] = None,
+    label: str = None,
+    features_as_channels: bool = True,
+) -> dict:
+    """Resolve the feature columns of a wide CSV file, named as
+    ``<prefix>-<index>`` (e.g., ``accel-x-0``, ``accel-x-1``, ...), where the
+    prefix is the channel and the index is the time step. Columns are matched
+    by their exact prefix, in any order of the file. Columns that are not
+    named as ``<prefix>-<index>`` (e.g., ``x``, ``y``, ``z``) are channels
+    with a single time step, named as the column.
+
+    If ``feature_prefixes`` is None and ``features_as_channels`` is False,
+    the features are not arranged as channels: every column (except the
+    label) is selected, in the order of the file, as a channel with a single
+    time step.
+
+    Parameters
+    ----------
+    columns : List[str]
+        The columns of the CSV file, in the order of the file
+    feature_prefixes : List[str], optional
+        The channels, in the order of the output. If None, all channels of
+        the file (except the label) are used, in order of appearance.
+    label : str, optional
+        The label column, which is never a feature
+    features_as_channels : bool, optional
+        If the features will be arranged as (C, T) arrays. Else, they will be
+        flattened.
+
+    Returns
+    -------
+    dict
+        The schema, with the channels (``channels``), the number of time
+        steps (``num_time_steps``) and the position of the column of each
+        channel and time step in ``columns`` (``positions``, a C x T list).
+
+    Raises
+    ------
+    ValueError
+        If a selected channel has no columns, a time step of a selected
+        channel has more than one column, or the time steps of the selected
+        channels are not 0, 1, ..., T-1 (with the same T for all channels).
+    """
+    if feature_prefixes is None and not features_as_channels:
+        channels = [column for column in columns if column != label]
+        if len(channels) == 0:
+            raise ValueError("No feature columns")
+        return {
+            "channels": channels,
+            "num_time_steps": 1,
+            "positions": [
+                [position]
+                for position, column in enumerate(columns)
+                if column != label
+            ],
+        }
+
+    indices = {}
+    duplicates = {}
+    for position, column in enumerate(columns):
+        if column == label:
+            continue
+        match = _COLUMN_PATTERN.match(column)
+        if match is None:
+            prefix, step = column, 0
+        else:
+            prefix, step = match.group("prefix"), int(match.group("index"))
+        steps = indices.setdefault(prefix, {})
+        if step in steps:
+            # Only an error if the channel is selected
+            duplicates.setdefault(prefix, (columns[steps[step]], column, step))
+        steps[step] = position
+
+    channels = (
+        list(feature_prefixes)
+        if feature_prefixes is not None
+        else list(indices.keys())
+    )
+    if len(channels) == 0:
+        raise ValueError("No feature columns")
+
+    positions = []
+    for channel in channels:
+        steps = indices.get(channel)
+        if not steps:
+            raise ValueError(f"No columns of the channel {channel}")
+        if channel in duplicates:
+            first, second, step = duplicates[channel]
+            raise ValueError(
+                f"Columns {first} and {second} are both the time step "
+                + f"{step} of {channel}"
+            )
+        if sorted(steps) != list(range(len(steps))):
+            raise ValueError(
+                f"The time steps of {channel} are not 0, 1, ..., "
+                + f"{len(steps) - 1}"
+            )
+        positions.append([steps[t] for t in range(len(steps))])
+
+    num_time_steps = len(positions[0])
+    if any(len(channel) != num_time_steps for channel in positions):
+        lengths = {
+            channel: len(steps) for channel, steps in zip(channels, positions)
+        }
+        raise ValueError(
+            f"Channels have different number of time steps: {lengths}"
+        )
+    return {
+        "channels": channels,
+        "num_time_steps": num_time_steps,
+        "positions": positions,
+    }
 
 
-class MultiModalSeriesCSVDataset:
+class MultiModalSeriesCSVDataset(SharedMemoryMixin):
     def __init__(
         self,
         data_path: Union[Path, str],
@@ -16,6 +267,10 @@ class MultiModalSeriesCSVDataset:
         features_as_channels: bool = True,
         cast_to: str = "float32",
         transforms: Optional[Union[Callable, List[Callable]]] = None,
+        cache_dir: PathLike = None,
+        chunk_size: int = None,
+        csv_engine: str = "c",
+        shared_memory: bool = False,
     ):
         """This datasets assumes that the data is in a single CSV file with
         series of data. Each row is a single sample that can be composed of
@@ -37,9 +292,19 @@ class MultiModalSeriesCSVDataset:
         accel-x series, we can set ``feature_prefixes=["accel-x"]``. If we want
         to use both accel-x and accel-y, we can set
         ``feature_prefixes=["accel-x", "accel-y"]``. If None is passed, all
-        columns will be used as features, except the label column.
+        series will be used as features, except the label column.
         The label column is specified by the ``label`` parameter.
 
+        Feature columns are named as ``<prefix>-<index>``. They are matched
+        by their exact prefix and placed by their index, regardless of their
+        order in the file (see ``resolve_column_schema``). Columns with other
+        names (e.g., ``x``, ``y``, ``z``) are single time step channels, thus
+        a file with only such columns gives samples of shape (C, 1). If
+        ``feature_prefixes`` is None and ``features_as_channels`` is False,
+        all columns except the label are the features, in the order of the
+        file. The resolved schema is stored in ``schema`` (and in the cache
+        entry, if ``cache_dir`` is specified).
+
         The dataset will return a 2-element tuple with the data and the label,
         if the ``label`` parameter is specified, otherwise return only the data.
 
@@ -54,8 +319,8 @@ class MultiModalSeriesCSVDataset:
             The location of the CSV file
         feature_prefixes : Union[str, List[str]], optional
             The prefix of the column names in the dataframe that will be used
-            to become features. If None, all columns except the label will be
-            used as features.
+            to become features (the channels, in this order). If None, all
+            series except the label will be used as features.
         label : str, optional
             The name of the column that will be used as label
         features_as_channels : bool, optional
@@ -68,6 +333,40 @@ class MultiModalSeriesCSVDataset:
             individually. Each transform must be a callable that receives a
             numpy array and returns a numpy array. The transforms will be
             applied in the order they are specified.
+        cache_dir: PathLike, optional
+            If specified, the parsed data (already reshaped and casted) and the
+            labels are stored as ``.npy`` files inside this directory. The
+            cache entry is keyed by the CSV path, its modification time and the
+            parameters that change the parsed data (``feature_prefixes``,
+            ``label``, ``features_as_channels`` and ``cast_to``). Further
+            instantiations with the same parameters memory-map the cached
+            data instead of parsing the CSV file again. If None, no cache is
+            used.
+        chunk_size: int, optional
+            If specified, the CSV file is read in chunks of ``chunk_size``
+            rows, which are written directly into a preallocated array of
+            shape (N, C, T) (or (N, T*C)) and type ``cast_to``. If
+            ``cache_dir`` is specified, the array is the memory-mapped cache
+            file itself. Thus, the peak memory is about the size of the
+            parsed data (or only the size of a chunk, with the cache), instead
+            of about 3 times it (the dataframe, its numpy copy and the cast
+            copy). If None, the whole file is read at once.
+        csv_engine: str, optional
+            The ``pd.read_csv`` engine used to parse the CSV file: "c" or
+            "pyarrow" (multithreaded, requires the optional pyarrow package).
+            In both cases, only the header is parsed first, to find the
+            selected columns, and then only the feature and label columns are
+            parsed, with the features parsed straight into ``cast_to``. The
+            pyarrow engine does not support ``chunk_size``, and its float64
+            values may differ from the "c" engine in the last digit (the "c"
+            engine does not round-trip them exactly).
+        shared_memory: bool, optional
+            If True, the loaded data and labels are copied to a contiguous
+            block of shared memory (a torch shared tensor), and samples are
+            views of it. Thus, the workers of a ``DataLoader`` (forked or
+            spawned) do not copy them, and the memory does not grow with the
+            number of workers. Data memory-mapped from the cache is already
+            shared by the OS, and is kept as is.
 
         Examples
         --------
@@ -113,10 +412,113 @@ class MultiModalSeriesCSVDataset:
         else:
             transforms = []
         self.transforms = transforms
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.chunk_size = chunk_size
+        _check_csv_engine(csv_engine)
+        assert not (
+            chunk_size is not None and csv_engine == "pyarrow"
+        ), "csv_engine='pyarrow' does not support chunk_size"
+        self.csv_engine = csv_engine
+        self.schema = None
+        self.shared_memory = shared_memory
         self.data, self.labels = self._load_data()
+        if self.shared_memory and not isinstance(self.data, np.memmap):
+            self._share("data", self.data)
+            self._share("labels", self.labels)
+
+    def _get_cache_path(self) -> Path:
+        """Return the directory of the cache entry for this dataset. The name
+        of the directory is a hash of the CSV file path, its modification time
+        and the parameters that change the parsed data.
+
+        Returns
+        -------
+        Path
+            The directory where the cached data is (or will be) stored.
+        """
+        path = self.data_path.resolve()
+        key = {
+            "path": str(path),
+            "mtime": os.stat(path).st_mtime_ns,
+            "feature_prefixes": (
+                list(self.feature_prefixes)
+                if self.feature_prefixes is not None
+                else None
+            ),
+            "label": self.label,
+            "features_as_channels": self.features_as_channels,
+            "cast_to": str(self.cast_to) if self.cast_to else None,
+        }
+        return self.cache_dir / f"{path.stem}-{cache_key(key)}"
+
+    def _load_cache(
+        self, cache_path: Path
+    ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Load the data and the labels from a cache entry. The data is
+        memory-mapped (read-only), so the loading time does not depend on the
+        size of the data.
+
+        Parameters
+        ----------
+        cache_path : Path
+            The directory of the cache entry
+
+        Returns
+        -------
+        Tuple[np.ndarray, Optional[np.ndarray]]
+            A 2-element tuple with the data and the labels. The second element
+            is None if the label is not specified.
+        """
+        data = np.load(cache_path / "data.npy", mmap_mode="r")
+        labels = None
+        if self.label:
+            labels = np.load(cache_path / "labels.npy", allow_pickle=True)
+        if (cache_path / "schema.json").exists():
+            with open(cache_path / "schema.json") as f:
+                self.schema = json.load(f)
+        else:
+            self.schema = self._resolve_schema(
+                _read_csv_header(self.data_path)
+            )
+        return data, labels
+
+    def _save_cache(
+        self,
+        cache_path: Path,
+        data: np.ndarray,
+        labels: Optional[np.ndarray],
+    ):
+        """Save the data and the labels to a cache entry. Files are written
+        with a temporary name and renamed after, and ``data.npy`` is the last
+        one to be renamed. Thus, an entry is considered valid only if it has
+        the ``data.npy`` file.
+
+        Parameters
+        ----------
+        cache_path : Path
+            The directory of the cache entry
+        data : np.ndarray
+            The parsed data
+        labels : Optional[np.ndarray]
+            The labels. If None, only the data is saved.
+        """
+        cache_path.mkdir(parents=True, exist_ok=True)
+        if self.schema is not None:
+            atomic_write(
+                cache_path / "schema.json",
+                lambda f: json.dump(self.schema, f),
+                mode="w",
+            )
+        arrays = [("labels.npy", labels), ("data.npy", data)]
+        for name, array in arrays:
+            if array is None:
+                continue
+            atomic_write(cache_path / name, lambda f: np.save(f, array))
 
     def _load_data(self) -> Tuple[np.ndarray, Optional[np.ndarray]]:
-        """Load data from the CSV file
+        """Load data from the cache, if ``cache_dir`` is specified and there
+        is a valid cache entry, else from the CSV file (and store it in the
+        cache, if ``cache_dir`` is specified).
 
         Returns
         -------
@@ -124,37 +526,232 @@ class MultiModalSeriesCSVDataset:
             A 2-element tuple with the data and the labels. The second element
             is None if the label is not specified.
         """
-        df = pd.read_csv(self.data_path)
+        if self.cache_dir is None:
+            return self._read_data()
 
-        # Select columns with the given prefixes
-        # If None, select all columns except the label (if specified)
-        if self.feature_prefixes is None:
-            selected_columns = [col for col in df.columns if col != self.label]
-        else:
-            selected_columns = [
-                col
-                for col in df.columns
-                if any(prefix in col for prefix in self.feature_prefixes)
-            ]
+        cache_path = self._get_cache_path()
+        if (cache_path / "data.npy").exists():
+            return self._load_cache(cache_path)
 
-        selected_columns = list(selected_columns)
+        if self.chunk_size is not None:
+            # The data is streamed directly into the cache file
+            self._stream_data(cache_path)
+            return self._load_cache(cache_path)
+
+        data, labels = self._read_data()
+        self._save_cache(cache_path, data, labels)
+        return data, labels
+
+    def _resolve_schema(self, columns: List[str]) -> dict:
+        """Resolve the column schema of the CSV file (see
+        ``resolve_column_schema``).
+
+        Parameters
+        ----------
+        columns : List[str]
+            The columns of the CSV file
 
-        # Select the data from the selected columns
-        data = df[selected_columns].to_numpy()
+        Returns
+        -------
+        dict
+            The schema
+        """
+        return resolve_column_schema(
+            columns,
+            feature_prefixes=self.feature_prefixes,
+            label=self.label,
+            features_as_channels=self.features_as_channels,
+        )
+
+    def _feature_index(
+        self, columns: List[str], schema: dict
+    ) -> Tuple[List[str], np.ndarray]:
+        """The feature columns to read, in the order of the file, and the
+        index of each channel and time step in them.
+
+        Parameters
+        ----------
+        columns : List[str]
+            The columns of the CSV file
+        schema : dict
+            The column schema
+
+        Returns
+        -------
+        Tuple[List[str], np.ndarray]
+            The names of the feature columns and the (C, T) index.
+        """
+        positions = np.asarray(schema["positions"])
+        unique_positions = np.unique(positions)
+        names = [columns[position] for position in unique_positions]
+        return names, np.searchsorted(unique_positions, positions)
+
+    def _gather_features(
+        self,
+        frame: pd.DataFrame,
+        names: List[str],
+        index: np.ndarray,
+        dtype=None,
+    ) -> np.ndarray:
+        """Build the data of the rows of ``frame``, with a single gather of
+        the feature columns.
 
-        # If features_as_channels is True, reshape the data to (N, C, T) where
-        # N is the number of samples, C is the number of channels and T is the
-        # number of time steps
+        Parameters
+        ----------
+        frame : pd.DataFrame
+            The rows of the CSV file
+        names : List[str]
+            The names of the feature columns (see ``_feature_index``)
+        index : np.ndarray
+            The (C, T) index of each channel and time step in ``names``
+        dtype : optional
+            The type of the data
+
+        Returns
+        -------
+        np.ndarray
+            The data, with shape (N, C, T) if ``features_as_channels`` is
+            True, else (N, C*T).
+        """
+        raw = frame[names].to_numpy(dtype=dtype)
+        if self.features_as_channels:
+            return raw[:, index]
+        return raw[:, index.reshape(-1)]
+
+    def _stream_data(
+        self, cache_path: Path = None
+    ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Read the CSV file in chunks of ``chunk_size`` rows, writing each
+        chunk into a preallocated array. Only the header is parsed before, to
+        find the selected columns, and the array is sized by an upper bound
+        of the number of rows, counted without parsing the file (see
+        ``_max_csv_rows``). If the parser produces less rows (e.g., blank
+        lines or line breaks in quoted fields), the array is truncated to the
+        parsed rows.
+
+        Parameters
+        ----------
+        cache_path : Path, optional
+            If specified, the array is a memory-mapped file of this cache
+            entry (written as ``_save_cache`` does).
+
+        Returns
+        -------
+        Tuple[np.ndarray, Optional[np.ndarray]]
+            A 2-element tuple with the data and the labels. The second element
+            is None if the label is not specified.
+        """
+        header = _read_csv_header(self.data_path)
+        self.schema = self._resolve_schema(header)
+        names, index = self._feature_index(header, self.schema)
+        usecols = list(names)
+        if self.label:
+            usecols.append(self.label)
+
+        num_rows = _max_csv_rows(self.data_path)
         if self.features_as_channels:
-            data = data.reshape(
-                -1,
-                len(self.feature_prefixes),
-                data.shape[1] // len(self.feature_prefixes),
+            shape = (num_rows,) + index.shape
+        else:
+            shape = (num_rows, index.size)
+        dtype = np.dtype(self.cast_to) if self.cast_to else np.float64
+
+        if cache_path is not None:
+            cache_path.mkdir(parents=True, exist_ok=True)
+            tmp_path = temporary_path(cache_path / "data.npy")
+            data = np.lib.format.open_memmap(
+                tmp_path, mode="w+", dtype=dtype, shape=shape
+            )
+        else:
+            data = np.empty(shape, dtype=dtype)
+
+        label_chunks = []
+        start = 0
+        for chunk in _read_csv_columns(
+            self.data_path,
+            usecols,
+            names,
+            cast_to=self.cast_to,
+            chunksize=self.chunk_size,
+        ):
+            end = start + len(chunk)
+            assert end <= num_rows, f"Unexpected rows in {self.data_path}"
+            data[start:end] = self._gather_features(
+                chunk, names, index, dtype=dtype
+            )
+            if self.label:
+                label_chunks.append(chunk[self.label].to_numpy())
+            start = end
+
+        # Blank lines (and line breaks in quoted fields) are counted as rows,
+        # but not parsed. The cache file is rewritten with the parsed rows
+        if start < num_rows:
+            if cache_path is not None:
+                data.flush()
+                truncated_path = temporary_path(
+                    cache_path / "data.npy", suffix="trunc"
+                )
+                truncated = np.lib.format.open_memmap(
+                    truncated_path,
+                    mode="w+",
+                    dtype=dtype,
+                    shape=(start,) + shape[1:],
+                )
+                for i in range(0, start, self.chunk_size):
+                    end = min(i + self.chunk_size, start)
+                    truncated[i:end] = data[i:end]
+                del data
+                os.replace(truncated_path, tmp_path)
+                data = truncated
+            else:
+                data = data[:start]
+        labels = None
+        if self.label:
+            labels = (
+                np.concatenate(label_chunks) if label_chunks else np.empty(0)
             )
 
-        # Cast the data to the specified type
-        if self.cast_to:
-            data = data.astype(self.cast_to)
+        if cache_path is not None:
+            data.flush()
+            del data
+            self._save_cache(cache_path, None, labels)
+            os.replace(tmp_path, cache_path / "data.npy")
+            return self._load_cache(cache_path)
+        return data, labels
+
+    def _read_data(self) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Load data from the CSV file (in chunks, if ``chunk_size`` is
+        specified)
+
+        Returns
+        -------
+        Tuple[np.ndarray, Optional[np.ndarray]]
+            A 2-element tuple with the data and the labels. The second element
+            is None if the label is not specified.
+        """
+        if self.chunk_size is not None:
+            return self._stream_data()
+
+        # Select the columns of each channel (prefix) and time step (index)
+        # from the header, and parse only them (and the label)
+        header = _read_csv_header(self.data_path)
+        self.schema = self._resolve_schema(header)
+        names, index = self._feature_index(header, self.schema)
+        usecols = list(names)
+        if self.label:
+            usecols.append(self.label)
+        df = _read_csv_columns(
+            self.data_path,
+            usecols,
+            names,
+            cast_to=self.cast_to,
+            engine=self.csv_engine,
+        )
+
+        # Gather the data (casted to the specified type). If
+        # features_as_channels is True, its shape is (N, C, T), where N is the
+        # number of samples, C is the number of channels and T is the number
+        # of time steps
+        data = self._gather_features(df, names, index, dtype=self.cast_to)
 
         # If label is specified, return the data and the labels
         if self.label:
@@ -170,8 +767,11 @@ class MultiModalSeriesCSVDataset:
     def __getitem__(
         self, index: int
     ) -> Union[Tuple[np.ndarray, np.ndarray], np.ndarray]:
-        # Get data and apply transforms
+        # Get data and apply transforms. Memory-mapped (cached) data is copied,
+        # so the sample is writable and independent from the file
         data = self.data[index]
+        if isinstance(data, np.memmap):
+            data = np.array(data)
         for transform in self.transforms:
             data = transform(data)
 
@@ -188,7 +788,7 @@ class MultiModalSeriesCSVDataset:
         return str(self)
 
 
-class SeriesFolderCSVDataset:
+class SeriesFolderCSVDataset(SharedMemoryMixin):
     def __init__(
         self,
         data_path: Union[Path, str],
@@ -198,6 +798,11 @@ class SeriesFolderCSVDataset:
         cast_to: str = "float32",
         transforms: Optional[List[Callable]] = None,
         lazy: bool = False,
+        read_workers: int = 1,
+        read_backend: str = "thread",
+        csv_engine: str = "c",
+        shared_memory: bool = False,
+        cache_dir: PathLike = None,
     ):
         """This dataset assumes that the data is in a folder with multiple CSV
         files. Each CSV file is a single sample that can be composed of
@@ -244,6 +849,16 @@ class SeriesFolderCSVDataset:
         -----
         - Samples may have different number of time steps. Use ``pad`` to pad
             the data to the length of the longest sample.
+        - If the data is not loaded lazily, the samples are stored as ragged
+            arrays: the data of all samples concatenated along the time axis,
+            with shape (C, total_T), the labels concatenated as well, with
+            shape (total_T, 1), and the offsets of the samples, with shape
+            (N + 1, ). The i-th sample is at the time steps
+            ``offsets[i]:offsets[i + 1]`` (its label has shape (T, 1)). Thus,
+            all samples must have the same number of channels: unlike the
+            lazy loading, a folder whose CSV files have different columns
+            (with ``features`` set to None) raises a ``ValueError``. Specify
+            ``features``, or use ``lazy=True``, for such folders.
 
         Examples
         --------
@@ -258,12 +873,12 @@ class SeriesFolderCSVDataset:
         >>> data.shape
         (2, 3)
         >>> label.shape
-        (3,)
+        (3, 1)
         >>> data, label = dataset[1]
         >>> data.shape
         (2, 4)
         >>> label.shape
-        (4,)
+        (4, 1)
 
         Parameters
         ----------
@@ -288,6 +903,35 @@ class SeriesFolderCSVDataset:
         lazy: bool, optional
             If True, the data will be loaded lazily (i.e. the CSV files will be
             read only when needed)
+        read_workers: int, optional
+            Maximum number of workers used to read the CSV files when the data
+            is not loaded lazily. If 1, files are read sequentially. If None,
+            use all cores. The order of the samples does not depend on the
+            number of workers.
+        read_backend: str, optional
+            The pool of workers used to read the CSV files. It could be
+            "thread" or "process".
+        csv_engine: str, optional
+            The ``pd.read_csv`` engine used to parse the CSV files: "c" or
+            "pyarrow" (requires the optional pyarrow package). Only the
+            feature and label columns are parsed, with the features parsed
+            straight into ``cast_to``.
+        shared_memory: bool, optional
+            If True, the (ragged) data and labels are copied to shared memory
+            (torch shared tensors), and samples are views of them. Thus, the
+            workers of a ``DataLoader`` (forked or spawned) do not copy them,
+            and the memory does not grow with the number of workers. Data
+            memory-mapped from the cache is already shared by the OS, and is
+            kept as is. Only used if ``lazy`` is False.
+        cache_dir: PathLike, optional
+            If specified, the ragged data, labels and offsets are stored as
+            ``.npy`` files (and a JSON index) in a cache entry inside this
+            directory. The entry is keyed by the directory path, the name,
+            size and modification time of each CSV file and the parameters
+            that change the parsed data (``features``, ``label`` and
+            ``cast_to``). Further instantiations with the same parameters
+            memory-map these arrays, instead of reading the CSV files again.
+            Only used if ``lazy`` is False.
         """
         self.data_path = Path(data_path)
         if features is not None:
@@ -303,20 +947,29 @@ class SeriesFolderCSVDataset:
         else:
             transforms = []
         self.transforms = transforms
+        self.read_workers = read_workers
+        self.read_backend = read_backend
+        _check_csv_engine(csv_engine)
+        self.csv_engine = csv_engine
+        self.shared_memory = shared_memory
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        # Statistics of the last call to ``_read_all_csv``
+        self.read_stats = None
 
         self._files = self._scan_data()
-        # Data contains all the data if lazy is False else None
-        self._cache = self._read_all_csv() if not lazy else None
+        # Ragged data, labels and offsets of the samples if lazy is False,
+        # else None
+        self._data, self._labels, self._offsets = None, None, None
+        if not lazy:
+            data, labels, self._offsets = self._load_data()
+            if self.shared_memory and not isinstance(data, np.memmap):
+                self._share("_data", data)
+                self._share("_labels", labels)
+            else:
+                self._data, self._labels = data, labels
+        self._sample_lengths = None
         self._longest_sample_size = self._get_longest_sample_size()
 
-    @contextlib.contextmanager
-    def _disable_fix_length(self):
-        """Decorator to disable fix_length when calling a function"""
-        old_fix_length = self.pad
-        self.pad = False
-        yield
-        self.pad = old_fix_length
-
     def _scan_data(self) -> List[Path]:
         """List the CSV files in the data directory
 
@@ -335,15 +988,87 @@ class SeriesFolderCSVDataset:
         int
             The size of the longest sample in the dataset
         """
-        if not self.pad:
+        if not self.pad or len(self) == 0:
             return 0
+        return max(self.sample_lengths)
+
+    @property
+    def length_index_path(self) -> Path:
+        """The path of the length index file. It is stored next to the data
+        directory (not inside it), as a hidden JSON file."""
+        return self.data_path.parent / f".{self.data_path.name}.lengths.json"
+
+    @property
+    def sample_lengths(self) -> List[int]:
+        """The number of time steps of each sample (before padding and
+        transforms), in the order of the samples.
+
+        If the data is loaded, the lengths are taken from the loaded data.
+        Else, they are taken from a length index file stored next to the data
+        directory (see ``length_index_path``). Files that are not in the index
+        (or that changed since they were indexed) have their rows counted as
+        the CSV parser reads them (see ``_count_csv_rows``), and the index is
+        updated. Thus, both give the same lengths.
+        """
+        if self._sample_lengths is None:
+            if self._offsets is not None:
+                self._sample_lengths = np.diff(self._offsets).tolist()
+            else:
+                self._sample_lengths = self._read_length_index()
+        return self._sample_lengths
 
-        # Iterate
-        with self._disable_fix_length():
-            longest_sample_size = max(
-                self[i][0].shape[-1] for i in range(len(self))
-            )
-        return longest_sample_size
+    def _read_length_index(self) -> List[int]:
+        """Read the lengths of the samples from the length index file,
+        updating it with the files that are missing or outdated.
+
+        Returns
+        -------
+        List[int]
+            The number of time steps of each sample.
+        """
+        index = {}
+        if self.length_index_path.exists():
+            try:
+                with open(self.length_index_path, "r") as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                index = {}
+
+        lengths = []
+        updated = False
+        for f in self._files:
+            stat = os.stat(f)
+            entry = index.get(f.name)
+            # Entries of older indexes (a "length" counted from the line
+            # breaks, which may include blank lines) are counted again
+            if (
+                entry is None
+                or "rows" not in entry
+                or entry["size"] != stat.st_size
+                or entry["mtime"] != stat.st_mtime_ns
+            ):
+                entry = {
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime_ns,
+                    "rows": _count_csv_rows(f),
+                }
+                index[f.name] = entry
+                updated = True
+            lengths.append(entry["rows"])
+
+        # The index is only an optimization. If it can not be written (e.g.
+        # read-only file system), the lengths will be counted again next time
+        if updated:
+            try:
+                atomic_write(
+                    self.length_index_path,
+                    lambda f: json.dump(index, f),
+                    mode="w",
+                )
+            except OSError:
+                pass
+
+        return lengths
 
     def _read_csv(self, path: Path) -> Tuple[np.ndarray, Optional[np.ndarray]]:
         """Read a single CSV file (a single sample)
@@ -359,25 +1084,31 @@ class SeriesFolderCSVDataset:
             A 2-element tuple with the data and the label. If the label is not
             specified, the second element is None.
         """
-        # Read the data
-        original_data = pd.read_csv(path)
-
-        # Collect the features
+        # Collect the features. If they are not specified, the header is
+        # read first, to find them
         if self.features is None:
             selected_columns = [
-                col for col in original_data.columns if col != self.label
+                col for col in _read_csv_header(path) if col != self.label
             ]
         else:
             selected_columns = self.features
         # Transform it to a list if it is not
         selected_columns = list(selected_columns)
 
-        data = original_data[selected_columns].values
-        data = data.swapaxes(0, 1)
+        # Read only the features (casted to the specified type) and the label
+        usecols = list(selected_columns)
+        if self.label is not None:
+            usecols.append(self.label)
+        original_data = _read_csv_columns(
+            path,
+            usecols,
+            selected_columns,
+            cast_to=self.cast_to,
+            engine=self.csv_engine,
+        )
 
-        # Cast the data to the specified type
-        if self.cast_to:
-            data = data.astype(self.cast_to)
+        data = original_data[selected_columns].to_numpy(dtype=self.cast_to)
+        data = data.swapaxes(0, 1)
 
         # Read the label if specified and return the data and the label
         if self.label is not None:
@@ -396,7 +1127,200 @@ class SeriesFolderCSVDataset:
         Union[Tuple[np.ndarray, np.ndarray], np.ndarray]
             A list of 2-element tuple with the data and the label. If the label is not specified, the second element of the tuples are None.
         """
-        return [self._read_csv(f) for f in self._files]
+        start = time.perf_counter()
+        samples = parallel_map(
+            self._read_csv,
+            self._files,
+            n_jobs=self.read_workers,
+            backend=self.read_backend,
+        )
+        elapsed = max(time.perf_counter() - start, 1e-9)
+
+        # Reading throughput (logged, and kept for callers)
+        num_bytes = sum(os.path.getsize(f) for f in self._files)
+        self.read_stats = {
+            "files": len(self._files),
+            "bytes": num_bytes,
+            "seconds": elapsed,
+            "files_per_second": len(self._files) / elapsed,
+            "bytes_per_second": num_bytes / elapsed,
+        }
+        logger.info(
+            "Read %d CSV files (%.2f MiB) from %s in %.2f seconds: "
+            "%.2f files/s, %.2f MiB/s",
+            len(self._files),
+            num_bytes / 2**20,
+            self.data_path,
+            elapsed,
+            self.read_stats["files_per_second"],
+            self.read_stats["bytes_per_second"] / 2**20,
+        )
+        return samples
+
+    def _pack(
+        self, samples: List[Tuple[np.ndarray, Optional[np.ndarray]]]
+    ) -> Tuple[np.ndarray, Optional[np.ndarray], np.ndarray]:
+        """Concatenate the samples along the time axis, as ragged arrays.
+
+        Parameters
+        ----------
+        samples : List[Tuple[np.ndarray, Optional[np.ndarray]]]
+            The (data, label) tuples, as returned by ``_read_csv``
+
+        Returns
+        -------
+        Tuple[np.ndarray, Optional[np.ndarray], np.ndarray]
+            The data, with shape (C, total_T), the labels, with shape
+            (total_T, 1) (None if the label is not specified), and the
+            offsets of the samples, with shape (N + 1, ).
+
+        Raises
+        ------
+        ValueError
+            If the samples have different number of channels.
+        """
+        offsets = np.cumsum([0] + [data.shape[-1] for data, _ in samples])
+        if len(samples) == 0:
+            return np.empty((0, 0), dtype=self.cast_to), None, offsets
+
+        num_channels = samples[0][0].shape[0]
+        if any(data.shape[0] != num_channels for data, _ in samples):
+            raise ValueError(
+                f"The samples of {self.data_path} have different number of "
+                + "channels, thus they can not be packed. Specify the "
+                + "features or use lazy=True."
+            )
+        data = np.concatenate([data for data, _ in samples], axis=1)
+        labels = None
+        if self.label is not None:
+            labels = np.concatenate([label for _, label in samples])
+        return data, labels, offsets
+
+    def _get_cache_path(self) -> Path:
+        """Return the path of the cache entry for this dataset. The name of
+        the entry is a hash of the directory path, the name, size and
+        modification time of each CSV file and the parameters that change the
+        parsed data.
+
+        Returns
+        -------
+        Path
+            The directory where the ragged arrays are (or will be) stored.
+        """
+        path = self.data_path.resolve()
+        files = []
+        for f in self._files:
+            stat = os.stat(f)
+            files.append([f.name, stat.st_size, stat.st_mtime_ns])
+        key = {
+            "path": str(path),
+            "files": files,
+            "features": (
+                list(self.features) if self.features is not None else None
+            ),
+            "label": self.label,
+            "cast_to": str(self.cast_to) if self.cast_to else None,
+        }
+        return self.cache_dir / f"{path.name}-{cache_key(key)}"
+
+    def _load_data(
+        self,
+    ) -> Tuple[np.ndarray, Optional[np.ndarray], np.ndarray]:
+        """Load the ragged arrays from the cache, if ``cache_dir`` is
+        specified and there is a valid cache file (memory-mapped), else from
+        the CSV files (and store them in the cache, if ``cache_dir`` is
+        specified).
+
+        Returns
+        -------
+        Tuple[np.ndarray, Optional[np.ndarray], np.ndarray]
+            The data, the labels (None if the label is not specified) and the
+            offsets of the samples (see ``_pack``).
+        """
+        cache_path = None
+        if self.cache_dir is not None:
+            cache_path = self._get_cache_path()
+            if (cache_path / "index.json").exists():
+                return self._load_cache(cache_path)
+
+        data, labels, offsets = self._pack(self._read_all_csv())
+        if cache_path is not None:
+            self._save_cache(cache_path, data, labels, offsets)
+        return data, labels, offsets
+
+    def _load_cache(
+        self, cache_path: Path
+    ) -> Tuple[np.ndarray, Optional[np.ndarray], np.ndarray]:
+        """Load the ragged arrays from a cache entry. The arrays are
+        memory-mapped (read-only), except the ones with Python objects (e.g.,
+        string labels), which are read into memory.
+
+        Parameters
+        ----------
+        cache_path : Path
+            The directory of the cache entry
+
+        Returns
+        -------
+        Tuple[np.ndarray, Optional[np.ndarray], np.ndarray]
+            The data, the labels (None if the label is not specified) and the
+            offsets of the samples (see ``_pack``).
+        """
+        with open(cache_path / "index.json") as f:
+            index = json.load(f)
+        arrays = {}
+        for name, dtype in index["arrays"].items():
+            mmap_mode = None if np.dtype(dtype).hasobject else "r"
+            arrays[name] = np.load(
+                cache_path / f"{name}.npy",
+                mmap_mode=mmap_mode,
+                allow_pickle=mmap_mode is None,
+            )
+        return (
+            arrays["data"],
+            arrays.get("labels"),
+            np.array(arrays["offsets"]),
+        )
+
+    def _save_cache(
+        self,
+        cache_path: Path,
+        data: np.ndarray,
+        labels: Optional[np.ndarray],
+        offsets: np.ndarray,
+    ):
+        """Save the ragged arrays to a cache entry, as ``.npy`` files and an
+        ``index.json`` file with their names and dtypes. Files are written
+        with a temporary name and renamed after, and the index is the last
+        one. Thus, an entry is considered valid only if it has the index.
+
+        Parameters
+        ----------
+        cache_path : Path
+            The directory of the cache entry
+        data : np.ndarray
+            The data
+        labels : Optional[np.ndarray]
+            The labels. If None, only the data and the offsets are saved.
+        offsets : np.ndarray
+            The offsets of the samples
+        """
+        cache_path.mkdir(parents=True, exist_ok=True)
+        arrays = {"data": data, "offsets": offsets}
+        if labels is not None:
+            arrays["labels"] = labels
+        for name, array in arrays.items():
+            atomic_write(
+                cache_path / f"{name}.npy", lambda f: np.save(f, array)
+            )
+        index = {
+            "arrays": {name: array.dtype.str for name, array in arrays.items()}
+        }
+        atomic_write(
+            cache_path / "index.json",
+            lambda f: json.dump(index, f),
+            mode="w",
+        )
 
     def __len__(self) -> int:
         return len(self._files)
@@ -442,11 +1366,23 @@ class SeriesFolderCSVDataset:
             specified, otherwise only the data.
         """
         # If the data is not loaded, load it lazily (read the CSV file)
-        if self._cache is None:
+        if self._offsets is None:
             data, label = self._read_csv(self._files[idx])
-        # Else, read from the loaded data
+        # Else, take views of the ragged arrays
         else:
-            data, label = self._cache[idx]
+            if idx < 0:
+                idx += len(self)
+            start, end = self._offsets[idx], self._offsets[idx + 1]
+            data = self._data[:, start:end]
+            label = None
+            if self._labels is not None:
+                label = self._labels[start:end]
+            # Memory-mapped (cached) data is copied, so the sample is
+            # writable and independent from the file
+            if isinstance(data, np.memmap):
+                data = np.array(data)
+                if label is not None:
+                    label = np.array(label)
 
         # Pad the data if fix_length is True
         if self.pad:
@@ -472,3 +1408,132 @@ class SeriesFolderCSVDataset:
 
     def __repr__(self) -> str:
         return str(self)
+
+
+class SeriesNumpyDataset:
+    def __init__(
+        self,
+        data_path: PathLike,
+        label_path: PathLike = None,
+        cast_to: str = "float32",
+        transforms: Optional[List[Callable]] = None,
+        mmap: bool = True,
+    ):
+        """This dataset assumes that the data is in a single ``.npy`` file
+        with an array of shape (N, C, T), where N is the number of samples
+        (e.g., subjects), C is the number of channels (features) and T is the
+        number of time steps. Optionally, the labels are in another ``.npy``
+        file with an array of shape (N, T) (one label per time step) or (N, ).
+
+        For instance, the TNC HAR data (``data/TNC/HAR_data``) is stored as:
+
+        data_path
+        ├── x_train.npy  (21, 561, 281)
+        ├── y_train.npy  (21, 281)
+        ├── x_test.npy   (9, 561, 288)
+        └── y_test.npy   (9, 288)
+
+        The files are opened with ``np.load(mmap_mode="r")``, by default.
+        Thus, only the samples that are accessed are read from disk and
+        nothing is parsed, which is useful for long series. Each sample (and
+        its label) returned is a writable copy of only that sample, so it can
+        be modified in place (e.g., by transforms) and converted to a tensor.
+
+        The dataset will return a 2-element tuple with the data and the label,
+        if the ``label_path`` parameter is specified, otherwise return only the
+        data (same contract of ``SeriesFolderCSVDataset``).
+
+        Parameters
+        ----------
+        data_path : PathLike
+            The location of the ``.npy`` file with the data
+        label_path : PathLike, optional
+            The location of the ``.npy`` file with the labels. If None, only
+            the data is returned.
+        cast_to: str, optional
+            Cast the numpy data to the specified type
+        transforms: Optional[List[Callable]], optional
+            A list of transforms that will be applied to each sample
+            individually. Each transform must be a callable that receives a
+            numpy array and returns a numpy array. The transforms will be
+            applied in the order they are specified.
+        mmap: bool, optional
+            If True, the arrays are memory-mapped, else they are fully loaded
+            into memory.
+
+        Examples
+        --------
+        >>> dataset = SeriesNumpyDataset(
+                "data/TNC/HAR_data/x_train.npy",
+                label_path="data/TNC/HAR_data/y_train.npy",
+            )
+        >>> data, label = dataset[0]
+        >>> data.shape
+        (561, 281)
+        >>> label.shape
+        (281,)
+        """
+        self.data_path = Path(data_path)
+        self.label_path = Path(label_path) if label_path is not None else None
+        self.cast_to = cast_to
+        if transforms is not None:
+            if not isinstance(transforms, list):
+                transforms = [transforms]
+        else:
+            transforms = []
+        self.transforms = transforms
+        self.mmap = mmap
+
+        mmap_mode = "r" if mmap else None
+        self.data = np.load(self.data_path, mmap_mode=mmap_mode)
+        self.labels = None
+        if self.label_path is not None:
+            self.labels = np.load(self.label_path, mmap_mode=mmap_mode)
+            assert len(self.labels) == len(
+                self.data
+            ), "Data and labels must have the same number of samples"
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def sample_lengths(self) -> List[int]:
+        """The number of time steps of each sample. All samples have the same
+        length, the last dimension of the array."""
+        return [self.data.shape[-1]] * len(self)
+
+    def __getitem__(
+        self, idx: int
+    ) -> Union[Tuple[np.ndarray, np.ndarray], np.ndarray]:
+        """Get a single sample from the dataset
+
+        Parameters
+        ----------
+        idx : int
+            The index of the sample
+
+        Returns
+        -------
+        Union[Tuple[np.ndarray, np.ndarray], np.ndarray]
+            A 2-element tuple with the data and the label if the label is
+            specified, otherwise only the data.
+        """
+        # Copy only the sample out of the (read-only) memory-mapped array
+        data = np.array(self.data[idx], dtype=self.cast_to or None)
+
+        # Apply transforms
+        for transform in self.transforms:
+            data = transform(data)
+
+        # If label is specified, return the data and the label
+        if self.labels is not None:
+            return data, np.array(self.labels[idx])
+        # Else, return only the data
+        else:
+            return data
+
+    def __str__(self) -> str:
+        return f"SeriesNumpyDataset at {self.data_path} ({len(self)} samples)"
+
+    def __repr__(self) -> str:
+        return str(self)
@@ -11,6 +11,9 @@ from typing import Union, Callable
 from librep.base import Transform
 import numpy as np
 
+from ssl_tools.transforms.signal_1d import fft_magnitude
+from ssl_tools.utils.cache import atomic_write
+
 
 class TFCDataset(Dataset):
     def __init__(
@@ -21,6 +24,8 @@ class TFCDataset(Dataset):
         frequency_transforms: Union[Callable, List[Callable]] = None,
         cast_to: str = "float32",
         only_time_frequency: bool = False,
+        only_time: bool = False,
+        cache_frequency: bool = False,
     ):
         """Time-Frequency Contrastive (TFC) Dataset. This dataset is intented
         to be used using TFC technique. Given a dataset with time-domain signal,
@@ -56,6 +61,22 @@ class TFCDataset(Dataset):
             If True, the data returned will be a 2-element tuple with the
             (time, frequency) as the first element (without augmentation) and 
             the label as the second element, by default False
+        only_time : bool, optional
+            If True, the data returned will be a 2-element tuple with the
+            time-domain data (without augmentation) and the label. No FFT or
+            transforms are computed by the dataset. It is used when the FFT
+            and the augmentations are computed for the whole batch in the
+            model device (see ``augment_on_device`` of ``TFC``).
+        cache_frequency : bool, optional
+            If True, the frequency-domain data (the magnitude of the FFT) of
+            all samples is computed once, when the dataset is created, with a
+            single vectorized FFT over the data of the underlying dataset
+            (``data.data``, with shape (N, C, T) or (N, T)). The augmented
+            frequency-domain data is computed from this cached spectrum. If the
+            underlying dataset has a cache directory (``cache_dir`` of
+            ``MultiModalSeriesCSVDataset``), the spectrum is also stored there
+            and memory-mapped. The underlying dataset must not have transforms,
+            as the spectrum is computed from its raw data.
             
         Examples
         --------
@@ -80,6 +101,10 @@ class TFCDataset(Dataset):
         self.length_alignment = length_alignment
         self.cast_to = cast_to
         self.only_time_frequency = only_time_frequency
+        self.only_time = only_time
+        assert not (
+            only_time and only_time_frequency
+        ), "only_time and only_time_frequency are mutually exclusive"
 
         # Augmented time transforms
         self.aug_time_transforms = time_transforms or []
@@ -99,6 +124,60 @@ class TFCDataset(Dataset):
             self.FFT(absolute=True)
         ] + self.aug_frequency_transforms
 
+        # Frequency-domain data of all samples (None if not cached)
+        self.cache_frequency = cache_frequency
+        self.frequency = None
+        if self.cache_frequency and not self.only_time:
+            self.frequency = self._load_frequency()
+
+    def _compute_frequency(self) -> np.ndarray:
+        """Compute the magnitude of the FFT of all samples of the underlying
+        dataset, at once.
+
+        Returns
+        -------
+        np.ndarray
+            The frequency-domain data, with shape (N, C, length_alignment).
+        """
+        data = np.asarray(self.dataset.data)
+        # If samples are 1-D arrays, convert them to 2-D arrays
+        if data.ndim == 2:
+            data = np.expand_dims(data, axis=1)
+        frequency = fft_magnitude(data[..., : self.length_alignment])
+        if self.cast_to:
+            frequency = frequency.astype(self.cast_to)
+        return frequency
+
+    def _load_frequency(self) -> np.ndarray:
+        """Load the frequency-domain data of all samples from the cache
+        directory of the underlying dataset, if any, or compute it (and store
+        it in the cache directory, if any).
+
+        Returns
+        -------
+        np.ndarray
+            The frequency-domain data, with shape (N, C, length_alignment).
+        """
+        assert hasattr(
+            self.dataset, "data"
+        ), "cache_frequency requires a dataset with a 'data' attribute"
+        assert not getattr(
+            self.dataset, "transforms", None
+        ), "cache_frequency requires a dataset without transforms"
+
+        if getattr(self.dataset, "cache_dir", None) is None:
+            return self._compute_frequency()
+
+        cache_path = (
+            self.dataset._get_cache_path()
+            / f"frequency-{self.length_alignment}-{self.cast_to}.npy"
+        )
+        if not cache_path.exists():
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            frequency = self._compute_frequency()
+            atomic_write(cache_path, lambda f: np.save(f, frequency))
+        return np.load(cache_path, mmap_mode="r")
+
     class FFT:
         def __init__(self, absolute: bool = True):
             """Simple wrapper to apply the FFT to the data
@@ -192,15 +271,28 @@ class TFCDataset(Dataset):
 
         data = data[:, :self.length_alignment]
 
+        if self.only_time:
+            if self.cast_to:
+                data = data.astype(self.cast_to)
+            return data, label
+
         time_aug = self._apply_transforms_per_axis(
             data, self.aug_time_transforms
         )
-        freq = self._apply_transforms_per_axis(
-            data, self.frequency_transform
-        )
-        freq_aug = self._apply_transforms_per_axis(
-            data, self.aug_frequency_transforms
-        )
+        if self.frequency is not None:
+            # The augmentations start from the cached spectrum (the first
+            # transform of ``aug_frequency_transforms`` is the FFT)
+            freq = np.array(self.frequency[index])
+            freq_aug = self._apply_transforms_per_axis(
+                freq, self.aug_frequency_transforms[1:]
+            )
+        else:
+            freq = self._apply_transforms_per_axis(
+                data, self.frequency_transform
+            )
+            freq_aug = self._apply_transforms_per_axis(
+                data, self.aug_frequency_transforms
+            )
 
         # Cast the data to the specified type
         if self.cast_to:
@@ -1,13 +1,154 @@
-from typing import Tuple
+from pathlib import Path
+from typing import List, Tuple
+import hashlib
+import json
 import numpy as np
 
 from torch.utils.data import Dataset
-from statsmodels.tsa.stattools import adfuller
-import math
-
 
+from ssl_tools.utils.cache import atomic_write
+from ssl_tools.utils.parallel import parallel_map
+from ssl_tools.utils.rng import RandomStateMixin
+from ssl_tools.utils.stattools import adfuller_batch
+from ssl_tools.utils.types import PathLike
+
+
+def compute_epsilons(
+    data: np.ndarray,
+    time_steps: np.ndarray,
+    window_size: int,
+    significance_level: float = 0.01,
+) -> np.ndarray:
+    """Compute the neighbourhood size factor (epsilon) of a time series at
+    several time steps, using the ADF test. For each time step ``t``, the ADF
+    test is performed on each feature of windows centered at ``t``, of sizes
+    [window_size, 2*window_size, 3*window_size], and epsilon is the index
+    (starting at 1) of the first window size whose average p-value is greater
+    or equal than the significance level (the series is not stationary). If
+    there is no such window, epsilon is 3.
+
+    The ADF tests of all windows with the same length are performed at once,
+    with ``adfuller_batch``.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        The time series, with shape (n_features, time_steps)
+    time_steps : np.ndarray
+        The time steps where the windows are centered
+    window_size : int
+        The size of the window (δ)
+    significance_level : float, optional
+        The significance level of the ADF test
+
+    Returns
+    -------
+    np.ndarray
+        The epsilon at each time step, in [1, 3].
+    """
+    data = np.asarray(data)
+    time_steps = np.asarray(time_steps, dtype=int).reshape(-1)
+    # Get the length of the time series
+    num_features, time_len = data.shape
+
+    # ---- Do the ADF test ----
+    # Average p-value of each time step (rows), for each window size (columns)
+    corr = np.zeros((len(time_steps), 3))
+
+    # Iterate over 3 different window sizes (W_t). The window sizes are
+    # [window_size, 2*window_size, 3*window_size].
+    for i, wsize in enumerate(range(window_size, 4 * window_size, window_size)):
+        # The windows of ``wsize`` centered at each t. Note that if
+        # t - wsize < 0 or t + wsize > time_len, the window will be truncated.
+        # Thus, it is possible that the window is not centered at t.
+        starts = np.maximum(0, time_steps - wsize)
+        ends = np.minimum(time_len, time_steps + wsize)
+        lengths = ends - starts
+
+        # Test all windows with the same length at once
+        for length in np.unique(lengths):
+            selected = np.flatnonzero(lengths == length)
+            # Windows too short to be tested (statsmodels' ``adfuller``
+            # raises an error) are not stationary
+            if length // 2 - 2 < 0:
+                corr[selected, i] = 0.6
+                continue
+            # Windows with shape (len(selected), num_features, length)
+            windows = data[
+                :, starts[selected, None] + np.arange(length)
+            ].swapaxes(0, 1)
+            _, p_val, _, _ = adfuller_batch(windows.reshape(-1, length))
+            p_val = p_val.reshape(len(selected), num_features)
+            # Constant windows (where statsmodels' ``adfuller`` raises an
+            # error) are not stationary
+            constant = np.ptp(windows, axis=-1) == 0
+            # Average the p-values of the features. If the p-value is NaN,
+            # use ``significance_level`` (value used to accept the null
+            # hypothesis)
+            p_val = np.where(np.isnan(p_val), significance_level, p_val)
+            corr[selected, i] = np.where(
+                constant.any(axis=-1), 0.6, p_val.mean(axis=-1)
+            )
 
-class TNCDataset(Dataset):
+    # Check how many p-values are greater than the significance level, it
+    # is, how many p-values accept the null hypothesis (the series is not
+    # stationary).
+    not_stationary = corr >= significance_level
+    return np.where(
+        not_stationary.any(axis=-1), np.argmax(not_stationary, axis=-1) + 1, 3
+    )
+
+
+def compute_epsilon(
+    data: np.ndarray,
+    t: int,
+    window_size: int,
+    significance_level: float = 0.01,
+) -> int:
+    """Compute the neighbourhood size factor (epsilon) of a time series at
+    time step ``t``, using the ADF test. See ``compute_epsilons``.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        The time series, with shape (n_features, time_steps)
+    t : int
+        The time step where the windows are centered
+    window_size : int
+        The size of the window (δ)
+    significance_level : float, optional
+        The significance level of the ADF test
+
+    Returns
+    -------
+    int
+        The epsilon value, in [1, 3].
+    """
+    return int(compute_epsilons(data, [t], window_size, significance_level)[0])
+
+
+def _compute_series_epsilons(args: Tuple) -> np.ndarray:
+    """Compute the epsilon of a time series at several time steps. The
+    arguments are packed in a tuple, to be used with ``parallel_map``.
+
+    Parameters
+    ----------
+    args : Tuple
+        A 4-element tuple with the time series, the time steps, the window
+        size and the significance level.
+
+    Returns
+    -------
+    np.ndarray
+        The epsilon at each time step
+    """
+    data, time_steps, window_size, significance_level = args
+    return compute_epsilons(
+        data, time_steps, window_size, significance_level
+    ).astype(np.int8)
+
+
+class TNCDataset(Dataset, RandomStateMixin):
     def __init__(
         self,
         data: Dataset,
@@ -16,6 +157,10 @@ class TNCDataset(Dataset):
         significance_level: float = 0.01,
         repeat: int = 1,  # Simply repeat the vecvor 'augmentation' times
         cast_to: str = "float32",
+        precompute_stationarity: bool = False,
+        stationarity_bucket_size: int = None,
+        stationarity_cache: PathLike = None,
+        stationarity_workers: int = None,
     ):
         """Temporal Neighbourhood Coding (TNC) dataset. This dataset is used
         to pre-train self-supervised models. The dataset obtain close and
@@ -30,6 +175,10 @@ class TNCDataset(Dataset):
             (mc_sample_size, n_features, window_size).
         Note that the number of distant samples may be less than mc_sample_size.
 
+        The random numbers are drawn from the generator of the dataset (see
+        ``RandomStateMixin``), which is reseeded in each ``DataLoader`` worker
+        by ``seed_worker``.
+
         Parameters
         ----------
         data : Dataset
@@ -51,6 +200,26 @@ class TNCDataset(Dataset):
             Simple repeat the element of the dataset ``repeat`` times
         cast_to : str, optional
             Cast the data to the given type, by default "float32"
+        precompute_stationarity : bool, optional
+            If True, the neighbourhood size (epsilon, from the ADF tests) is
+            computed once, when the dataset is built, for each series and each
+            bucket of ``stationarity_bucket_size`` time steps (at the center
+            of the bucket). Thus, ``__getitem__`` only looks up the epsilon of
+            the bucket of the sampled ``t``, instead of running the ADF tests.
+            If False, the ADF tests are run for every sampled ``t``.
+        stationarity_bucket_size : int, optional
+            The number of time steps of each bucket. If None, the
+            ``window_size`` is used.
+        stationarity_cache : PathLike, optional
+            Path to a ``.npz`` file where the precomputed epsilons are
+            persisted. If the file exists and was computed with the same
+            parameters (window size, significance level and bucket size) and
+            the same data (series lengths and a hash of their values), it is
+            loaded instead of being computed again. Else, it is computed and
+            overwritten.
+        stationarity_workers : int, optional
+            Number of processes used to precompute the epsilons. If None, use
+            all cores.
         """
         super().__init__()
         self.data = data
@@ -60,6 +229,110 @@ class TNCDataset(Dataset):
         assert isinstance(repeat, int), "Repeat must be an integer"
         self.repeat = repeat
         self.cast_to = cast_to
+        self.precompute_stationarity = precompute_stationarity
+        self.stationarity_bucket_size = (
+            stationarity_bucket_size or self.window_size
+        )
+        self.stationarity_cache = (
+            Path(stationarity_cache) if stationarity_cache is not None else None
+        )
+        self.stationarity_workers = stationarity_workers
+
+        # Epsilon of each bucket, for each series (None if not precomputed)
+        self._epsilons = None
+        if self.precompute_stationarity:
+            self._epsilons = self._load_stationarity_index()
+
+    def _get_bucket_centers(self, time_len: int) -> np.ndarray:
+        """Return the time step at the center of each bucket of a series. The
+        buckets cover the range of valid ``t``, that is,
+        [2*window_size, time_len - 2*window_size).
+
+        Parameters
+        ----------
+        time_len : int
+            The length of the series
+
+        Returns
+        -------
+        np.ndarray
+            The center of each bucket
+        """
+        first_t = 2 * self.window_size
+        last_t = time_len - 2 * self.window_size - 1
+        if last_t < first_t:
+            return np.array([], dtype=int)
+        num_buckets = (last_t - first_t) // self.stationarity_bucket_size + 1
+        centers = (
+            first_t
+            + np.arange(num_buckets) * self.stationarity_bucket_size
+            + self.stationarity_bucket_size // 2
+        )
+        return np.minimum(centers, last_t)
+
+    def _get_stationarity_metadata(self, series: List[np.ndarray]) -> dict:
+        """Parameters and data used to compute the stationarity index. They
+        are used to validate the persisted index. The data is identified by
+        the length of each series and a hash of their values (and types), so
+        an index computed from other data with the same lengths is not
+        reused."""
+        digest = hashlib.sha1()
+        for x in series:
+            x = np.ascontiguousarray(x)
+            digest.update(f"{x.dtype.str}{x.shape}".encode("utf-8"))
+            digest.update(x.view(np.uint8).reshape(-1).data)
+        return {
+            "window_size": self.window_size,
+            "significance_level": self.significance_level,
+            "bucket_size": self.stationarity_bucket_size,
+            "lengths": [int(x.shape[-1]) for x in series],
+            "fingerprint": digest.hexdigest(),
+        }
+
+    def _load_stationarity_index(self) -> List[np.ndarray]:
+        """Load the stationarity index (epsilon of each bucket of each series)
+        from ``stationarity_cache``, if it is valid, or compute it (and save it,
+        if ``stationarity_cache`` is specified).
+
+        Returns
+        -------
+        List[np.ndarray]
+            A list with the epsilon of each bucket, for each series.
+        """
+        series = [self.data[i] for i in range(len(self.data))]
+        metadata = self._get_stationarity_metadata(series)
+
+        if self.stationarity_cache is not None and self.stationarity_cache.exists():
+            with np.load(self.stationarity_cache) as f:
+                if json.loads(str(f["metadata"])) == metadata:
+                    return [f[f"series_{i}"] for i in range(len(series))]
+
+        epsilons = parallel_map(
+            _compute_series_epsilons,
+            [
+                (
+                    x,
+                    self._get_bucket_centers(x.shape[-1]),
+                    self.window_size,
+                    self.significance_level,
+                )
+                for x in series
+            ],
+            n_jobs=self.stationarity_workers,
+            backend="process",
+        )
+
+        if self.stationarity_cache is not None:
+            self.stationarity_cache.parent.mkdir(parents=True, exist_ok=True)
+            arrays = {f"series_{i}": e for i, e in enumerate(epsilons)}
+            atomic_write(
+                self.stationarity_cache,
+                lambda f: np.savez(
+                    f, metadata=json.dumps(metadata), **arrays
+                ),
+            )
+
+        return epsilons
 
     def __len__(self) -> int:
         return len(self.data) * self.repeat
@@ -96,16 +369,22 @@ class TNCDataset(Dataset):
         # Select a random time step t. The value must be within the range
         # [2*window_size, time_len - 2*window_size]. We do this to assure
         # that we have enough data from left and right of the window
-        t = np.random.randint(
+        t = self.rng.integers(
             2 * self.window_size, time_len - 2 * self.window_size
         )
         # The sample is a window centered at t, with window_size / 2 elements
         # before and after t (X[t - δ, t + δ]])
         x_t = data[:, t - self.window_size // 2 : t + self.window_size // 2]
 
+        # Look up the epsilon of the bucket of t, if it was precomputed
+        epsilon = None
+        if self._epsilons is not None:
+            bucket = (t - 2 * self.window_size) // self.stationarity_bucket_size
+            epsilon = int(self._epsilons[idx][bucket])
+
         # Find the close samples and the delta. X_close is a numpy array with
         # shape (mc_sample_size, n_features, window_size).
-        X_close, delta = self._find_neighours(data, t)
+        X_close, delta = self._find_neighours(data, t, epsilon)
 
         # Find the distant samples. X_distant is a numpy array with shape
         # (mc_sample_size, n_features, window_size). Note that the number of
@@ -122,7 +401,7 @@ class TNCDataset(Dataset):
         return x_t, X_close, X_distant
 
     def _find_neighours(
-        self, data: np.ndarray, t: int
+        self, data: np.ndarray, t: int, epsilon: int = None
     ) -> Tuple[np.ndarray, float]:
         """Given a time series ``x_t`` and a time step ``t``, find the close
         samples and the delta. The close samples are selected using the ADF
@@ -134,6 +413,9 @@ class TNCDataset(Dataset):
             The time series
         t : int
             The time step to find the close samples
+        epsilon : int, optional
+            The neighbourhood size factor. If None, it is computed with the
+            ADF test (see ``compute_epsilon``).
 
         Returns
         -------
@@ -145,61 +427,12 @@ class TNCDataset(Dataset):
         # Get the length of the time series
         num_features, time_len = data.shape
 
-        # ---- Do the ADF test ----
-        corr = []  # List of average p-values
-
-        # Iterate over 3 different window sizes (W_t). The window sizes are
-        # [window_size, 2*window_size, 3*window_size].
-        for wsize in range(
-            self.window_size, 4 * self.window_size, self.window_size
-        ):
-            # For each window of ``wsize`` centered at ``t``, we perform the
-            # ADF test on each feature, and store the average p-value, in the
-            # list ``corr``.
-            try:
-                # Used to store the sum of p-values calculated for each feature.
-                p_val_sum = 0
-                # Iterate over the features and calculate the adf test
-                for feat_idx in range(num_features):
-                    # Get the a window of size wsize centered at t of the
-                    # current feature. Note that if t - wsize < 0 or t +
-                    # wsize > time_len, the window will be truncated. Thus,
-                    # it is possible that the window is not centered at t.
-                    window_sample = np.array(
-                        data[
-                            feat_idx,
-                            max(0, t - wsize) : min(time_len, t + wsize),
-                        ]
-                    )
-
-                    # Reshape the data to be a 1D array
-                    window_sample = window_sample.reshape(-1)
-
-                    # Execute the ADF test on data. The ADF test returns a
-                    # tuple with 5 values. The second value (index 1) is the
-                    # p-value.
-                    p_val = adfuller(np.array(window_sample))[1]
-                    # Add the p-value to the sum. If the p-value is NaN, add
-                    # ``self.significance_level`` (value used to accept the
-                    # null hypothesis)
-                    p_val_sum += (
-                        self.significance_level if math.isnan(p_val) else p_val
-                    )
-
-                # Average the p-values and append it to the list of p-values
-                p_val_avg = p_val_sum / num_features
-                corr.append(p_val_avg)
-            except:
-                corr.append(0.6)
-
-        # Check how many p-values are greater than the significance level, it
-        # is, how many p-values accept the null hypothesis (the series is not
-        # stationary).
-        epsilon = (
-            len(corr)
-            if len(np.where(np.array(corr) >= self.significance_level)[0]) == 0
-            else (np.where(np.array(corr) >= self.significance_level)[0][0] + 1)
-        )
+        # Check how many p-values of the ADF tests are greater than the
+        # significance level (the series is not stationary).
+        if epsilon is None:
+            epsilon = compute_epsilon(
+                data, t, self.window_size, self.significance_level
+            )
 
         # Calculate the new delta to, it is, adjust the neighbourhood size
         delta = 5 * epsilon * self.window_size
@@ -207,33 +440,24 @@ class TNCDataset(Dataset):
         # Select ``self.mc_sample_size`` random time steps from the
         # neighbourhood (``window_size * epsilon``) of ``t`` (only after ``t``).
         # The close samples will be centered at these time steps.
-        t_p = [
-            int(t + np.random.randn() * epsilon * self.window_size)
-            for _ in range(self.mc_sample_size)
-        ]
-
-        # Iterate over each time step in ``t_p`` and adjust its value to
-        # assure that the window will not be out of bounds (truncated)
-        t_p = [
-            max(
-                self.window_size // 2 + 1,
-                min(t_pp, time_len - self.window_size // 2),
-            )
-            for t_pp in t_p
-        ]
+        t_p = (
+            t
+            + self.rng.standard_normal(self.mc_sample_size)
+            * epsilon
+            * self.window_size
+        ).astype(int)
+
+        # Adjust the time steps in ``t_p`` to assure that the windows will not
+        # be out of bounds (truncated)
+        t_p = np.clip(
+            t_p,
+            self.window_size // 2 + 1,
+            time_len - self.window_size // 2,
+        )
 
         # Get the windows centered at the time steps in ``t_p``. The windows
         # will have size ``window_size``.
-        centered_windows = [
-            data[
-                :,
-                t_ind - self.window_size // 2 : t_ind + self.window_size // 2,
-            ]
-            for t_ind in t_p
-        ]
-
-        # Convert the list of windows to a numpy array
-        x_p = np.stack(centered_windows)
+        x_p = self._get_windows(data, t_p)
 
         # Returns the close samples and the delta
         return x_p, delta
@@ -276,42 +500,60 @@ class TNCDataset(Dataset):
         # will be the first half of the time series. Otherwise, the
         # neighbourhood will be the second half of the time series.
         if t > time_len / 2:
-            t_n = np.random.randint(
+            t_n = self.rng.integers(
                 self.window_size // 2,
                 max((t - delta + 1), self.window_size // 2 + 1),
                 self.mc_sample_size,
             )
         else:
-            t_n = np.random.randint(
+            t_n = self.rng.integers(
                 min((t + delta), (time_len - self.window_size - 1)),
                 (time_len - self.window_size // 2),
                 self.mc_sample_size,
             )
 
-        # Get the windows centered at the time steps in ``t_p``. The windows
+        # Get the windows centered at the time steps in ``t_n``. The windows
         # will have size ``window_size``.
-        x_n = np.stack(
-            [
-                data[
-                    :,
-                    t_ind
-                    - self.window_size // 2 : t_ind
-                    + self.window_size // 2,
-                ]
-                for t_ind in t_n
-            ]
-        )
+        x_n = self._get_windows(data, t_n)
 
         # If the list of distant samples is empty, select a random window from
         # the time series. If ``t`` is greater than ``time_len / 2``, the
         # window will be selected from the first half of the time series.
         if len(x_n) == 0:
-            rand_t = np.random.randint(0, self.window_size // 5)
+            rand_t = self.rng.integers(0, self.window_size // 5)
             if t > time_len / 2:
-                x_n = data[:, rand_t : rand_t + self.window_size].unsqueeze(0)
+                x_n = data[:, rand_t : rand_t + self.window_size][None]
             else:
                 x_n = data[
                     :, time_len - rand_t - self.window_size : time_len - rand_t
-                ].unsqueeze(0)
+                ][None]
         # Returns the distant samples
         return x_n
+
+    def _get_windows(self, data: np.ndarray, centers: np.ndarray) -> np.ndarray:
+        """Get the windows of ``data`` centered at each time step in
+        ``centers``. The windows are gathered at once, from a strided view of
+        all windows of the time series (no copy), using fancy indexing. Only
+        the selected windows are copied.
+
+        Parameters
+        ----------
+        data : np.ndarray
+            The time series, with shape (n_features, time_steps)
+        centers : np.ndarray
+            The time steps where the windows are centered. The windows must
+            not be out of bounds.
+
+        Returns
+        -------
+        np.ndarray
+            An array with shape (len(centers), n_features, window_size), with
+            the windows (X[t - δ/2, t + δ/2]) for each t in ``centers``.
+        """
+        half_window = self.window_size // 2
+        # Shape: (n_features, time_steps - 2 * half_window + 1, 2 * half_window)
+        windows = np.lib.stride_tricks.sliding_window_view(
+            data, 2 * half_window, axis=-1
+        )
+        starts = np.asarray(centers, dtype=int) - half_window
+        return windows[:, starts].swapaxes(0, 1)
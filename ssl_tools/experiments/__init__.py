@@ -3,5 +3,6 @@ from .lightning_experiment import (
     LightningExperiment,
     LightningTrain,
     LightningTest,
+    LightningEmbed,
     LightningSSLTrain,
 )
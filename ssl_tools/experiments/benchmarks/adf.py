@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+import time
+import warnings
+
+import numpy as np
+from statsmodels.tsa.stattools import adfuller
+
+from ssl_tools.experiments import Experiment, auto_main
+from ssl_tools.utils.stattools import adfuller_batch
+
+
+class ADFBenchmark(Experiment):
+    def __init__(
+        self,
+        num_series: int = 512,
+        lengths: tuple = (60, 120, 180),
+        tolerance: float = 1e-6,
+        repeat: int = 3,
+        name: str = "adf_benchmark",
+        *args,
+        **kwargs,
+    ):
+        """Compare ``adfuller_batch`` with statsmodels' ``adfuller`` (called
+        one series at a time, as done by the TNC dataset before). For each
+        length, a batch of random walks, white noises and noisy sinusoids is
+        generated. The test statistics and p-values must match within the
+        given tolerance (and the used lags must be the same). Then, the time
+        of both implementations is reported.
+
+        Parameters
+        ----------
+        num_series : int, optional
+            Number of series of each length
+        lengths : tuple, optional
+            Lengths of the series. In TNC, these are the window sizes
+            (2*window_size, 4*window_size and 6*window_size).
+        tolerance : float, optional
+            Maximum absolute difference allowed between the p-values (and the
+            test statistics) of both implementations
+        repeat : int, optional
+            Number of times that ``adfuller_batch`` is timed (the best time is
+            reported)
+        name : str, optional
+            Name of the experiment
+        """
+        super().__init__(name=name, *args, **kwargs)
+        self.num_series = num_series
+        self.lengths = lengths
+        self.tolerance = tolerance
+        self.repeat = repeat
+
+    def _generate(self, length: int) -> np.ndarray:
+        rng = np.random.default_rng(self.seed)
+        n = self.num_series // 3
+        t = np.arange(length)
+        return np.concatenate(
+            [
+                np.cumsum(rng.normal(size=(n, length)), axis=-1),
+                rng.normal(size=(n, length)),
+                np.sin(t / rng.uniform(2, 20, size=(self.num_series - 2 * n, 1)))
+                + 0.1 * rng.normal(size=(self.num_series - 2 * n, length)),
+            ]
+        )
+
+    def run(self) -> dict:
+        results = {}
+        for length in self.lengths:
+            x = self._generate(length)
+
+            start = time.perf_counter()
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                reference = [adfuller(series) for series in x]
+            loop_time = time.perf_counter() - start
+
+            batch_time = float("inf")
+            for _ in range(self.repeat):
+                start = time.perf_counter()
+                adfstat, pvalue, usedlag, _ = adfuller_batch(x)
+                batch_time = min(batch_time, time.perf_counter() - start)
+
+            stat_error = np.abs(
+                adfstat - np.array([r[0] for r in reference])
+            ).max()
+            pvalue_error = np.abs(
+                pvalue - np.array([r[1] for r in reference])
+            ).max()
+            lag_mismatches = int(
+                (usedlag != np.array([r[2] for r in reference])).sum()
+            )
+            assert stat_error <= self.tolerance, (
+                f"Test statistics differ by {stat_error} (length={length})"
+            )
+            assert pvalue_error <= self.tolerance, (
+                f"P-values differ by {pvalue_error} (length={length})"
+            )
+            assert lag_mismatches == 0, (
+                f"{lag_mismatches} used lags differ (length={length})"
+            )
+
+            print(
+                f"Length {length}: statsmodels loop {loop_time:.3f}s, "
+                + f"batched {batch_time:.3f}s "
+                + f"({loop_time / batch_time:.1f}x). "
+                + f"Max p-value error: {pvalue_error:.2e}"
+            )
+            results[length] = {
+                "loop_seconds": loop_time,
+                "batch_seconds": batch_time,
+                "speedup": loop_time / batch_time,
+                "max_stat_error": float(stat_error),
+                "max_pvalue_error": float(pvalue_error),
+            }
+        return results
+
+
+if __name__ == "__main__":
+    options = {
+        "adf": ADFBenchmark,
+    }
+    auto_main(options)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+
+from typing import List
+import itertools
+import time
+
+import torch
+
+from ssl_tools.experiments import Experiment, auto_main
+from ssl_tools.data.data_modules import MultiModalHARSeriesDataModule
+
+
+class DataLoadingBenchmark(Experiment):
+    def __init__(
+        self,
+        data: str,
+        label: str = "standard activity code",
+        features_as_channels: bool = True,
+        batch_size: int = 64,
+        num_workers: List[int] = None,
+        prefetch_factor: List[int] = None,
+        num_epochs: int = 3,
+        name: str = "data_loading_benchmark",
+        *args,
+        **kwargs,
+    ):
+        """Measure the time to the first batch of each epoch and the
+        steady-state throughput (batches per second, after the first batch)
+        of the train dataloader of ``MultiModalHARSeriesDataModule``, for
+        every combination of:
+
+        - ``num_workers``
+        - ``persistent_workers`` (False or True)
+        - ``prefetch_factor``
+        - ``pin_memory`` (False, and True if CUDA is available)
+
+        The same dataloader is iterated for ``num_epochs`` epochs, as done
+        by the trainer. Thus, the time to the first batch of the first epoch
+        includes the startup of the workers, and of the next epochs includes
+        it only if the workers are not persistent.
+
+        Parameters
+        ----------
+        data : str
+            The path to the folder with the "train.csv" file
+        label : str, optional
+            Name of the column with the labels
+        features_as_channels : bool, optional
+            If True, samples have shape (C, T), else (T*C, )
+        batch_size : int, optional
+            Number of samples of each batch
+        num_workers : List[int], optional
+            The numbers of workers. If None, use 0, 2 and 4.
+        prefetch_factor : List[int], optional
+            The numbers of batches loaded in advance by each worker. If None,
+            use 2 and 4. Only used with workers.
+        num_epochs : int, optional
+            Number of epochs of each setting
+        name : str, optional
+            Name of the experiment
+        """
+        super().__init__(name=name, *args, **kwargs)
+        self.data = data
+        self.label = label
+        self.features_as_channels = features_as_channels
+        self.batch_size = batch_size
+        self.num_workers = num_workers if num_workers is not None else [0, 2, 4]
+        self.prefetch_factor = (
+            prefetch_factor if prefetch_factor is not None else [2, 4]
+        )
+        self.num_epochs = num_epochs
+
+    def _settings(self) -> List[dict]:
+        pin_memory = [False, True] if torch.cuda.is_available() else [False]
+        settings = []
+        for num_workers, pin in itertools.product(self.num_workers, pin_memory):
+            if num_workers == 0:
+                settings.append(
+                    {
+                        "num_workers": 0,
+                        "persistent_workers": False,
+                        "prefetch_factor": None,
+                        "pin_memory": pin,
+                    }
+                )
+                continue
+            for persistent, prefetch in itertools.product(
+                [False, True], self.prefetch_factor
+            ):
+                settings.append(
+                    {
+                        "num_workers": num_workers,
+                        "persistent_workers": persistent,
+                        "prefetch_factor": prefetch,
+                        "pin_memory": pin,
+                    }
+                )
+        return settings
+
+    def _run_epoch(self, loader) -> dict:
+        """Iterate over all batches and return the time to the first batch
+        and the number of batches per second after it."""
+        start = time.perf_counter()
+        iterator = iter(loader)
+        next(iterator)
+        first_batch_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        num_batches = sum(1 for _ in iterator)
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        return {
+            "first_batch_time": first_batch_time,
+            "batches_per_second": num_batches / elapsed,
+        }
+
+    def run(self) -> dict:
+        if self.seed is not None:
+            torch.manual_seed(self.seed)
+
+        results = []
+        for setting in self._settings():
+            data_module = MultiModalHARSeriesDataModule(
+                self.data,
+                label=self.label,
+                features_as_channels=self.features_as_channels,
+                batch_size=self.batch_size,
+                **setting,
+            )
+            data_module.setup("fit")
+            loader = data_module.train_dataloader()
+            epochs = [self._run_epoch(loader) for _ in range(self.num_epochs)]
+            # Stop the persistent workers
+            del loader
+
+            first_batch_times = [epoch["first_batch_time"] for epoch in epochs]
+            throughputs = [epoch["batches_per_second"] for epoch in epochs]
+            print(
+                ", ".join(f"{key}={value}" for key, value in setting.items())
+                + ": first batch "
+                + " / ".join(f"{1000 * t:.1f}" for t in first_batch_times)
+                + " ms (per epoch), "
+                + f"{sum(throughputs) / len(throughputs):.1f} batches/s"
+            )
+            results.append({**setting, "epochs": epochs})
+        return results
+
+
+if __name__ == "__main__":
+    options = {
+        "data_loading": DataLoadingBenchmark,
+    }
+    auto_main(options)
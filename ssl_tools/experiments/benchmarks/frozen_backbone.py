@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+import time
+
+import torch
+
+from ssl_tools.experiments import Experiment, auto_main
+from ssl_tools.models.ssl.classifier import SSLDiscriminator
+from ssl_tools.models.ssl.modules.heads import TFCPredictionHead
+from ssl_tools.models.ssl.tfc import build_tfc_transformer
+
+
+class FrozenBackboneBenchmark(Experiment):
+    def __init__(
+        self,
+        batch_size: int = 128,
+        in_channels: int = 6,
+        length_alignment: int = 178,
+        encoding_size: int = 128,
+        num_classes: int = 6,
+        num_steps: int = 20,
+        device: str = None,
+        name: str = "frozen_backbone_benchmark",
+        *args,
+        **kwargs,
+    ):
+        """Compare the time of each training step and the memory of the
+        activations kept for the backward pass of an ``SSLDiscriminator``
+        (with a TFC backbone) when:
+
+        - "update": the backbone is updated (``update_backbone=True``)
+        - "optimizer_only": the backbone is only excluded from the optimizer,
+          but it is still run with autograd and in training mode (the former
+          behaviour of ``update_backbone=False``)
+        - "frozen": the backbone is frozen (``update_backbone=False``)
+
+        The activation memory is the size of the tensors saved by autograd
+        for the backward pass, thus it is measured in any device.
+
+        Parameters
+        ----------
+        batch_size : int, optional
+            Number of samples of each batch
+        in_channels : int, optional
+            Number of channels of each sample
+        length_alignment : int, optional
+            Number of time steps of each sample
+        encoding_size : int, optional
+            Size of the encoding of the TFC backbone
+        num_classes : int, optional
+            Number of classes of the head
+        num_steps : int, optional
+            Number of training steps of each mode
+        device : str, optional
+            The device of the model. If None, use "cuda" if available, else
+            "cpu".
+        name : str, optional
+            Name of the experiment
+        """
+        super().__init__(name=name, *args, **kwargs)
+        self.batch_size = batch_size
+        self.in_channels = in_channels
+        self.length_alignment = length_alignment
+        self.encoding_size = encoding_size
+        self.num_classes = num_classes
+        self.num_steps = num_steps
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+
+    def _get_model(self, mode: str) -> SSLDiscriminator:
+        backbone = build_tfc_transformer(
+            encoding_size=self.encoding_size,
+            in_channels=self.in_channels,
+            length_alignment=self.length_alignment,
+        )
+        head = TFCPredictionHead(
+            input_dim=2 * self.encoding_size, output_dim=self.num_classes
+        )
+        model = SSLDiscriminator(
+            backbone=backbone,
+            head=head,
+            loss_fn=torch.nn.CrossEntropyLoss(),
+            update_backbone=mode != "frozen",
+        )
+        return model.to(self.device).train()
+
+    def _step(self, model, optimizer, batch) -> int:
+        """Run a training step and return the bytes saved for backward."""
+        saved_bytes = 0
+
+        def pack(tensor):
+            nonlocal saved_bytes
+            saved_bytes += tensor.numel() * tensor.element_size()
+            return tensor
+
+        x, y = batch
+        with torch.autograd.graph.saved_tensors_hooks(pack, lambda t: t):
+            loss = model._loss_func(model(x), y)
+        loss.backward()
+        optimizer.step()
+        optimizer.zero_grad()
+        return saved_bytes
+
+    def _synchronize(self):
+        if self.device.startswith("cuda"):
+            torch.cuda.synchronize()
+
+    def run(self) -> dict:
+        if self.seed is not None:
+            torch.manual_seed(self.seed)
+
+        data = torch.randn(
+            self.batch_size,
+            self.in_channels,
+            self.length_alignment,
+            device=self.device,
+        )
+        x = (data, torch.fft.fft(data).abs())
+        y = torch.randint(
+            0, self.num_classes, (self.batch_size,), device=self.device
+        )
+
+        results = {}
+        for mode in ["update", "optimizer_only", "frozen"]:
+            model = self._get_model(mode)
+            if mode == "optimizer_only":
+                optimizer = model.optimizer_cls(
+                    model.head.parameters(), lr=model.learning_rate
+                )
+            else:
+                optimizer = model.configure_optimizers()
+
+            # Warm up
+            saved_bytes = self._step(model, optimizer, (x, y))
+            self._synchronize()
+            start = time.perf_counter()
+            for _ in range(self.num_steps):
+                self._step(model, optimizer, (x, y))
+            self._synchronize()
+            step_time = (time.perf_counter() - start) / self.num_steps
+
+            print(
+                f"{mode}: {1000 * step_time:.1f} ms/step, "
+                + f"{saved_bytes / 2**20:.1f} MiB of activations"
+            )
+            results[mode] = {
+                "step_time": step_time,
+                "activation_bytes": saved_bytes,
+            }
+        return results
+
+
+if __name__ == "__main__":
+    options = {
+        "frozen_backbone": FrozenBackboneBenchmark,
+    }
+    auto_main(options)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+import time
+
+import numpy as np
+import torch
+
+from ssl_tools.experiments import Experiment, auto_main
+from ssl_tools.transforms.time_1d import (
+    AddGaussianNoise,
+    MagnitudeWrap,
+    RandomSmoothing,
+    Rotate,
+    Scale,
+    TimeAmplitudeModulation,
+)
+
+
+class TransformsBenchmark(Experiment):
+    def __init__(
+        self,
+        batch_size: int = 256,
+        num_channels: int = 6,
+        num_time_steps: int = 60,
+        num_batches: int = 20,
+        device: str = None,
+        name: str = "transforms_benchmark",
+        *args,
+        **kwargs,
+    ):
+        """Compare the throughput (samples per second) of the transforms of
+        ``ssl_tools.transforms.time_1d`` applied per sample (one (C, T) array
+        at a time, as done inside a dataset) and per batch (a single call with
+        a (B, C, T) array, or a torch tensor in the given device, as done after
+        the collation).
+
+        Parameters
+        ----------
+        batch_size : int, optional
+            Number of samples of each batch
+        num_channels : int, optional
+            Number of channels of each sample
+        num_time_steps : int, optional
+            Number of time steps of each sample
+        num_batches : int, optional
+            Number of batches transformed by each mode
+        device : str, optional
+            The device of the torch tensors. If None, use "cuda" if available,
+            else "cpu".
+        name : str, optional
+            Name of the experiment
+        """
+        super().__init__(name=name, *args, **kwargs)
+        self.batch_size = batch_size
+        self.num_channels = num_channels
+        self.num_time_steps = num_time_steps
+        self.num_batches = num_batches
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+
+    def _throughput(self, function, batch) -> float:
+        # Warm up (e.g., CUDA kernels)
+        function(batch)
+        if self.device.startswith("cuda"):
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        for _ in range(self.num_batches):
+            function(batch)
+        if self.device.startswith("cuda"):
+            torch.cuda.synchronize()
+        elapsed = time.perf_counter() - start
+        return self.num_batches * self.batch_size / elapsed
+
+    def run(self) -> dict:
+        if self.seed is not None:
+            np.random.seed(self.seed)
+            torch.manual_seed(self.seed)
+
+        batch = np.random.randn(
+            self.batch_size, self.num_channels, self.num_time_steps
+        ).astype("float32")
+        tensor = torch.from_numpy(batch).to(self.device)
+
+        transforms = [
+            Scale(),
+            AddGaussianNoise(),
+            Rotate(),
+            MagnitudeWrap(),
+            TimeAmplitudeModulation(),
+            RandomSmoothing(sigma_range=(0.5, 2.0)),
+        ]
+
+        results = {}
+        for transform in transforms:
+            name = transform.__class__.__name__
+            per_sample = self._throughput(
+                lambda x: [transform(sample) for sample in x], batch
+            )
+            per_batch = self._throughput(transform, batch)
+            per_batch_torch = self._throughput(transform, tensor)
+            print(
+                f"{name}: per sample {per_sample:.0f} samples/s, "
+                + f"per batch {per_batch:.0f} samples/s, "
+                + f"per batch ({self.device}) {per_batch_torch:.0f} samples/s"
+            )
+            results[name] = {
+                "per_sample": per_sample,
+                "per_batch": per_batch,
+                f"per_batch_{self.device}": per_batch_torch,
+            }
+        return results
+
+
+if __name__ == "__main__":
+    options = {
+        "transforms": TransformsBenchmark,
+    }
+    auto_main(options)
@@ -3,9 +3,15 @@
 import lightning as L
 import torch
 
-from ssl_tools.experiments import LightningSSLTrain, LightningTest, auto_main
+from ssl_tools.experiments import (
+    LightningSSLTrain,
+    LightningTest,
+    LightningEmbed,
+    auto_main,
+)
 from ssl_tools.models.ssl.cpc import build_cpc
 from ssl_tools.data.data_modules import (
+    FrozenBackboneDataModule,
     MultiModalHARSeriesDataModule,
     UserActivityFolderDataModule,
 )
@@ -24,8 +30,12 @@ class CPCTrain(LightningSSLTrain):
         in_channel: int = 6,
         window_size: int = 4,
         pad_length: bool = False,
+        data_format: str = "csv",
+        batched: bool = False,
         num_classes: int = 6,
         update_backbone: bool = False,
+        cache_features: bool = False,
+        features_cache_dir: str = None,
         *args,
         **kwargs,
     ):
@@ -42,11 +52,33 @@ class CPCTrain(LightningSSLTrain):
         pad_length : bool, optional
             If True, the samples are padded to the length of the longest sample
             in the dataset.
+        data_format : str, optional
+            Format of the pre-training data: "csv" (a folder with one CSV file
+            per sample for each split) or "npy" (``x_<split>.npy`` files,
+            which are memory-mapped). Only used in pretrain mode.
+        batched : bool, optional
+            If True, the model is pre-trained with batches of ``batch_size``
+            samples, grouped by length and padded per batch. The crop of
+            every sample of a batch is limited by its shortest sample, to
+            ``min(lengths) // window_size`` windows (e.g., one sample of 30
+            time steps and ``window_size=4`` make every sample of the batch
+            train on 7 windows), which the grouping by length keeps close to
+            the length of each sample. Else, the batch size must be 1. Only
+            used in pretrain mode.
         num_classes : int, optional
             Number of classes in the dataset. Only used in finetune mode.
         update_backbone : bool, optional
             If True, the backbone will be updated during training. Only used in
             finetune mode.
+        cache_features : bool, optional
+            If True, the representations of the backbone are computed once
+            for each split and the head is trained directly on them (linear
+            probing), instead of running the backbone at every epoch. The
+            backbone is frozen. Only used in finetune mode.
+        features_cache_dir : str, optional
+            Directory where the representations are stored, to be reused by
+            the next runs with the same backbone weights and data. Only used in
+            finetune mode, with ``cache_features``.
         """
         super().__init__(*args, **kwargs)
         self.data = data
@@ -54,8 +86,15 @@ class CPCTrain(LightningSSLTrain):
         self.in_channel = in_channel
         self.window_size = window_size
         self.pad_length = pad_length
+        self.data_format = data_format
+        self.batched = batched
         self.num_classes = num_classes
         self.update_backbone = update_backbone
+        self.cache_features = cache_features
+        self.features_cache_dir = features_cache_dir
+        assert not (
+            cache_features and update_backbone
+        ), "cache_features requires a frozen backbone (update_backbone=False)"
 
     def get_pretrain_model(self) -> L.LightningModule:
         model = build_cpc(
@@ -64,6 +103,7 @@ class CPCTrain(LightningSSLTrain):
             learning_rate=self.learning_rate,
             window_size=self.window_size,
             n_size=5,
+            batched=self.batched,
         )
         return model
 
@@ -72,7 +112,9 @@ class CPCTrain(LightningSSLTrain):
             data_path=self.data,
             batch_size=self.batch_size,
             pad=self.pad_length,
+            data_format=self.data_format,
             num_workers=self.num_workers,
+            bucket_batching=self.batched,
         )
         return data_module
 
@@ -97,6 +139,7 @@ class CPCTrain(LightningSSLTrain):
             learning_rate=self.learning_rate,
             metrics={"acc": Accuracy(task=task, num_classes=self.num_classes)},
             update_backbone=self.update_backbone,
+            precomputed_features=self.cache_features,
         )
         return model
 
@@ -109,6 +152,12 @@ class CPCTrain(LightningSSLTrain):
             num_workers=self.num_workers,
         )
 
+        if self.cache_features:
+            data_module = FrozenBackboneDataModule(
+                data_module,
+                backbone=self.model.backbone,
+                cache_dir=self.features_cache_dir,
+            )
         return data_module
 
 
@@ -185,9 +234,60 @@ class CPCTest(LightningTest):
         return data_module
 
 
+class CPCEmbed(LightningEmbed):
+    _MODEL_NAME = "CPC"
+
+    def __init__(
+        self,
+        data: str,
+        encoding_size: int = 150,
+        in_channel: int = 6,
+        window_size: int = 4,
+        *args,
+        **kwargs,
+    ):
+        """Computes the representations of a split with a pre-trained CPC
+        encoder (loaded with ``load``) and stores them on disk.
+
+        Parameters
+        ----------
+        encoding_size : int, optional
+            Size of the encoding (output of the linear layer)
+        in_channel : int, optional
+            Number of channels in the input data
+        window_size : int, optional
+            Size of the input windows (X_t) to be fed to the encoder
+        """
+        super().__init__(*args, **kwargs)
+        self.data = data
+        self.encoding_size = encoding_size
+        self.in_channel = in_channel
+        self.window_size = window_size
+
+    def get_model(self) -> L.LightningModule:
+        model = build_cpc(
+            encoding_size=self.encoding_size,
+            in_channels=self.in_channel,
+            window_size=self.window_size,
+            n_size=5,
+        )
+        return model
+
+    def get_data_module(self) -> L.LightningDataModule:
+        data_module = MultiModalHARSeriesDataModule(
+            data_path=self.data,
+            batch_size=self.batch_size,
+            label="standard activity code",
+            features_as_channels=True,
+            num_workers=self.num_workers,
+        )
+        return data_module
+
+
 if __name__ == "__main__":
     options = {
         "fit": CPCTrain,
         "test": CPCTest,
+        "embed": CPCEmbed,
     }
     auto_main(options)
@@ -3,12 +3,22 @@
 import lightning as L
 import torch
 
-from ssl_tools.experiments import LightningSSLTrain, LightningTest, auto_main
+from ssl_tools.experiments import (
+    LightningSSLTrain,
+    LightningTest,
+    LightningEmbed,
+    auto_main,
+)
 from torchmetrics import Accuracy
 from ssl_tools.models.ssl.classifier import SSLDiscriminator
 from ssl_tools.models.ssl.modules.heads import TFCPredictionHead
 from ssl_tools.models.ssl.tfc import build_tfc_transformer
-from ssl_tools.data.data_modules import TFCDataModule
+from ssl_tools.data.data_modules import (
+    TFCDataModule,
+    FrozenBackboneDataModule,
+)
+from ssl_tools.transforms.time_1d import AddGaussianNoise
+from ssl_tools.transforms.signal_1d import AddRemoveFrequency
 
 
 class TFCTrain(LightningSSLTrain):
@@ -25,8 +35,14 @@ class TFCTrain(LightningSSLTrain):
         temperature: float = 0.5,
         features_as_channels: bool = False,
         jitter_ratio: float = 2,
+        augment_on_device: bool = False,
+        cache_frequency: bool = False,
+        gather_distributed: bool = False,
+        queue_size: int = 0,
         num_classes: int = 6,
         update_backbone: bool = False,
+        cache_features: bool = False,
+        features_cache_dir: str = None,
         *args,
         **kwargs,
     ):
@@ -62,11 +78,38 @@ class TFCTrain(LightningSSLTrain):
         jitter_ratio : float, optional
             Ratio of the standard deviation of the gaussian noise that will be
             added to the data.
+        augment_on_device : bool, optional
+            If True, the data loaders return only the time-domain data and the
+            FFT and the augmentations are computed for the whole batch, in the
+            model device. Only used in pretrain mode.
+        cache_frequency : bool, optional
+            If True, the frequency-domain data is computed once for each split,
+            instead of for every sample at every epoch. Only used in pretrain
+            mode.
+        gather_distributed : bool, optional
+            If True, when training with multiple devices (e.g., with the DDP
+            strategy), the contrastive losses use the representations of the
+            global batch (gathered from all devices) as negatives. Only used
+            in pretrain mode.
+        queue_size : int, optional
+            If greater than 0, the contrastive losses also use, as negatives,
+            the representations of the last ``queue_size`` samples (kept in a
+            queue, for each loss). It allows many negatives with small
+            batches. Only used in pretrain mode.
         num_classes : int, optional
             Number of classes in the dataset. Only used in finetune mode.
         update_backbone : bool, optional
             If True, the backbone will be updated during training. Only used in
             finetune mode.
+        cache_features : bool, optional
+            If True, the representations of the backbone are computed once
+            for each split and the head is trained directly on them (linear
+            probing), instead of running the backbone at every epoch. The
+            backbone is frozen. Only used in finetune mode.
+        features_cache_dir : str, optional
+            Directory where the representations are stored, to be reused by
+            the next runs with the same backbone weights and data. Only used in
+            finetune mode, with ``cache_features``.
         """
         super().__init__(*args, **kwargs)
         self.data = data
@@ -78,8 +121,17 @@ class TFCTrain(LightningSSLTrain):
         self.temperature = temperature
         self.features_as_channels = features_as_channels
         self.jitter_ratio = jitter_ratio
+        self.augment_on_device = augment_on_device
+        self.cache_frequency = cache_frequency
+        self.gather_distributed = gather_distributed
+        self.queue_size = queue_size
         self.num_classes = num_classes
         self.update_backbone = update_backbone
+        self.cache_features = cache_features
+        self.features_cache_dir = features_cache_dir
+        assert not (
+            cache_features and update_backbone
+        ), "cache_features requires a frozen backbone (update_backbone=False)"
 
     def get_pretrain_model(self) -> L.LightningModule:
         model = build_tfc_transformer(
@@ -89,6 +141,11 @@ class TFCTrain(LightningSSLTrain):
             use_cosine_similarity=self.use_cosine_similarity,
             temperature=self.temperature,
             learning_rate=self.learning_rate,
+            time_transforms=[AddGaussianNoise(std=self.jitter_ratio)],
+            frequency_transforms=[AddRemoveFrequency()],
+            augment_on_device=self.augment_on_device,
+            gather_distributed=self.gather_distributed,
+            queue_size=self.queue_size,
         )
         return model
 
@@ -102,6 +159,8 @@ class TFCTrain(LightningSSLTrain):
             jitter_ratio=self.jitter_ratio,
             num_workers=self.num_workers,
             only_time_frequency=False,
+            only_time=self.augment_on_device,
+            cache_frequency=self.cache_frequency,
         )
         return data_module
 
@@ -126,6 +185,7 @@ class TFCTrain(LightningSSLTrain):
             learning_rate=self.learning_rate,
             metrics={"acc": Accuracy(task=task, num_classes=self.num_classes)},
             update_backbone=self.update_backbone,
+            precomputed_features=self.cache_features,
         )
         return model
 
@@ -140,6 +200,12 @@ class TFCTrain(LightningSSLTrain):
             num_workers=self.num_workers,
             only_time_frequency=True,
         )
+        if self.cache_features:
+            data_module = FrozenBackboneDataModule(
+                data_module,
+                backbone=self.model.backbone,
+                cache_dir=self.features_cache_dir,
+            )
         return data_module
 
 
@@ -245,9 +311,73 @@ class TFCTest(LightningTest):
         return data_module
 
 
+class TFCEmbed(LightningEmbed):
+    _MODEL_NAME = "TFC"
+
+    def __init__(
+        self,
+        data: str,
+        label: str = "standard activity code",
+        encoding_size: int = 128,
+        in_channels: int = 6,
+        length_alignment: int = 178,
+        features_as_channels: bool = False,
+        *args,
+        **kwargs,
+    ):
+        """Computes the representations of a split with a pre-trained TFC
+        model (loaded with ``load``) and stores them on disk. The
+        representation is the concatenation of the time and frequency
+        encodings, of size 2*encoding_size.
+
+        Parameters
+        ----------
+        label : str, optional
+            Name of the column with the labels.
+        encoding_size : int, optional
+            Size of the encoding (output of the linear layer).
+        in_channels : int, optional
+            Number of channels in the input data
+        length_alignment : int, optional
+            Truncate the features to this value.
+        features_as_channels : bool, optional
+            If true, features will be transposed to (C, T), where C is the
+            number of features and T is the number of time steps. If False,
+            features will be (T*C, )
+        """
+        super().__init__(*args, **kwargs)
+        self.data = data
+        self.label = label
+        self.encoding_size = encoding_size
+        self.in_channels = in_channels
+        self.length_alignment = length_alignment
+        self.features_as_channels = features_as_channels
+
+    def get_model(self) -> L.LightningModule:
+        model = build_tfc_transformer(
+            encoding_size=self.encoding_size,
+            in_channels=self.in_channels,
+            length_alignment=self.length_alignment,
+        )
+        return model
+
+    def get_data_module(self) -> L.LightningDataModule:
+        data_module = TFCDataModule(
+            self.data,
+            batch_size=self.batch_size,
+            label=self.label,
+            features_as_channels=self.features_as_channels,
+            length_alignment=self.length_alignment,
+            num_workers=self.num_workers,
+            only_time_frequency=True,
+        )
+        return data_module
+
+
 if __name__ == "__main__":
     options = {
         "fit": TFCTrain,
         "test": TFCTest,
+        "embed": TFCEmbed,
     }
     auto_main(options)
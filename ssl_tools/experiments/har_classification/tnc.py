@@ -8,6 +8,7 @@ import torch
 
 from ssl_tools.models.ssl.tnc import build_tnc
 from ssl_tools.data.data_modules import (
+    FrozenBackboneDataModule,
     TNCHARDataModule,
     MultiModalHARSeriesDataModule,
 )
@@ -18,7 +19,12 @@ from ssl_tools.models.ssl.modules.heads import TNCPredictionHead
 import lightning as L
 import torch
 
-from ssl_tools.experiments import LightningSSLTrain, LightningTest, auto_main
+from ssl_tools.experiments import (
+    LightningSSLTrain,
+    LightningTest,
+    LightningEmbed,
+    auto_main,
+)
 from torchmetrics import Accuracy
 from ssl_tools.models.ssl.classifier import SSLDiscriminator
 
@@ -37,8 +43,13 @@ class TNCTrain(LightningSSLTrain):
         significance_level: float = 0.01,
         repeat: int = 5,
         pad_length: bool = True,
+        data_format: str = "csv",
+        precompute_stationarity: bool = False,
+        stationarity_cache_dir: str = None,
         num_classes: int = 6,
         update_backbone: bool = False,
+        cache_features: bool = False,
+        features_cache_dir: str = None,
         *args,
         **kwargs,
     ):
@@ -63,11 +74,31 @@ class TNCTrain(LightningSSLTrain):
         pad_length : bool, optional
             If True, the samples are padded to the length of the longest sample
             in the dataset.
+        data_format : str, optional
+            Format of the pre-training data: "csv" (a folder with one CSV file
+            per sample for each split) or "npy" (``x_<split>.npy`` files,
+            which are memory-mapped). Only used in pretrain mode.
+        precompute_stationarity : bool, optional
+            If True, the ADF tests used to select the neighbourhood of each
+            sample are run once, before training, and only looked up when
+            sampling. Only used in pretrain mode.
+        stationarity_cache_dir : str, optional
+            Directory where the precomputed ADF results are persisted, to be
+            reused by the next runs. Only used in pretrain mode.
         num_classes : int, optional
             Number of classes in the dataset. Only used in finetune mode.
         update_backbone : bool, optional
             If True, the backbone will be updated during training. Only used in
             finetune mode.
+        cache_features : bool, optional
+            If True, the representations of the backbone are computed once
+            for each split and the head is trained directly on them (linear
+            probing), instead of running the backbone at every epoch. The
+            backbone is frozen. Only used in finetune mode.
+        features_cache_dir : str, optional
+            Directory where the representations are stored, to be reused by
+            the next runs with the same backbone weights and data. Only used in
+            finetune mode, with ``cache_features``.
         """
         super().__init__(*args, **kwargs)
         self.data = data
@@ -79,8 +110,16 @@ class TNCTrain(LightningSSLTrain):
         self.significance_level = significance_level
         self.repeat = repeat
         self.pad_length = pad_length
+        self.data_format = data_format
+        self.precompute_stationarity = precompute_stationarity
+        self.stationarity_cache_dir = stationarity_cache_dir
         self.num_classes = num_classes
         self.update_backbone = update_backbone
+        self.cache_features = cache_features
+        self.features_cache_dir = features_cache_dir
+        assert not (
+            cache_features and update_backbone
+        ), "cache_features requires a frozen backbone (update_backbone=False)"
 
     def get_pretrain_model(self) -> L.LightningModule:
         model = build_tnc(
@@ -100,6 +139,9 @@ class TNCTrain(LightningSSLTrain):
             mc_sample_size=self.mc_sample_size,
             significance_level=self.significance_level,
             repeat=self.repeat,
+            data_format=self.data_format,
+            precompute_stationarity=self.precompute_stationarity,
+            stationarity_cache_dir=self.stationarity_cache_dir,
             batch_size=self.batch_size,
             num_workers=self.num_workers,
         )
@@ -129,6 +171,8 @@ class TNCTrain(LightningSSLTrain):
             head=classifier,
             loss_fn=torch.nn.CrossEntropyLoss(),
             learning_rate=self.learning_rate,
+            update_backbone=self.update_backbone,
+            precomputed_features=self.cache_features,
             metrics={"acc": Accuracy(task=task, num_classes=self.num_classes)},
         )
         return model
@@ -141,6 +185,12 @@ class TNCTrain(LightningSSLTrain):
             features_as_channels=True,
         )
 
+        if self.cache_features:
+            data_module = FrozenBackboneDataModule(
+                data_module,
+                backbone=self.model.backbone,
+                cache_dir=self.features_cache_dir,
+            )
         return data_module
 
 
@@ -214,9 +264,65 @@ class TNCTest(LightningTest):
         return data_module
 
 
+class TNCEmbed(LightningEmbed):
+    _MODEL_NAME = "TNC"
+
+    def __init__(
+        self,
+        data: str,
+        encoding_size: int = 10,
+        in_channel: int = 6,
+        mc_sample_size: int = 20,
+        w: float = 0.05,
+        *args,
+        **kwargs,
+    ):
+        """Computes the representations of a split with a pre-trained TNC
+        encoder (loaded with ``load``) and stores them on disk.
+
+        Parameters
+        ----------
+        encoding_size : int, optional
+            Size of the encoding (output of the linear layer)
+        in_channel : int, optional
+            Number of channels in the input data
+        mc_sample_size : int, optional
+            Number of pairs of samples generated for each sample (as in
+            pre-training)
+        w : float, optional
+            Unlabeled data correction factor (as in pre-training)
+        """
+        super().__init__(*args, **kwargs)
+        self.data = data
+        self.encoding_size = encoding_size
+        self.in_channel = in_channel
+        self.mc_sample_size = mc_sample_size
+        self.w = w
+
+    def get_model(self) -> L.LightningModule:
+        model = build_tnc(
+            encoding_size=self.encoding_size,
+            in_channel=self.in_channel,
+            mc_sample_size=self.mc_sample_size,
+            w=self.w,
+        )
+        return model
+
+    def get_data_module(self) -> L.LightningDataModule:
+        data_module = MultiModalHARSeriesDataModule(
+            self.data,
+            batch_size=self.batch_size,
+            label="standard activity code",
+            features_as_channels=True,
+            num_workers=self.num_workers,
+        )
+        return data_module
+
+
 if __name__ == "__main__":
     options = {
         "fit": TNCTrain,
         "test": TNCTest,
+        "embed": TNCEmbed,
     }
     auto_main(options)
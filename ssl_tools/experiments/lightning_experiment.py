@@ -5,8 +5,10 @@ import lightning as L
 from lightning.pytorch.loggers import Logger, CSVLogger
 from lightning.pytorch.callbacks import ModelCheckpoint, RichProgressBar
 import torch
+from torch.utils.data import Subset
 from ssl_tools.callbacks.performance import PerformanceLog
 from ssl_tools.experiments.experiment import Experiment
+from ssl_tools.utils.embeddings import EmbeddingShardWriter, write_embeddings
 
 class LightningExperiment(Experiment):
     _MODEL_NAME: str = "model"
@@ -421,6 +423,152 @@ class LightningTest(LightningExperiment):
         return trainer.test(model, data_module)
 
 
+class LightningEmbed(LightningExperiment):
+    _STAGE_NAME = "embed"
+
+    def __init__(
+        self,
+        split: str = "test",
+        output_dir: str = None,
+        shard_size: int = 65536,
+        embedding_dtype: str = "float32",
+        resume: bool = True,
+        *args,
+        **kwargs,
+    ):
+        """Encode a split of the data with a (pre-trained) model and store
+        the embeddings and labels on disk, as ``.npy`` shards described by a
+        JSON manifest (see ``EmbeddingShardWriter``). The batches are passed
+        through ``model.forward`` in inference mode and only one shard is
+        kept in memory at a time. The model is usually a backbone (e.g., TNC,
+        CPC or TFC), loaded from a pre-training checkpoint with ``load``.
+
+        If interrupted, running it again with the same ``output_dir``
+        continues after the last complete shard. The samples of each split are
+        encoded in order (without shuffling), thus the i-th embedding is the
+        i-th sample of the split.
+
+        The data module must have a ``datasets`` dictionary (filled by
+        ``setup``) and a ``_get_loader(split_name, shuffle)`` method, as the
+        data modules of ``ssl_tools.data.data_modules``.
+
+        Parameters
+        ----------
+        split : str, optional
+            The split to encode ("train", "validation", "test" or "predict")
+        output_dir : str, optional
+            The directory where the shards are written. If None, it is
+            ``<experiment_dir>/embeddings/<split>``. Set it (and ``run_id``)
+            to resume an interrupted run.
+        shard_size : int, optional
+            Number of samples of each shard
+        embedding_dtype : str, optional
+            The type of the stored embeddings
+        resume : bool, optional
+            If True, continue from the shards already in ``output_dir``. Else,
+            they are overwritten.
+        """
+        super().__init__(*args, **kwargs)
+        self.split = split
+        self.output_dir = output_dir
+        self.shard_size = shard_size
+        self.embedding_dtype = embedding_dtype
+        self.resume = resume
+        assert self.split in ["train", "validation", "test", "predict"]
+
+    @property
+    def embeddings_dir(self) -> Path:
+        if self.output_dir is not None:
+            return Path(self.output_dir)
+        return self.experiment_dir / "embeddings" / self.split
+
+    def get_callbacks(self) -> List[L.Callback]:
+        """Get the callbacks to use for the experiment.
+
+        Returns
+        -------
+        List[L.Callback]
+            The list of callbacks to use for the experiment.
+        """
+        return []
+
+    def get_trainer(
+        self, logger: Logger, callbacks: List[L.Callback]
+    ) -> L.Trainer:
+        """Get trainer to use for the experiment. It is only used to select
+        the device where the model is executed (a single device).
+
+        Parameters
+        ----------
+        logger : _type_
+            The logger to use for the experiment
+        callbacks : List[L.Callback]
+            A list of callbacks to use for the experiment
+
+        Returns
+        -------
+        L.Trainer
+            The trainer to use for the experiment
+        """
+        return L.Trainer(
+            logger=logger,
+            callbacks=callbacks,
+            accelerator=self.accelerator,
+            devices=1,
+        )
+
+    def run_model(
+        self,
+        model: L.LightningModule,
+        data_module: L.LightningDataModule,
+        trainer: L.Trainer,
+    ) -> Path:
+        stage = "fit" if self.split in ["train", "validation"] else self.split
+        data_module.setup(stage)
+        dataset = data_module.datasets[self.split]
+
+        writer = EmbeddingShardWriter(
+            self.embeddings_dir,
+            shard_size=self.shard_size,
+            dtype=self.embedding_dtype,
+            resume=self.resume,
+            metadata={
+                "model": self._MODEL_NAME,
+                "load": str(self.load) if self.load else None,
+                "data": str(getattr(data_module, "data_path", None)),
+                "split": self.split,
+                "num_samples": len(dataset),
+            },
+        )
+        if writer.complete:
+            print(f"Embeddings already computed at: {self.embeddings_dir}")
+            return self.embeddings_dir
+
+        # Skip the samples already stored (when resuming)
+        if writer.num_samples > 0:
+            print(f"Resuming after {writer.num_samples} samples")
+            data_module.datasets[self.split] = Subset(
+                dataset, range(writer.num_samples, len(dataset))
+            )
+
+        print(
+            "Computing embeddings of "
+            + f"{len(data_module.datasets[self.split])} samples"
+        )
+        print(f"\tOutput path: {self.embeddings_dir}")
+        try:
+            loader = data_module._get_loader(self.split, shuffle=False)
+            write_embeddings(
+                model, loader, writer, device=trainer.strategy.root_device
+            )
+            writer.close()
+        finally:
+            data_module.datasets[self.split] = dataset
+
+        print(f"Embeddings saved at: {self.embeddings_dir}")
+        return self.embeddings_dir
+
+
 class LightningSSLTrain(LightningTrain):
     def __init__(
         self,
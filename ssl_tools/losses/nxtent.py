@@ -1,6 +1,10 @@
+from typing import Tuple
+
 import torch
-import numpy as np
 import lightning as L
+from torch.utils.checkpoint import checkpoint
+
+from ssl_tools.utils.distributed import gather_with_grad
 
 
 class NTXentLoss_poly(L.LightningModule):
@@ -8,88 +12,167 @@ class NTXentLoss_poly(L.LightningModule):
         self,
         temperature: float = 0.2,
         use_cosine_similarity: bool = True,
+        chunk_size: int = None,
+        gather_distributed: bool = False,
     ):
+        """Normalized Temperature-scaled Cross Entropy (NT-Xent) loss, with
+        the poly-1 term, as used by TFC.
+
+        The 2B representations (B from each view) are compared with each
+        other. For each representation, the positive is the representation of
+        the other view of the same sample and the negatives are all the other
+        representations (except itself). The cross entropy is computed with a
+        log-sum-exp over each row of the similarity matrix, masking only the
+        diagonal. Thus, the negatives are never gathered into a new tensor.
+
+        Parameters
+        ----------
+        temperature : float, optional
+            The temperature that scales the similarities
+        use_cosine_similarity : bool, optional
+            If True, use the cosine similarity (the representations are
+            normalized and multiplied). Else, use the dot product.
+        chunk_size : int, optional
+            If not None, the rows of the similarity matrix are computed in
+            chunks of ``chunk_size`` rows, with activation checkpointing.
+            Thus, only a (chunk_size, 2B) block is kept in memory at a time
+            (also for the backward pass, where the blocks are recomputed),
+            instead of the whole (2B, 2B) matrix. Useful for large batches.
+        gather_distributed : bool, optional
+            If True and ``torch.distributed`` is initialized (e.g., DDP), the
+            representations of all processes are gathered (keeping the
+            gradients) before computing the loss. Thus, the negatives of each
+            representation come from the global batch, not only from the
+            local one, and every process computes the same (global) loss. All
+            processes must have batches of the same size (e.g., use
+            ``drop_last``).
+        """
         super(NTXentLoss_poly, self).__init__()
         self.temperature = temperature
-        self.softmax = torch.nn.Softmax(dim=-1)
-        self.similarity_function = self._get_similarity_function(
-            use_cosine_similarity
-        )
-        self.criterion = torch.nn.CrossEntropyLoss(reduction="sum")
+        self.use_cosine_similarity = use_cosine_similarity
+        self.chunk_size = chunk_size
+        self.gather_distributed = gather_distributed
+        # Masks of the diagonal, for each (2B, device)
+        self._masks = {}
 
-    def _get_similarity_function(self, use_cosine_similarity):
-        if use_cosine_similarity:
-            self._cosine_similarity = torch.nn.CosineSimilarity(dim=-1)
-            return self._cosine_simililarity
-        else:
-            return self._dot_simililarity
-
-    def _get_correlated_mask(self, batch_size):
-        diag = np.eye(2 * batch_size)
-        l1 = np.eye((2 * batch_size), 2 * batch_size, k=-batch_size)
-        l2 = np.eye((2 * batch_size), 2 * batch_size, k=batch_size)
-        mask = torch.from_numpy((diag + l1 + l2))
-        mask = (1 - mask).type(torch.bool)
-        return mask.to(self.device)
-
-    @staticmethod
-    def _dot_simililarity(x, y):
-        v = torch.tensordot(x.unsqueeze(1), y.T.unsqueeze(0), dims=2)
-        # x shape: (N, 1, C)
-        # y shape: (1, C, 2N)
-        # v shape: (N, 2N)
-        return v
-
-    def _cosine_simililarity(self, x, y):
-        # x shape: (N, 1, C)
-        # y shape: (1, 2N, C)
-        # v shape: (N, 2N)
-        v = self._cosine_similarity(x.unsqueeze(1), y.unsqueeze(0))
-        return v
+    def _get_self_mask(self, size: int, device: torch.device) -> torch.Tensor:
+        """Boolean mask of the diagonal of the (size, size) similarity matrix
+        (the similarity of each representation with itself). It is created
+        once for each size and device."""
+        key = (size, device)
+        if key not in self._masks:
+            self._masks[key] = torch.eye(size, dtype=torch.bool, device=device)
+        return self._masks[key]
+
+    def _rows_statistics(
+        self,
+        rows: torch.Tensor,
+        representations: torch.Tensor,
+        mask: torch.Tensor,
+        partners: torch.Tensor,
+        negatives: torch.Tensor = None,
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Compute, for some rows of the similarity matrix, the log-sum-exp of
+        the logits (excluding the diagonal, and including the extra negatives,
+        if any) and the logit of the positive.
+
+        Parameters
+        ----------
+        rows : torch.Tensor
+            The representations of the rows, with shape (R, C)
+        representations : torch.Tensor
+            All representations, with shape (2B, C)
+        mask : torch.Tensor
+            The rows of the diagonal mask, with shape (R, 2B)
+        partners : torch.Tensor
+            The index of the positive of each row, with shape (R, )
+        negatives : torch.Tensor, optional
+            Extra negatives of all rows, with shape (Q, C)
+
+        Returns
+        -------
+        Tuple[torch.Tensor, torch.Tensor]
+            The log-sum-exp and the positive logit of each row, both with
+            shape (R, ).
+        """
+        logits = (rows @ representations.T) / self.temperature
+        positives = logits.gather(1, partners.unsqueeze(1)).squeeze(1)
+        logits = logits.masked_fill(mask, float("-inf"))
+        if negatives is not None:
+            logits = torch.cat(
+                [logits, (rows @ negatives.T) / self.temperature], dim=-1
+            )
+        return torch.logsumexp(logits, dim=-1), positives
+
+    def _extra_negatives(self, representations: torch.Tensor) -> torch.Tensor:
+        """Negatives shared by all rows, besides the other representations of
+        the batch. The base loss has none.
+
+        Parameters
+        ----------
+        representations : torch.Tensor
+            The representations of the batch, with shape (2B, C)
+
+        Returns
+        -------
+        torch.Tensor
+            The extra negatives, with shape (Q, C), or None.
+        """
+        return None
 
     def forward(self, zis, zjs):
+        if self.gather_distributed:
+            zis = gather_with_grad(zis)
+            zjs = gather_with_grad(zjs)
+
         batch_size = zis.shape[0]
-        mask_samples_from_same_repr = self._get_correlated_mask(
-            batch_size
-        ).type(torch.bool)
+        size = 2 * batch_size
 
         representations = torch.cat([zjs, zis], dim=0)
+        if self.use_cosine_similarity:
+            representations = torch.nn.functional.normalize(
+                representations, dim=-1, eps=1e-8
+            )
 
-        similarity_matrix = self.similarity_function(
-            representations, representations
-        )
+        mask = self._get_self_mask(size, representations.device)
+        # The positive of the i-th representation is the (i + B)-th (mod 2B)
+        partners = (
+            torch.arange(size, device=representations.device) + batch_size
+        ) % size
 
-        # filter out the scores from the positive samples
-        l_pos = torch.diag(similarity_matrix, batch_size)
-        r_pos = torch.diag(similarity_matrix, -batch_size)
-        positives = torch.cat([l_pos, r_pos]).view(2 * batch_size, 1)
+        negatives = self._extra_negatives(representations)
+        num_logits = size - 1
+        if negatives is not None:
+            num_logits += negatives.shape[0]
 
-        negatives = similarity_matrix[mask_samples_from_same_repr].view(
-            2 * batch_size, -1
-        )
+        chunk_size = self.chunk_size or size
+        if chunk_size >= size:
+            lse, positives = self._rows_statistics(
+                representations, representations, mask, partners, negatives
+            )
+        else:
+            results = [
+                checkpoint(
+                    self._rows_statistics,
+                    representations[start : start + chunk_size],
+                    representations,
+                    mask[start : start + chunk_size],
+                    partners[start : start + chunk_size],
+                    negatives,
+                    use_reentrant=False,
+                )
+                for start in range(0, size, chunk_size)
+            ]
+            lse = torch.cat([result[0] for result in results])
+            positives = torch.cat([result[1] for result in results])
 
-        logits = torch.cat((positives, negatives), dim=1)
-        logits /= self.temperature
+        # Cross entropy with the positive as the target (summed over rows)
+        CE = torch.sum(lse - positives)
 
-        """Criterion has an internal one-hot function. Here, make all positives as 1 while all negatives as 0. """
-        labels = torch.zeros(2 * batch_size).to(self.device).long()
-        CE = self.criterion(logits, labels)
-
-        onehot_label = (
-            torch.cat(
-                (
-                    torch.ones(2 * batch_size, 1),
-                    torch.zeros(2 * batch_size, negatives.shape[-1]),
-                ),
-                dim=-1,
-            )
-            .to(self.device)
-            .long()
-        )
-        # Add poly loss
-        pt = torch.mean(
-            onehot_label * torch.nn.functional.softmax(logits, dim=-1)
-        )
+        # Add poly loss. pt is the mean of the one-hot label times the
+        # softmax of the logits, over the (2B, 2B - 1 + Q) logits (positive
+        # and negatives) of every row
+        pt = torch.sum(torch.exp(positives - lse)) / (size * num_logits)
 
         epsilon = batch_size
         # loss = CE/ (2 * batch_size) + epsilon*(1-pt) # replace 1 by 1/batch_size
@@ -97,3 +180,107 @@ class NTXentLoss_poly(L.LightningModule):
         # loss = CE / (2 * batch_size)
 
         return loss
+
+
+class NTXentQueueLoss(NTXentLoss_poly):
+    def __init__(
+        self,
+        queue_size: int = 4096,
+        temperature: float = 0.2,
+        use_cosine_similarity: bool = True,
+        chunk_size: int = None,
+        gather_distributed: bool = False,
+    ):
+        """NT-Xent loss (``NTXentLoss_poly``) with a queue of representations
+        from previous batches, used as extra negatives (as in MoCo). Thus, the
+        number of negatives of each representation is ``2B - 2 + queue_size``,
+        while only the current batch is encoded (and kept in memory for the
+        backward pass).
+
+        The queue is a first-in, first-out buffer with the (normalized, if
+        ``use_cosine_similarity``) representations of the last batches, with
+        no gradients. It is only used and updated in training mode. In eval
+        mode, this loss is the same as ``NTXentLoss_poly``. It is not saved
+        in checkpoints.
+
+        Note that a loss instance must only be used with a single pair of
+        representation spaces (e.g., one instance for each loss of TFC), as
+        all representations passed to it are stored in the same queue.
+
+        Parameters
+        ----------
+        queue_size : int, optional
+            Maximum number of representations in the queue
+        temperature : float, optional
+            The temperature that scales the similarities
+        use_cosine_similarity : bool, optional
+            If True, use the cosine similarity. Else, use the dot product.
+        chunk_size : int, optional
+            If not None, the rows of the similarity matrix are computed in
+            chunks of ``chunk_size`` rows (see ``NTXentLoss_poly``).
+        gather_distributed : bool, optional
+            If True, the representations of all processes are gathered before
+            computing the loss (see ``NTXentLoss_poly``). The queue then
+            stores the gathered representations, thus it is the same in all
+            processes.
+        """
+        super().__init__(
+            temperature=temperature,
+            use_cosine_similarity=use_cosine_similarity,
+            chunk_size=chunk_size,
+            gather_distributed=gather_distributed,
+        )
+        assert queue_size > 0, "queue_size must be positive"
+        self.queue_size = queue_size
+        # The queue is created in the first batch, when the size of the
+        # representations is known
+        self.register_buffer("queue", None, persistent=False)
+        self._queue_pointer = 0
+        self._queue_length = 0
+
+    def reset_queue(self):
+        """Empty the queue."""
+        self.queue = None
+        self._queue_pointer = 0
+        self._queue_length = 0
+
+    @torch.no_grad()
+    def _enqueue(self, representations: torch.Tensor):
+        """Insert the representations in the queue, replacing the oldest ones
+        if the queue is full.
+
+        Parameters
+        ----------
+        representations : torch.Tensor
+            The representations, with shape (N, C)
+        """
+        representations = representations.detach()[-self.queue_size :]
+        if self.queue is None:
+            self.queue = representations.new_zeros(
+                (self.queue_size, representations.shape[1])
+            )
+        assert (
+            self.queue.shape[1] == representations.shape[1]
+        ), "The size of the representations changed. Use one loss per space."
+        index = (
+            torch.arange(representations.shape[0], device=self.queue.device)
+            + self._queue_pointer
+        ) % self.queue_size
+        self.queue[index] = representations.to(self.queue.dtype)
+        self._queue_pointer = (
+            self._queue_pointer + representations.shape[0]
+        ) % self.queue_size
+        self._queue_length = min(
+            self._queue_length + representations.shape[0], self.queue_size
+        )
+
+    def _extra_negatives(self, representations: torch.Tensor) -> torch.Tensor:
+        if not self.training:
+            return None
+        negatives = None
+        if self._queue_length > 0:
+            # Clone, as the queue is updated in place below, and the
+            # negatives could be used again in the backward pass (chunks)
+            negatives = self.queue[: self._queue_length].clone()
+        self._enqueue(representations)
+        return negatives
@@ -14,6 +14,7 @@ class SSLDiscriminator(L.LightningModule):
         update_backbone: bool = True,
         metrics: Dict[str, Metric] = None,
         optimizer_cls: torch.optim.Optimizer = None,
+        precomputed_features: bool = False,
     ):
         """A generic SSL Discriminator model. It takes a backbone and a head
         and trains them jointly (or not, depending on the ``update_backbone``
@@ -26,6 +27,13 @@ class SSLDiscriminator(L.LightningModule):
         4. Backpropagate the loss through the head and the backbone (the latter
         is backpropagated only if ``update_backbone`` is True)
 
+        If ``update_backbone`` is False, the backbone is frozen: its
+        parameters do not require gradients, it is always in eval mode (e.g.,
+        no dropout and fixed batch norm statistics, even while training) and
+        its forward pass runs without autograd. Thus, no activations of the
+        backbone are kept for the backward pass, which only goes through the
+        head.
+
         Parameters
         ----------
         backbone : _type_
@@ -39,10 +47,16 @@ class SSLDiscriminator(L.LightningModule):
             The learning rate to use for the optimizer.
         update_backbone : bool, optional
             If True, the backbone will be updated during training. Otherwise,
-            only the head will be updated.
+            the backbone is frozen and only the head will be updated.
         metrics : Dict[str, Metric], optional
             The metrics to use during training. The keys are the names of the
             metrics, and the values are the metrics themselves.
+        precomputed_features : bool, optional
+            If True, the inputs are the representations of the backbone,
+            already computed (e.g., by ``FrozenBackboneDataModule``), and are
+            passed directly to the head. The backbone is kept (e.g., to be
+            saved in checkpoints), but it is not executed nor updated. It
+            requires ``update_backbone=False``.
         """
         super().__init__()
         self.backbone = backbone
@@ -52,6 +66,14 @@ class SSLDiscriminator(L.LightningModule):
         self.update_backbone = update_backbone
         self.metrics = metrics
         self.optimizer_cls = optimizer_cls or torch.optim.Adam
+        self.precomputed_features = precomputed_features
+        assert not (
+            precomputed_features and update_backbone
+        ), "precomputed_features requires update_backbone=False"
+
+        if not self.update_backbone:
+            self._freeze(self.backbone)
+            self.backbone.eval()
 
     def _loss_func(self, y_hat: torch.Tensor, y: torch.Tensor):
         """Calculates the loss function.
@@ -90,6 +112,20 @@ class SSLDiscriminator(L.LightningModule):
             for metric_name, metric in self.metrics.items()
         }
 
+    def train(self, mode: bool = True):
+        """Set the training mode of the model. A frozen backbone (if
+        ``update_backbone`` is False) is kept in eval mode.
+
+        Parameters
+        ----------
+        mode : bool, optional
+            If True, set the training mode. Else, set the evaluation mode.
+        """
+        super().train(mode)
+        if not self.update_backbone:
+            self.backbone.eval()
+        return self
+
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         """Performs a forward pass through the model. It first passes the input
         through the backbone, and then passes the output of the backbone through
@@ -99,17 +135,25 @@ class SSLDiscriminator(L.LightningModule):
         ----------
         x : torch.Tensor
             The input data. If it is a tuple or a list, it will be unpacked
-            before being passed to the backbone.
+            before being passed to the backbone. If ``precomputed_features``
+            is True, it is the output of the backbone.
 
         Returns
         -------
         torch.Tensor
             The predictions of the model.
         """
-        if isinstance(x, tuple) or isinstance(x, list):
-            encodings = self.backbone.forward(*x)
+        if self.precomputed_features:
+            encodings = x
         else:
-            encodings = self.backbone.forward(x)
+            # A frozen backbone does not need autograd
+            with torch.set_grad_enabled(
+                self.update_backbone and torch.is_grad_enabled()
+            ):
+                if isinstance(x, tuple) or isinstance(x, list):
+                    encodings = self.backbone.forward(*x)
+                else:
+                    encodings = self.backbone.forward(x)
 
         if len(encodings.shape) == 1:
             encodings = encodings.unsqueeze(0)
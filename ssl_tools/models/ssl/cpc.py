@@ -4,8 +4,9 @@ import numpy as np
 
 from ssl_tools.utils.configurable import Configurable
 from ssl_tools.models.layers.gru import GRUEncoder
+from ssl_tools.utils.rng import RandomStateMixin
 
-class CPC(L.LightningModule, Configurable):
+class CPC(L.LightningModule, Configurable, RandomStateMixin):
     """Implements the Contrastive Predictive Coding (CPC) model, as described in
     https://arxiv.org/abs/1807.03748. The implementation was adapted from
     https://github.com/sanatonek/TNC_representation_learning
@@ -27,6 +28,7 @@ class CPC(L.LightningModule, Configurable):
         weight_decay: float = 0.0,
         window_size: int = 4,
         n_size: int = 5,
+        batched: bool = False,
     ):
         """Implements the Contrastive Predictive Coding (CPC) model.
 
@@ -51,6 +53,17 @@ class CPC(L.LightningModule, Configurable):
         n_size : int, optional
             Number of negative samples to be used in the contrastive loss
             (steps to predict)
+        batched : bool, optional
+            If True, batches with multiple samples are processed at once (see
+            ``_batched_step``). Batches may be a tensor of shape (B, C, T), or
+            a tuple from ``PadCollate`` (``(data, lengths)`` or
+            ``(data, labels, lengths)``), when samples have different lengths.
+            The crop of every sample of a batch is limited by its shortest
+            sample, to ``min(lengths) // window_size`` windows (e.g., with
+            ``window_size=4``, one sample of 30 time steps makes every sample
+            of its batch train on 7 windows), thus batches should group
+            samples of similar lengths (e.g., ``bucket_batching`` of the data
+            modules). If False, batches must have a single sample.
         """
         super().__init__()
         self.encoder = encoder
@@ -60,6 +73,7 @@ class CPC(L.LightningModule, Configurable):
         self.weight_decay = weight_decay
         self.window_size = window_size
         self.n_size = n_size
+        self.batched = batched
         self.loss_func = torch.nn.CrossEntropyLoss()
 
     def loss_function(self, X_N, labels):
@@ -112,7 +126,7 @@ class CPC(L.LightningModule, Configurable):
         # [5 * window_size, T - 5 * window_size]
         # Just to make sure we have enough samples before and after the random
         # time step
-        random_centering_t = np.random.randint(
+        random_centering_t = self.rng.integers(
             5 * self.window_size, time_len - 5 * self.window_size
         )
 
@@ -150,7 +164,7 @@ class CPC(L.LightningModule, Configurable):
         # Select a random time step t, spliting the sample into past and future.
         # t is in the range [2, len(encodings) - 2], thus ensuring that "past"
         # and "future" have at least 2 elements.
-        random_t = np.random.randint(2, len(encodings) - 2)
+        random_t = self.rng.integers(2, len(encodings) - 2)
 
         # Split the encodings into "past" and "future"
         # Pick 10 elements before the random_t and 1 element after it
@@ -183,7 +197,7 @@ class CPC(L.LightningModule, Configurable):
         r = set(range(0, random_t - 2))
         r.update(set(range(random_t + 3, len(encodings))))
         # Select n_size random elements from r
-        rnd_n = np.random.choice(list(r), self.n_size)
+        rnd_n = self.rng.choice(list(r), self.n_size)
 
         # Create a tensor with ``self.n_size`` densitity ratio elements (except
         # the random_t and its neighbors), that constitute the negative samples
@@ -197,6 +211,186 @@ class CPC(L.LightningModule, Configurable):
         )
         return X_N
 
+    def _batched_step(
+        self, sample: torch.Tensor, lengths: torch.Tensor = None
+    ) -> torch.Tensor:
+        """Batched version of ``_step``. All operations are performed on the
+        device of the sample, for all samples of the batch at once.
+
+        For each sample, a segment of (at most) 40 windows is cropped at a
+        random position, the windows are encoded and, for a random time step
+        ``t`` of each sample, the context vector is generated from (at most)
+        11 past encodings. Then, ``n_size`` negative samples are drawn from
+        all windows except ``t`` and its 2 neighbours at each side, and the
+        positive sample is the window at ``t + 1``. The segments have the same
+        number of windows for all samples of the batch, limited by the
+        shortest sample: ``min(40, min(lengths) // window_size)`` windows.
+
+        Parameters
+        ----------
+        sample : torch.Tensor
+            A tensor of shape (B, C, T), where B is the batch size, C is the
+            number of channels and T is the number of time steps.
+        lengths : torch.Tensor, optional
+            A tensor of shape (B, ) with the number of valid time steps of each
+            sample (the remaining are padding). If None, all samples have T
+            valid time steps.
+
+        Returns
+        -------
+        torch.Tensor
+            A tensor of shape (B, n_size + 1), with the log density ratios of
+            the negative samples and, in the last column, of the positive
+            sample.
+        """
+        batch_size, num_channels, time_len = sample.shape
+        device = sample.device
+        if lengths is None:
+            lengths = torch.full((batch_size,), time_len, device=device)
+        lengths = lengths.to(device)
+
+        # ----------------------------------------------------------------------
+        # 1. Crop a segment of the same number of windows from each sample and
+        # split it into windows of size window_size (X_t)
+        # ----------------------------------------------------------------------
+        num_windows = min(40, int(lengths.min()) // self.window_size)
+        assert num_windows > 5, "Sample too short"
+        segment_len = num_windows * self.window_size
+
+        # Random start of the segment, in [0, length - segment_len]
+        starts = (
+            torch.rand(
+                batch_size,
+                device=device,
+                generator=self.torch_generator(device),
+            )
+            * (lengths - segment_len + 1)
+        ).long()
+        time_idx = starts.unsqueeze(1) + torch.arange(
+            segment_len, device=device
+        )
+        segments = torch.gather(
+            sample,
+            2,
+            time_idx.unsqueeze(1).expand(-1, num_channels, -1),
+        )
+
+        # (B, C, num_windows, window_size) -> (B * num_windows, C, window_size)
+        X_ts = segments.unfold(-1, self.window_size, self.window_size)
+        X_ts = X_ts.permute(0, 2, 1, 3).reshape(
+            batch_size * num_windows, num_channels, self.window_size
+        )
+        # Encode all windows at once. Shape: (B, num_windows, encoding_size)
+        encodings = self.forward(X_ts).view(batch_size, num_windows, -1)
+
+        # ----------------------------------------------------------------------
+        # 2. Generate the context vector (c_t) from the past of a random t
+        # ----------------------------------------------------------------------
+        random_t = torch.randint(
+            2,
+            num_windows - 2,
+            (batch_size,),
+            device=device,
+            generator=self.torch_generator(device),
+        )
+        c_t = self._batched_context(encodings, random_t)
+        densities = self.density_estimator(c_t)
+
+        # Log density ratio of every window. Shape: (B, num_windows)
+        log_density_ratios = torch.bmm(
+            encodings, densities.unsqueeze(-1)
+        ).squeeze(-1)
+
+        # ----------------------------------------------------------------------
+        # 3. Select the negative samples (all windows except random_t and its
+        # neighbours) and the positive sample (random_t + 1)
+        # ----------------------------------------------------------------------
+        rnd_n = self._batched_negatives(random_t, num_windows)
+        X_N = torch.cat(
+            [
+                torch.gather(log_density_ratios, 1, rnd_n),
+                torch.gather(
+                    log_density_ratios, 1, (random_t + 1).unsqueeze(1)
+                ),
+            ],
+            dim=1,
+        )
+        return X_N
+
+    def _batched_context(
+        self, encodings: torch.Tensor, random_t: torch.Tensor
+    ) -> torch.Tensor:
+        """Generate the context vector of each sample from (at most) 10
+        encodings before ``random_t`` and the encoding at ``random_t``. The
+        past sequences are left-aligned and packed, so the auto regressor
+        ignores their padding.
+
+        Parameters
+        ----------
+        encodings : torch.Tensor
+            The encodings of the windows, with shape
+            (B, num_windows, encoding_size)
+        random_t : torch.Tensor
+            The time step of each sample, with shape (B, )
+
+        Returns
+        -------
+        torch.Tensor
+            The context vectors (hidden state of the last layer of the auto
+            regressor), with shape (B, encoding_size).
+        """
+        past_len = torch.clamp(random_t + 1, max=11)
+        past_idx = (random_t + 1 - past_len).unsqueeze(1) + torch.arange(
+            11, device=encodings.device
+        )
+        past_idx = torch.minimum(past_idx, random_t.unsqueeze(1))
+        past = torch.gather(
+            encodings,
+            1,
+            past_idx.unsqueeze(-1).expand(-1, -1, encodings.shape[-1]),
+        )
+        past = torch.nn.utils.rnn.pack_padded_sequence(
+            past, past_len.cpu(), batch_first=True, enforce_sorted=False
+        )
+        _, c_t = self.auto_regressor(past)
+        return c_t[-1]
+
+    def _batched_negatives(
+        self, random_t: torch.Tensor, num_windows: int
+    ) -> torch.Tensor:
+        """Draw ``n_size`` negative windows for each sample, from all windows
+        except ``random_t`` and its 2 neighbours at each side. The draws are
+        from the ``num_windows - 5`` candidates, ``[0, t-2) U [t+3, N)``: the
+        ones after ``t-2`` are shifted to skip the 5 excluded windows.
+
+        Parameters
+        ----------
+        random_t : torch.Tensor
+            The time step of each sample, with shape (B, )
+        num_windows : int
+            The number of windows of each sample
+
+        Returns
+        -------
+        torch.Tensor
+            The indices of the negative windows, with shape (B, n_size).
+        """
+        device = random_t.device
+        candidates = (
+            torch.rand(
+                len(random_t),
+                self.n_size,
+                device=device,
+                generator=self.torch_generator(device),
+            )
+            * (num_windows - 5)
+        ).long()
+        return torch.where(
+            candidates < (random_t - 2).unsqueeze(1),
+            candidates,
+            candidates + 5,
+        )
+
     def training_step(self, batch, batch_idx):
         X_N, loss = self._shared_step(batch, batch_idx, "train")
         return loss
@@ -210,15 +404,33 @@ class CPC(L.LightningModule, Configurable):
         return loss
 
     def _shared_step(self, batch, batch_idx, prefix):
-        assert len(batch) == 1, "Batch must be 1 sample only"
-        assert batch.shape[-1] > 5 * self.window_size, "Sample too short"
-
-        # Generate the encoded representations
-        X_N = self._step(batch)
-        # Generate the labels
-        labels = torch.Tensor([len(X_N) - 1]).to(self.device).long()
-        # Calculate the loss
-        loss = self.loss_function(X_N.view(1, -1), labels)
+        if self.batched:
+            # Batches from PadCollate are (data, lengths) or
+            # (data, labels, lengths)
+            if isinstance(batch, (tuple, list)):
+                sample, lengths = batch[0], batch[-1]
+            else:
+                sample, lengths = batch, None
+            # Generate the encoded representations. Shape: (B, n_size + 1)
+            X_N = self._batched_step(sample, lengths)
+            # The positive sample is the last one
+            labels = torch.full(
+                (len(X_N),), X_N.shape[-1] - 1, device=self.device
+            )
+            loss = self.loss_function(X_N, labels)
+            batch_size = len(X_N)
+        else:
+            assert len(batch) == 1, "Batch must be 1 sample only"
+            assert batch.shape[-1] > 5 * self.window_size, "Sample too short"
+
+            # Generate the encoded representations
+            X_N = self._step(batch)
+            # Generate the labels
+            labels = torch.Tensor([len(X_N) - 1]).to(self.device).long()
+            # Calculate the loss
+            loss = self.loss_function(X_N.view(1, -1), labels)
+            batch_size = 1
+
         # Log the loss
         self.log(
             f"{prefix}_loss",
@@ -227,6 +439,7 @@ class CPC(L.LightningModule, Configurable):
             on_step=False,
             prog_bar=True,
             logger=True,
+            batch_size=batch_size,
         )
 
         return X_N, loss
@@ -250,6 +463,7 @@ class CPC(L.LightningModule, Configurable):
             "weight_decay": self.weight_decay,
             "window_size": self.window_size,
             "n_size": self.n_size,
+            "batched": self.batched,
         }
 
 
@@ -264,6 +478,7 @@ def build_cpc(
     weight_decay: float = 0.0,
     window_size: int = 4,
     n_size: int = 5,
+    batched: bool = False,
 ) -> CPC:
     """Builds a default CPC model. This function aid in the creation of a CPC
     model, by setting the default values of the parameters.
@@ -294,6 +509,13 @@ def build_cpc(
     n_size : int, optional
         Number of negative samples to be used in the contrastive loss
         (steps to predict)
+    batched : bool, optional
+        If True, the model processes batches with multiple samples at once.
+        The crop of every sample of a batch is limited by its shortest sample,
+        to ``min(lengths) // window_size`` windows (e.g., one sample of 30
+        time steps and ``window_size=4`` make every sample of the batch train
+        on 7 windows), thus batches should group samples of similar lengths
+        (see ``CPC``).
 
     Returns
     -------
@@ -325,6 +547,7 @@ def build_cpc(
         weight_decay=weight_decay,
         window_size=window_size,
         n_size=n_size,
+        batched=batched,
     )
 
     return model
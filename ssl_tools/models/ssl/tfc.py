@@ -1,10 +1,13 @@
-from typing import Any, Tuple
+from typing import Any, Callable, List, Tuple
+import copy
+
 import lightning as L
 import torch
 
 from ssl_tools.utils.configurable import Configurable
 from torch.nn import TransformerEncoder, TransformerEncoderLayer
-from ssl_tools.losses.nxtent import NTXentLoss_poly
+from ssl_tools.losses.nxtent import NTXentLoss_poly, NTXentQueueLoss
+from ssl_tools.transforms.signal_1d import fft_magnitude
 
 from .modules.heads import TFCProjectionHead
 
@@ -51,6 +54,9 @@ class TFC(L.LightningModule, Configurable):
         learning_rate: float = 1e-3,
         loss_lambda: float = 0.2,
         permute_input: tuple = None,
+        time_transforms: List[Callable] = None,
+        frequency_transforms: List[Callable] = None,
+        augment_on_device: bool = False,
     ):
         """Implements the Time-Frequency Contrastive model, as described in:
         Zhang, Xiang, et al. "Self-supervised contrastive pre-training for time
@@ -72,11 +78,33 @@ class TFC(L.LightningModule, Configurable):
             The projector for the frequency-domain data. Usually the projector
             is a linear layer with the desired output dimensionality.
         nxtent_criterion : torch.nn.Module
-            The Normalized Temperature-scaled Cross Entropy Loss.
+            The Normalized Temperature-scaled Cross Entropy Loss. A copy of
+            it is used for each loss (time, frequency and consistency), thus
+            stateful losses (e.g., the queue of ``NTXentQueueLoss``) keep a
+            separate state for each pair of representations.
         learning_rate : float, optional
             The learning rate for the optimizer, by default 1e-3
         loss_lambda : float, optional
             The consistency threshold, by default 0.2
+        permute_input : tuple, optional
+            If not None, permute the inputs (time and frequency data) with
+            the given dimensions, before feeding them to the encoders.
+        time_transforms : List[Callable], optional
+            The augmentations of the time-domain data. Only used if
+            ``augment_on_device`` is True. The transforms must accept (and
+            return) a torch tensor with the whole batch, of shape (B, C, T).
+        frequency_transforms : List[Callable], optional
+            The augmentations of the frequency-domain data. Only used if
+            ``augment_on_device`` is True. The transforms must accept (and
+            return) a torch tensor with the whole batch, of shape (B, C, T).
+        augment_on_device : bool, optional
+            If True, the batches must be 2-element tuples with the raw
+            time-domain data and the labels (see ``only_time`` of
+            ``TFCDataset``). The FFT and the augmentations are computed for
+            the whole batch, in the model device, after the batch is
+            transferred (``on_after_batch_transfer``). If False, the batches
+            must be 5-element tuples, with the FFT and the augmentations
+            already computed by the dataset.
         """
         super().__init__()
 
@@ -84,10 +112,53 @@ class TFC(L.LightningModule, Configurable):
         self.time_projector = time_projector
         self.frequency_encoder = frequency_encoder
         self.frequency_projector = frequency_projector
-        self.nxtent_criterion = nxtent_criterion
+        self.nxtent_criterion = torch.nn.ModuleDict(
+            {
+                "time": copy.deepcopy(nxtent_criterion),
+                "frequency": copy.deepcopy(nxtent_criterion),
+                "consistency": copy.deepcopy(nxtent_criterion),
+            }
+        )
         self.learning_rate = learning_rate
         self.loss_lambda = loss_lambda
         self.permute_input = permute_input
+        self.time_transforms = time_transforms or []
+        self.frequency_transforms = frequency_transforms or []
+        self.augment_on_device = augment_on_device
+
+    def on_after_batch_transfer(self, batch: Any, dataloader_idx: int) -> Any:
+        """Compute the frequency-domain data and the augmentations of the
+        batch, in the model device, if ``augment_on_device`` is True.
+
+        Parameters
+        ----------
+        batch : Any
+            A 2-element tuple with the time-domain data, of shape (B, C, T),
+            and the labels.
+        dataloader_idx : int
+            The index of the dataloader
+
+        Returns
+        -------
+        Any
+            A 5-element tuple with the time-domain data, the labels, the
+            augmented time-domain data, the frequency-domain data and the
+            augmented frequency-domain data (as returned by ``TFCDataset``).
+        """
+        if not self.augment_on_device:
+            return batch
+
+        data, labels = batch
+        aug1 = data
+        for transform in self.time_transforms:
+            aug1 = transform(aug1)
+
+        data_f = fft_magnitude(data)
+        aug1_f = data_f
+        for transform in self.frequency_transforms:
+            aug1_f = transform(aug1_f)
+
+        return data, labels, aug1.to(data.dtype), data_f, aug1_f.to(data.dtype)
 
     def forward(
         self, x_in_t: torch.Tensor, x_in_f: torch.Tensor
@@ -246,9 +317,9 @@ class TFC(L.LightningModule, Configurable):
         # between: encoded representations of non-augmented and augmented tima data
         # and frequency data. Also, between: projected representations of
         # non-augmented and augmented data.
-        loss_time = self.nxtent_criterion(h_t, h_t_aug)
-        loss_freq = self.nxtent_criterion(h_f, h_f_aug)
-        loss_consistency = self.nxtent_criterion(z_t, z_f)
+        loss_time = self.nxtent_criterion["time"](h_t, h_t_aug)
+        loss_freq = self.nxtent_criterion["frequency"](h_f, h_f_aug)
+        loss_consistency = self.nxtent_criterion["consistency"](z_t, z_f)
         # Calculate the total loss
         loss = (self.loss_lambda * (loss_time + loss_freq)) + loss_consistency
 
@@ -298,6 +369,7 @@ class TFC(L.LightningModule, Configurable):
         return {
             "learning_rate": self.learning_rate,
             "loss_lambda": self.loss_lambda,
+            "augment_on_device": self.augment_on_device,
         }
 
 
@@ -308,6 +380,11 @@ def build_tfc_transformer(
     use_cosine_similarity: bool = True,
     learning_rate: float = 1e-3,
     temperature: float = 0.5,
+    time_transforms: List[Callable] = None,
+    frequency_transforms: List[Callable] = None,
+    augment_on_device: bool = False,
+    gather_distributed: bool = False,
+    queue_size: int = 0,
 ) -> TFC:
     """Creates a TFC model with a transformer encoder. This function aids in
     the creation of the TFC model, by providing a transformer encoder and
@@ -329,6 +406,23 @@ def build_tfc_transformer(
         The learning rate for the optimizer.
     temperature : float, optional
         The temperature for the NTXentLoss.
+    time_transforms : List[Callable], optional
+        The augmentations of the time-domain data, applied to the whole batch
+        in the model device. Only used if ``augment_on_device`` is True.
+    frequency_transforms : List[Callable], optional
+        The augmentations of the frequency-domain data, applied to the whole
+        batch in the model device. Only used if ``augment_on_device`` is True.
+    augment_on_device : bool, optional
+        If True, the model receives the raw time-domain data and computes the
+        FFT and the augmentations in its device (see ``TFC``).
+    gather_distributed : bool, optional
+        If True, the NTXentLoss is computed over the representations gathered
+        from all processes (e.g., with DDP), thus the negatives come from the
+        global batch.
+    queue_size : int, optional
+        If greater than 0, each NTXentLoss keeps a queue with the
+        representations of the last ``queue_size`` samples (of both views),
+        used as extra negatives (see ``NTXentQueueLoss``).
 
     Returns
     -------
@@ -370,10 +464,19 @@ def build_tfc_transformer(
     )
 
     # Instantiate NTXentLoss
-    nxtent = NTXentLoss_poly(
-        temperature=temperature,
-        use_cosine_similarity=use_cosine_similarity,
-    )
+    if queue_size > 0:
+        nxtent = NTXentQueueLoss(
+            queue_size=queue_size,
+            temperature=temperature,
+            use_cosine_similarity=use_cosine_similarity,
+            gather_distributed=gather_distributed,
+        )
+    else:
+        nxtent = NTXentLoss_poly(
+            temperature=temperature,
+            use_cosine_similarity=use_cosine_similarity,
+            gather_distributed=gather_distributed,
+        )
 
     # Create the model
     model = TFC(
@@ -383,7 +486,10 @@ def build_tfc_transformer(
         frequency_projector=frequency_projector,
         nxtent_criterion=nxtent,
         learning_rate=learning_rate,
-        permute_input=(0, 2, 1)
+        permute_input=(0, 2, 1),
+        time_transforms=time_transforms,
+        frequency_transforms=frequency_transforms,
+        augment_on_device=augment_on_device,
     )
 
     return model
@@ -4,6 +4,35 @@ import torch
 
 from librep.base import Transform
 
+from ssl_tools.utils.rng import RandomStateMixin
+
+
+def fft_magnitude(x):
+    """Magnitude of the FFT of real signals, along the last axis. It is
+    computed with ``rfft`` (only the non-negative frequencies) and the
+    negative frequencies are mirrored, thus the result has the same length
+    of the input, like ``abs(fft(x))``.
+
+    Parameters
+    ----------
+    x : Union[np.ndarray, torch.Tensor]
+        The real signals, with the time steps in the last axis. Torch tensors
+        are processed in their own device.
+
+    Returns
+    -------
+    Union[np.ndarray, torch.Tensor]
+        The magnitude of the FFT, with the same shape of ``x``.
+    """
+    n = x.shape[-1]
+    if isinstance(x, torch.Tensor):
+        magnitude = torch.fft.rfft(x, dim=-1).abs()
+        mirror = magnitude[..., 1 : n - n // 2].flip(-1)
+        return torch.cat([magnitude, mirror], dim=-1)
+    magnitude = np.abs(np.fft.rfft(x, axis=-1))
+    mirror = magnitude[..., 1 : n - n // 2][..., ::-1]
+    return np.concatenate([magnitude, mirror], axis=-1)
+
 
 class FFT(Transform):
     def transform(self, sample: np.ndarray):
@@ -13,25 +42,50 @@ class FFT(Transform):
         return self.transform(sample)
 
 
-class AddRemoveFrequency(Transform):
+class AddRemoveFrequency(Transform, RandomStateMixin):
     def __init__(self, add_pertub_ratio=0.1, remove_pertub_ratio=0.1):
+        """Perturb the frequency-domain data, adding and removing frequency
+        components at random. It works with numpy arrays and torch tensors of
+        any shape (e.g., a single channel of shape (F, ) or a batch of shape
+        (B, C, F)). The amplitude of the added components is relative to the
+        maximum amplitude of each signal (along the last axis).
+
+        Parameters
+        ----------
+        add_pertub_ratio : float, optional
+            Ratio of the frequency components that will be added
+        remove_pertub_ratio : float, optional
+            Ratio of the frequency components that will be removed
+        """
         self.add_pertub_ratio = add_pertub_ratio
         self.remove_pertub_ratio = remove_pertub_ratio
 
+    def _uniform(self, sample):
+        """Uniform random values in [0, 1), with the shape, type (and device)
+        of ``sample``, drawn from the generators of this transform."""
+        if isinstance(sample, torch.Tensor):
+            return torch.rand(
+                sample.shape,
+                dtype=sample.dtype,
+                device=sample.device,
+                generator=self.torch_generator(sample.device),
+            )
+        return self.rng.uniform(size=sample.shape)
+
     def add_frequency(self, sample: np.ndarray):
-        mask = torch.FloatTensor(sample.shape).uniform_() > (
-            1 - self.add_pertub_ratio
-        ) # only pertub_ratio of all values are True
-        max_amplitude = sample.max()
-        random_am = torch.rand(mask.shape) * (max_amplitude * 0.1)
+        if isinstance(sample, torch.Tensor):
+            max_amplitude = sample.amax(dim=-1, keepdim=True)
+        else:
+            max_amplitude = sample.max(axis=-1, keepdims=True)
+        # only pertub_ratio of all values are True
+        mask = self._uniform(sample) > (1 - self.add_pertub_ratio)
+        random_am = self._uniform(sample) * (max_amplitude * 0.1)
         pertub_matrix = mask * random_am
-        return sample + pertub_matrix.numpy()
+        return sample + pertub_matrix
 
     def remove_frequency(self, sample: np.ndarray):
-        mask = (
-            torch.FloatTensor(sample.shape).uniform_()
-            > self.remove_pertub_ratio
-        ).numpy()  # maskout_ratio are False
+        # maskout_ratio are False
+        mask = self._uniform(sample) > self.remove_pertub_ratio
         return sample * mask
 
     def transform(self, sample: np.ndarray):
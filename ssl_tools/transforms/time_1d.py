@@ -1,107 +1,258 @@
 import numpy as np
-from scipy.ndimage import gaussian_filter1d
+import torch
 
 from librep.base import Transform
 
-   
-class Scale(Transform):
+from ssl_tools.utils.rng import RandomStateMixin
+
+# All transforms in this module accept a single sample, with shape (C, T), or
+# a batch of samples, with shape (B, C, T), where C is the number of channels
+# and T is the number of time steps. Samples could be numpy arrays or torch
+# tensors (e.g., a collated batch already in the GPU). The random values are
+# drawn independently for each sample of the batch, in a single call, and in
+# the same device of the tensor. Each transform has its own random generators
+# (see ``RandomStateMixin``).
+
+
+def _random_normal(state: RandomStateMixin, sample, mean, std, size):
+    """Draw normal random values with the type (and device) of ``sample``,
+    from the generators of ``state``."""
+    if isinstance(sample, torch.Tensor):
+        values = torch.randn(
+            size,
+            dtype=sample.dtype,
+            device=sample.device,
+            generator=state.torch_generator(sample.device),
+        )
+        return values * std + mean
+    return state.rng.normal(loc=mean, scale=std, size=size)
+
+
+def _random_uniform(state: RandomStateMixin, sample, low, high, size):
+    """Draw uniform random values with the type (and device) of ``sample``,
+    from the generators of ``state``."""
+    if isinstance(sample, torch.Tensor):
+        values = torch.rand(
+            size,
+            dtype=sample.dtype,
+            device=sample.device,
+            generator=state.torch_generator(sample.device),
+        )
+        return values * (high - low) + low
+    return state.rng.uniform(low, high, size=size)
+
+
+def _sample_shape(sample) -> tuple:
+    """Shape of the random values that are shared by all channels and time
+    steps of each sample: (1, 1) for a single sample and (B, 1, 1) for a
+    batch."""
+    return tuple(sample.shape[:-2]) + (1,) * min(sample.ndim, 2)
+
+
+class Scale(Transform, RandomStateMixin):
     def __init__(self, mean: float = 1.0, sigma: float = 0.5):
+        """Multiply each value of the sample by a random factor, drawn from a
+        normal distribution.
+
+        Parameters
+        ----------
+        mean : float, optional
+            Mean of the scaling factors. If None, the mean of each sample is
+            used.
+        sigma : float, optional
+            Standard deviation of the scaling factors
+        """
         self.mean = mean
         self.sigma = sigma
-        
+
     def transform(self, sample: np.ndarray):
-        num_channels, num_time_steps = sample.shape
-        
-        if self.mean is None:
-            self.mean = sample.mean()
-        
+        mean = self.mean
+        if mean is None:
+            axis = tuple(range(sample.ndim))[-2:]
+            if isinstance(sample, torch.Tensor):
+                mean = sample.mean(dim=axis, keepdim=True)
+            else:
+                mean = sample.mean(axis=axis, keepdims=True)
+
         # Generate scaling factors for each channel and time step
-        scaling_factors = np.random.normal(loc=self.mean, scale=self.sigma, size=(num_channels, num_time_steps))
-        
+        scaling_factors = _random_normal(
+            self, sample, mean, self.sigma, size=sample.shape
+        )
+
         # Rescale each channel separately
-        data_scaled = np.multiply(sample, scaling_factors[:, :])
+        data_scaled = sample * scaling_factors
         return data_scaled
-    
+
     def __call__(self, sample: np.ndarray):
         return self.transform(sample)
-    
-    
-class AddGaussianNoise(Transform):
+
+
+class AddGaussianNoise(Transform, RandomStateMixin):
     def __init__(self, mean=0.0, std=0.1):
         self.mean = mean
         self.std = std
-        
+
     def transform(self, sample: np.ndarray):
-        noise = np.random.normal(self.mean, self.std, size=sample.shape)
+        noise = _random_normal(
+            self, sample, self.mean, self.std, size=sample.shape
+        )
         noisy_sample = sample + noise
         return noisy_sample
-    
+
     def __call__(self, sample: np.ndarray):
         return self.transform(sample)
-    
-class Rotate(Transform):
+
+class Rotate(Transform, RandomStateMixin):
     def transform(self, dataset: np.ndarray):
-        flip = np.random.choice([-1, 1], size=(dataset.shape[0],dataset.shape[-1]))
-        rotate_axis = np.arange(dataset.shape[-1])
-        np.random.shuffle(rotate_axis)
-        data_rotation = flip[:,:] * dataset[:,rotate_axis]
+        """Flip the sign of random values and shuffle the time steps of each
+        sample (the same permutation is used for all channels of a sample).
+        """
+        # Random signs, for each channel and time step
+        flip = _random_uniform(self, dataset, 0, 1, size=dataset.shape) < 0.5
+        flip = 1 - 2 * flip
+        # Random permutation of the time steps, for each sample
+        keys = _random_uniform(
+            self,
+            dataset,
+            0,
+            1,
+            size=_sample_shape(dataset)[:-1] + dataset.shape[-1:],
+        )
+        if isinstance(dataset, torch.Tensor):
+            rotate_axis = keys.argsort(dim=-1).expand(dataset.shape)
+            data_rotation = flip * dataset.gather(-1, rotate_axis)
+        else:
+            rotate_axis = np.broadcast_to(keys.argsort(axis=-1), dataset.shape)
+            data_rotation = flip * np.take_along_axis(dataset, rotate_axis, -1)
         return data_rotation
-    
+
     def __call__(self, sample: np.ndarray):
         return self.transform(sample)
-    
+
 class LeftToRightFlip(Transform):
     def transform(self, sample: np.ndarray):
+        if isinstance(sample, torch.Tensor):
+            return sample.flip(-1)
         return np.flip(sample, axis=-1)
-    
+
     def __call__(self, sample: np.ndarray):
         return self.transform(sample)
-    
+
 class MagnitudeWrap(Transform):
     def __init__(self, max_magnitude=1.0):
         self.max_magnitude = max_magnitude
-        
+
     def transform(self, sample: np.ndarray):
-        magnitudes = np.linalg.norm(sample, axis=1)
+        # Rescale each channel to have norm (along time) ``max_magnitude``
+        if isinstance(sample, torch.Tensor):
+            magnitudes = torch.linalg.vector_norm(sample, dim=-1, keepdim=True)
+        else:
+            magnitudes = np.linalg.norm(sample, axis=-1, keepdims=True)
         scaling_factors = self.max_magnitude / magnitudes
-        scaled_sample = sample * scaling_factors[:, np.newaxis]
+        scaled_sample = sample * scaling_factors
         return scaled_sample
-    
+
     def __call__(self, sample: np.ndarray):
         return self.transform(sample)
-    
-class TimeAmplitudeModulation(Transform):
+
+class TimeAmplitudeModulation(Transform, RandomStateMixin):
     def __init__(self, modulation_factor=0.1):
         self.modulation_factor = modulation_factor
-        
+
     def transform(self, sample: np.ndarray):
-        _, num_time_steps = sample.shape
-        
-        # Generate modulation factors for each time step
-        modulation_factors = np.random.uniform(1 - self.modulation_factor, 1 + self.modulation_factor, size=num_time_steps)
-        
+        # Generate modulation factors for each time step of each sample (the
+        # same factors are used for all channels of a sample)
+        modulation_factors = _random_uniform(
+            self,
+            sample,
+            1 - self.modulation_factor,
+            1 + self.modulation_factor,
+            size=_sample_shape(sample)[:-1] + sample.shape[-1:],
+        )
+
         # Apply modulation to each time step
-        modulated_sample = sample * modulation_factors[ np.newaxis, :]
+        modulated_sample = sample * modulation_factors
         return modulated_sample
 
     def __call__(self, sample: np.ndarray):
         return self.transform(sample)
-class RandomSmoothing(Transform):
-    def __init__(self, sigma_range=(1, 1)):
+class RandomSmoothing(Transform, RandomStateMixin):
+    def __init__(self, sigma_range=(1, 1), truncate: float = 4.0):
+        """Smooth each sample with a Gaussian filter (along time), with a
+        random standard deviation (sigma) for each sample. The filter is
+        equivalent to ``scipy.ndimage.gaussian_filter1d`` (with the default
+        "reflect" mode), but all channels and samples are filtered at once.
+
+        Parameters
+        ----------
+        sigma_range : tuple, optional
+            The range of the sigma of the Gaussian filter
+        truncate : float, optional
+            Truncate the filter at this many standard deviations
+        """
         self.sigma_range = sigma_range
-        
+        self.truncate = truncate
+
+    def _kernels(self, sample, sigma):
+        """Gaussian kernels (one for each sample), as done by
+        ``gaussian_filter1d``. Kernels are zero-padded to the largest radius.
+        """
+        # Add the kernel axis to sigma
+        sigma = sigma[..., None]
+        if isinstance(sample, torch.Tensor):
+            radius = (self.truncate * sigma + 0.5).long()
+            max_radius = int(radius.max())
+            x = torch.arange(
+                -max_radius, max_radius + 1, device=sample.device
+            ).to(sample.dtype)
+            kernel = torch.exp(-0.5 * (x / sigma) ** 2) * (x.abs() <= radius)
+            kernel = kernel / kernel.sum(dim=-1, keepdim=True)
+        else:
+            radius = (self.truncate * sigma + 0.5).astype(int)
+            max_radius = int(radius.max())
+            x = np.arange(-max_radius, max_radius + 1)
+            kernel = np.exp(-0.5 * (x / sigma) ** 2) * (np.abs(x) <= radius)
+            kernel = kernel / kernel.sum(axis=-1, keepdims=True)
+        return kernel, max_radius
+
     def transform(self, sample: np.ndarray):
-        num_channels, num_time_steps = sample.shape
-        
-        # Generate a random smoothing factor (sigma) for Gaussian filter
-        sigma = np.random.uniform(self.sigma_range[0], self.sigma_range[1])
-        
-        # Apply Gaussian smoothing along the time axis for each channel
-        smoothed_sample = np.empty_like(sample)
-        for channel in range(num_channels):
-            smoothed_sample[channel, :] = gaussian_filter1d(sample[channel, :], sigma)
-        
+        num_time_steps = sample.shape[-1]
+        is_tensor = isinstance(sample, torch.Tensor)
+
+        # Generate a random smoothing factor (sigma) for Gaussian filter, for
+        # each sample
+        sigma = _random_uniform(
+            self,
+            sample,
+            self.sigma_range[0],
+            self.sigma_range[1],
+            size=_sample_shape(sample),
+        )
+        kernel, radius = self._kernels(sample, sigma)
+
+        # Pad the time axis, reflecting the edges (d c b a | a b c d | d c b a)
+        index = np.arange(-radius, num_time_steps + radius) % (
+            2 * num_time_steps
+        )
+        index = np.where(
+            index < num_time_steps, index, 2 * num_time_steps - 1 - index
+        )
+
+        # Apply Gaussian smoothing along the time axis for each channel, as a
+        # weighted sum of the windows of the padded sample
+        if is_tensor:
+            padded = sample[..., torch.as_tensor(index, device=sample.device)]
+            windows = padded.unfold(-1, 2 * radius + 1, 1)
+            smoothed_sample = (windows * kernel).sum(dim=-1)
+        else:
+            padded = sample[..., index]
+            windows = np.lib.stride_tricks.sliding_window_view(
+                padded, 2 * radius + 1, axis=-1
+            )
+            smoothed_sample = (windows * kernel).sum(axis=-1)
+            smoothed_sample = smoothed_sample.astype(sample.dtype, copy=False)
+
         return smoothed_sample
-    
+
     def __call__(self, sample: np.ndarray):
-        return self.transform(sample)
\ No newline at end of file
+        return self.transform(sample)
@@ -0,0 +1,82 @@
+from pathlib import Path
+from typing import Callable, IO
+import hashlib
+import json
+import os
+
+from ssl_tools.utils.types import PathLike
+
+
+def cache_key(key: dict, length: int = 16) -> str:
+    """A short hash that identifies a cache entry, from a JSON-serializable
+    description of what it depends on (e.g., paths, modification times and
+    parameters). The keys of the description are sorted, thus the hash does
+    not depend on their order.
+
+    Parameters
+    ----------
+    key : dict
+        The description of the cache entry
+    length : int, optional
+        Number of hexadecimal digits of the hash
+
+    Returns
+    -------
+    str
+        The first ``length`` hexadecimal digits of the SHA-1 of the key.
+    """
+    digest = hashlib.sha1(json.dumps(key, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:length]
+
+
+def temporary_path(path: PathLike, suffix: str = "tmp") -> Path:
+    """A hidden path, in the same directory of ``path`` and unique for this
+    process, where ``path`` is written before being renamed to it (see
+    ``atomic_write``).
+
+    Parameters
+    ----------
+    path : PathLike
+        The final path
+    suffix : str, optional
+        The suffix of the temporary path
+
+    Returns
+    -------
+    Path
+        The temporary path.
+    """
+    path = Path(path)
+    return path.with_name(f".{path.name}.{os.getpid()}.{suffix}")
+
+
+def atomic_write(
+    path: PathLike, writer: Callable[[IO], None], mode: str = "wb"
+):
+    """Write a file atomically: ``writer`` writes a temporary file (see
+    ``temporary_path``), which is then renamed to ``path``. Thus, readers
+    never see a partially written file. If ``writer`` fails, the temporary
+    file is removed.
+
+    Parameters
+    ----------
+    path : PathLike
+        The path of the file
+    writer : Callable[[IO], None]
+        Function that writes the content to the given (open) file
+    mode : str, optional
+        The mode used to open the file ("wb" or "w")
+
+    Examples
+    --------
+    >>> atomic_write("data.npy", lambda f: np.save(f, data))
+    >>> atomic_write("index.json", lambda f: json.dump(index, f), mode="w")
+    """
+    tmp_path = temporary_path(path)
+    try:
+        with open(tmp_path, mode) as f:
+            writer(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
@@ -0,0 +1,72 @@
+from typing import Tuple
+import os
+
+import torch
+import torch.distributed as dist
+
+
+def get_world_size() -> int:
+    """Number of processes of the default process group, or 1 if
+    ``torch.distributed`` is not initialized."""
+    if dist.is_available() and dist.is_initialized():
+        return dist.get_world_size()
+    return 1
+
+
+def get_rank() -> int:
+    """Rank of this process in the default process group. If
+    ``torch.distributed`` is not initialized (e.g., in a spawned
+    ``DataLoader`` worker), the ``RANK`` environment variable set by the
+    launcher is used, or 0 if it is not set."""
+    if dist.is_available() and dist.is_initialized():
+        return dist.get_rank()
+    return int(os.environ.get("RANK", 0))
+
+
+class GatherLayer(torch.autograd.Function):
+    """Gather a tensor from all processes, keeping the gradients. In the
+    forward pass, the tensors of all processes are gathered (``all_gather``).
+    In the backward pass, the gradients of all processes, with respect to
+    every gathered tensor, are summed (``all_reduce``) and each process gets
+    the gradient of its own tensor.
+
+    Thus, if every process computes the same loss from the gathered tensors,
+    the gradient of each process is ``world_size`` times the gradient of the
+    loss with respect to its tensor, which DDP averages back over processes.
+
+    All processes must have tensors with the same shape.
+    """
+
+    @staticmethod
+    def forward(ctx, x: torch.Tensor) -> Tuple[torch.Tensor, ...]:
+        output = [torch.zeros_like(x) for _ in range(dist.get_world_size())]
+        dist.all_gather(output, x.contiguous())
+        return tuple(output)
+
+    @staticmethod
+    def backward(ctx, *grads: torch.Tensor) -> torch.Tensor:
+        all_gradients = torch.stack(grads)
+        dist.all_reduce(all_gradients)
+        return all_gradients[dist.get_rank()]
+
+
+def gather_with_grad(x: torch.Tensor) -> torch.Tensor:
+    """Concatenate (along the first dimension) the tensors ``x`` of all
+    processes, in rank order, keeping the gradients (see ``GatherLayer``). If
+    ``torch.distributed`` is not initialized or there is a single process,
+    ``x`` is returned.
+
+    Parameters
+    ----------
+    x : torch.Tensor
+        The tensor of this process, with shape (B, ...). It must have the same
+        shape in all processes.
+
+    Returns
+    -------
+    torch.Tensor
+        The tensors of all processes, with shape (world_size * B, ...).
+    """
+    if get_world_size() == 1:
+        return x
+    return torch.cat(GatherLayer.apply(x), dim=0)
@@ -0,0 +1,406 @@
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Tuple, Union
+import hashlib
+import json
+
+import numpy as np
+import torch
+
+from ssl_tools.utils.cache import atomic_write
+from ssl_tools.utils.types import PathLike
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _save_npy(path: Path, array: np.ndarray):
+    """Save an array as a ``.npy`` file, atomically (a temporary file is
+    written and then renamed)."""
+    atomic_write(path, lambda f: np.save(f, array))
+
+
+class EmbeddingShardWriter:
+    def __init__(
+        self,
+        output_dir: PathLike,
+        shard_size: int = 65536,
+        dtype: str = "float32",
+        resume: bool = True,
+        metadata: dict = None,
+    ):
+        """Write embeddings (and labels) to a directory, as a sequence of
+        ``.npy`` shards of (at most) ``shard_size`` samples, described by a
+        JSON manifest (``manifest.json``). Only the current shard is kept in
+        memory, in a preallocated buffer, thus the memory used is bounded by
+        ``shard_size``, regardless of the number of samples written.
+
+        Shards and the manifest are written atomically, and the manifest is
+        updated after each shard. Thus, if the writing is interrupted, all
+        shards listed in the manifest are complete, and a new writer (with
+        ``resume=True``) continues after the last one. The samples written
+        are in ``num_samples``; the caller must skip them.
+
+        The directory layout is:
+
+        .. code-block::
+
+            output_dir/
+                manifest.json
+                embeddings-00000.npy
+                labels-00000.npy
+                embeddings-00001.npy
+                labels-00001.npy
+                ...
+
+        Parameters
+        ----------
+        output_dir : PathLike
+            The directory where the shards are written
+        shard_size : int, optional
+            Maximum number of samples of each shard
+        dtype : str, optional
+            The type of the stored embeddings
+        resume : bool, optional
+            If True and the directory has a manifest, continue after the
+            shards already written. Else, the previous shards are discarded.
+        metadata : dict, optional
+            JSON-serializable information stored in the manifest (e.g., the
+            model and the data used). When resuming, it must be equal to the
+            metadata of the existing manifest.
+
+        Examples
+        --------
+        >>> writer = EmbeddingShardWriter("embeddings/test", shard_size=1024)
+        >>> for x, y in loader:
+        ...     writer.write(model(x).numpy(), y.numpy())
+        >>> writer.close()
+        >>> embeddings, labels = load_embeddings("embeddings/test")
+        """
+        assert shard_size > 0, "shard_size must be positive"
+        self.output_dir = Path(output_dir)
+        self.shard_size = shard_size
+        self.dtype = np.dtype(dtype)
+        self.metadata = metadata or {}
+
+        self._shards = []
+        self._complete = False
+        self._embedding_shape = None
+        self._label_dtype = None
+        self._buffer = None
+        self._label_buffer = None
+        self._buffer_length = 0
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path = self.output_dir / MANIFEST_NAME
+        if resume and manifest_path.exists():
+            self._load_manifest(manifest_path)
+
+    def _load_manifest(self, path: Path):
+        """Restore the state of a previous writer from its manifest."""
+        with open(path) as f:
+            manifest = json.load(f)
+        assert manifest["metadata"] == self.metadata, (
+            f"The embeddings at {self.output_dir} were written with different "
+            + f"metadata: {manifest['metadata']}"
+        )
+        assert np.dtype(manifest["dtype"]) == self.dtype, (
+            f"The embeddings at {self.output_dir} have type "
+            + f"{manifest['dtype']}, not {self.dtype}"
+        )
+        self._shards = manifest["shards"]
+        self._complete = manifest["complete"]
+        if manifest["embedding_shape"] is not None:
+            self._embedding_shape = tuple(manifest["embedding_shape"])
+        self._label_dtype = manifest["label_dtype"]
+
+    def _save_manifest(self):
+        manifest = {
+            "num_samples": self.num_samples,
+            "embedding_shape": (
+                list(self._embedding_shape)
+                if self._embedding_shape is not None
+                else None
+            ),
+            "dtype": self.dtype.name,
+            "label_dtype": self._label_dtype,
+            "complete": self._complete,
+            "metadata": self.metadata,
+            "shards": self._shards,
+        }
+        path = self.output_dir / MANIFEST_NAME
+        atomic_write(
+            path, lambda f: json.dump(manifest, f, indent=4), mode="w"
+        )
+
+    @property
+    def num_samples(self) -> int:
+        """Number of samples already stored in complete shards."""
+        return sum(shard["num_samples"] for shard in self._shards)
+
+    @property
+    def complete(self) -> bool:
+        """True if all samples were written (``close`` was called)."""
+        return self._complete
+
+    def _allocate(self, embeddings: np.ndarray, labels: np.ndarray):
+        """Create the buffers of the current shard."""
+        shape = tuple(embeddings.shape[1:])
+        if self._embedding_shape is None:
+            self._embedding_shape = shape
+        assert self._embedding_shape == shape, (
+            f"Embeddings have shape {shape}, but the previous ones have "
+            + f"shape {self._embedding_shape}"
+        )
+        self._buffer = np.empty(
+            (self.shard_size,) + shape, dtype=self.dtype
+        )
+        if labels is not None:
+            if self._label_dtype is None:
+                self._label_dtype = labels.dtype.name
+            self._label_buffer = np.empty(
+                (self.shard_size,) + tuple(labels.shape[1:]),
+                dtype=self._label_dtype,
+            )
+
+    def _flush(self):
+        """Write the samples of the buffer as a new shard."""
+        if self._buffer_length == 0:
+            return
+        index = len(self._shards)
+        shard = {
+            "embeddings": f"embeddings-{index:05d}.npy",
+            "labels": None,
+            "num_samples": self._buffer_length,
+        }
+        _save_npy(
+            self.output_dir / shard["embeddings"],
+            self._buffer[: self._buffer_length],
+        )
+        if self._label_buffer is not None:
+            shard["labels"] = f"labels-{index:05d}.npy"
+            _save_npy(
+                self.output_dir / shard["labels"],
+                self._label_buffer[: self._buffer_length],
+            )
+        self._shards.append(shard)
+        self._buffer_length = 0
+        self._save_manifest()
+
+    def write(self, embeddings: np.ndarray, labels: np.ndarray = None):
+        """Append a batch of samples. A shard is written whenever the buffer
+        is full.
+
+        Parameters
+        ----------
+        embeddings : np.ndarray
+            The embeddings, with shape (B, ...)
+        labels : np.ndarray, optional
+            The labels, with shape (B, ...)
+        """
+        assert not self._complete, "The writer is already closed"
+        embeddings = np.asarray(embeddings)
+        if labels is not None:
+            labels = np.asarray(labels)
+            assert len(labels) == len(
+                embeddings
+            ), "embeddings and labels must have the same length"
+        if self._buffer is None:
+            self._allocate(embeddings, labels)
+
+        start = 0
+        while start < len(embeddings):
+            count = min(
+                len(embeddings) - start, self.shard_size - self._buffer_length
+            )
+            end = self._buffer_length + count
+            self._buffer[self._buffer_length : end] = embeddings[
+                start : start + count
+            ]
+            if self._label_buffer is not None:
+                self._label_buffer[self._buffer_length : end] = labels[
+                    start : start + count
+                ]
+            self._buffer_length = end
+            start += count
+            if self._buffer_length == self.shard_size:
+                self._flush()
+
+    def close(self):
+        """Write the remaining samples and mark the embeddings as complete."""
+        if self._complete:
+            return
+        self._flush()
+        self._complete = True
+        self._save_manifest()
+        self._buffer = None
+        self._label_buffer = None
+
+
+def load_embeddings(
+    path: PathLike, mmap_mode: str = "r"
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Load the embeddings (and labels) written by ``EmbeddingShardWriter``.
+    If there is a single shard, it is memory-mapped (with ``mmap_mode``).
+    Else, shards are concatenated in memory.
+
+    Parameters
+    ----------
+    path : PathLike
+        The directory with the shards and the manifest
+    mmap_mode : str, optional
+        Memory-map mode used to open the shards (see ``np.load``)
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        The embeddings, with shape (N, ...), and the labels (None if no
+        labels were written).
+    """
+    path = Path(path)
+    with open(path / MANIFEST_NAME) as f:
+        manifest = json.load(f)
+    if not manifest["complete"]:
+        print(f"Warning: the embeddings at {path} are incomplete")
+
+    embeddings = [
+        np.load(path / shard["embeddings"], mmap_mode=mmap_mode)
+        for shard in manifest["shards"]
+    ]
+    labels = [
+        np.load(path / shard["labels"], mmap_mode=mmap_mode)
+        for shard in manifest["shards"]
+        if shard["labels"] is not None
+    ]
+    if len(embeddings) == 0:
+        shape = tuple(manifest["embedding_shape"] or ())
+        return np.empty((0,) + shape, dtype=manifest["dtype"]), None
+
+    embeddings = (
+        embeddings[0] if len(embeddings) == 1 else np.concatenate(embeddings)
+    )
+    if len(labels) == 0:
+        labels = None
+    else:
+        labels = labels[0] if len(labels) == 1 else np.concatenate(labels)
+    return embeddings, labels
+
+
+def _to_device(x: Any, device: torch.device) -> Any:
+    """Move a tensor, or a tuple/list of tensors, to the device."""
+    if isinstance(x, (tuple, list)):
+        return type(x)(_to_device(value, device) for value in x)
+    return x.to(device, non_blocking=True)
+
+
+def iterate_embeddings(
+    model: torch.nn.Module,
+    batches: Iterable,
+    device: Union[str, torch.device] = "cpu",
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Encode batches with ``model.forward``, in eval and inference mode.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        The model (e.g., a pre-trained TNC, CPC or TFC backbone)
+    batches : Iterable
+        The batches (e.g., a ``DataLoader``). Each batch is a 2-element tuple
+        with the input and the labels. If the input is a tuple or a list
+        (e.g., the time and frequency data of TFC), it is unpacked before
+        being passed to the model.
+    device : Union[str, torch.device], optional
+        The device where the model is executed
+
+    Yields
+    ------
+    Tuple[np.ndarray, np.ndarray]
+        The embeddings (as float32) and the labels of each batch.
+    """
+    model = model.to(device)
+    model.eval()
+    for x, y in batches:
+        with torch.inference_mode():
+            x = _to_device(x, device)
+            if isinstance(x, (tuple, list)):
+                embeddings = model(*x)
+            else:
+                embeddings = model(x)
+            # Some encoders squeeze batches with a single sample
+            if len(embeddings.shape) == 1:
+                embeddings = embeddings.unsqueeze(0)
+            embeddings = embeddings.float().cpu().numpy()
+        yield embeddings, torch.as_tensor(y).numpy()
+
+
+def write_embeddings(
+    model: torch.nn.Module,
+    batches: Iterable,
+    writer: EmbeddingShardWriter,
+    device: Union[str, torch.device] = "cpu",
+):
+    """Encode batches with ``model.forward`` (see ``iterate_embeddings``) and
+    append the embeddings and labels to ``writer``.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        The model (e.g., a pre-trained TNC, CPC or TFC backbone)
+    batches : Iterable
+        The batches (e.g., a ``DataLoader``), with the input and the labels
+    writer : EmbeddingShardWriter
+        The writer of the embeddings
+    device : Union[str, torch.device], optional
+        The device where the model is executed
+    """
+    for embeddings, labels in iterate_embeddings(model, batches, device):
+        writer.write(embeddings, labels)
+
+
+def compute_embeddings(
+    model: torch.nn.Module,
+    batches: Iterable,
+    device: Union[str, torch.device] = "cpu",
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Encode batches with ``model.forward`` (see ``iterate_embeddings``) and
+    return all embeddings and labels, in memory.
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        The model (e.g., a pre-trained TNC, CPC or TFC backbone)
+    batches : Iterable
+        The batches (e.g., a ``DataLoader``), with the input and the labels
+    device : Union[str, torch.device], optional
+        The device where the model is executed
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        The embeddings, with shape (N, ...), and the labels, with shape
+        (N, ...).
+    """
+    results = list(iterate_embeddings(model, batches, device))
+    assert len(results) > 0, "No batches to encode"
+    embeddings, labels = zip(*results)
+    return np.concatenate(embeddings), np.concatenate(labels)
+
+
+def module_fingerprint(module: torch.nn.Module) -> str:
+    """A hash of the state (parameters and buffers) of a module. It is used
+    to detect when cached embeddings were computed with other weights.
+
+    Parameters
+    ----------
+    module : torch.nn.Module
+        The module
+
+    Returns
+    -------
+    str
+        The hexadecimal SHA-1 of the names, shapes and values of the state.
+    """
+    digest = hashlib.sha1()
+    for name, value in module.state_dict().items():
+        value = value.detach().cpu().contiguous()
+        digest.update(f"{name}:{tuple(value.shape)}:{value.dtype}".encode())
+        digest.update(value.view(-1).view(torch.uint8).numpy().tobytes())
+    return digest.hexdigest()
@@ -0,0 +1,51 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, List
+import math
+import os
+
+
+def parallel_map(
+    function: Callable,
+    iterable: Iterable,
+    n_jobs: int = 1,
+    backend: str = "thread",
+) -> List:
+    """Apply ``function`` to every element of ``iterable`` using a pool of
+    workers. The results are returned in the same order of the elements, no
+    matter the order that the workers finish.
+
+    Parameters
+    ----------
+    function : Callable
+        The function to apply. If ``backend`` is "process", the function
+        (and the elements) must be picklable.
+    iterable : Iterable
+        The elements to apply the function.
+    n_jobs : int, optional
+        The maximum number of workers. If 1, the function is applied
+        sequentially in the current thread. If None, use all cores.
+    backend : str, optional
+        The pool of workers to use. It could be "thread" (better for I/O
+        bound functions or functions that release the GIL) or "process".
+
+    Returns
+    -------
+    List
+        A list with the results of the function, in the order of the elements
+    """
+    assert backend in ["thread", "process"], f"Invalid backend: {backend}"
+    items = list(iterable)
+    n_jobs = n_jobs if n_jobs is not None else os.cpu_count()
+    n_jobs = max(1, min(n_jobs, len(items)))
+
+    if n_jobs == 1:
+        return [function(item) for item in items]
+
+    if backend == "thread":
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            return list(executor.map(function, items))
+
+    # Send the elements in chunks to reduce the inter-process communication
+    chunksize = max(1, math.ceil(len(items) / (4 * n_jobs)))
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        return list(executor.map(function, items, chunksize=chunksize))
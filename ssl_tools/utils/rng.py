@@ -0,0 +1,154 @@
+from typing import Any, List, Union
+import random
+
+import numpy as np
+import torch
+
+from ssl_tools.utils.distributed import get_rank
+
+
+class RandomStateMixin:
+    """Mixin for classes that draw random numbers (transforms, datasets,
+    models). Each instance has its own ``numpy.random.Generator`` (``rng``)
+    and its own ``torch.Generator`` for each device (``torch_generator``),
+    instead of using the global random states.
+
+    If the instance is not seeded (``reseed``), its generator is seeded, when
+    first used, from the global numpy random state and the rank of the
+    process (see ``get_rank``). Thus, results are reproducible if the global
+    state is seeded (e.g., with ``lightning.seed_everything``), and the
+    processes of a distributed run, seeded alike, draw different random
+    numbers. Inside ``DataLoader`` workers, the generators are reseeded by
+    ``seed_worker``, so each worker draws different random numbers.
+    """
+
+    _rng: np.random.Generator = None
+    _torch_generators: dict = None
+
+    def reseed(self, seed: Union[int, np.random.SeedSequence] = None):
+        """Seed the generators of this instance.
+
+        Parameters
+        ----------
+        seed : Union[int, np.random.SeedSequence], optional
+            The seed. If None, a seed is drawn from the global numpy random
+            state, and combined with the rank of the process.
+        """
+        if seed is None:
+            seed = np.random.SeedSequence(
+                [np.random.randint(2**32), get_rank()]
+            )
+        self._rng = np.random.default_rng(seed)
+        self._torch_generators = {}
+
+    @property
+    def rng(self) -> np.random.Generator:
+        """The numpy random generator of this instance."""
+        if self._rng is None:
+            self.reseed()
+        return self._rng
+
+    def torch_generator(self, device: Union[str, torch.device] = "cpu"):
+        """The torch random generator of this instance, for the given device.
+        It is seeded from the numpy generator of this instance (``rng``).
+
+        Parameters
+        ----------
+        device : Union[str, torch.device], optional
+            The device of the generator
+
+        Returns
+        -------
+        torch.Generator
+            The generator
+        """
+        device = torch.device(device)
+        if self._torch_generators is None:
+            self.reseed()
+        if device not in self._torch_generators:
+            generator = torch.Generator(device=device)
+            generator.manual_seed(int(self.rng.integers(2**63)))
+            self._torch_generators[device] = generator
+        return self._torch_generators[device]
+
+
+def find_random_states(obj: Any) -> List[RandomStateMixin]:
+    """Find all ``RandomStateMixin`` instances reachable from ``obj`` (e.g., a
+    dataset, its wrapped datasets and their transforms). Only containers
+    (lists, tuples and dicts) and objects from ``ssl_tools`` and
+    ``torch.utils.data`` are inspected. The instances are returned in a
+    deterministic order.
+
+    Parameters
+    ----------
+    obj : Any
+        The root object
+
+    Returns
+    -------
+    List[RandomStateMixin]
+        The instances found
+    """
+    found = []
+    visited = set()
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in visited:
+            continue
+        visited.add(id(current))
+
+        if isinstance(current, RandomStateMixin):
+            found.append(current)
+
+        if isinstance(current, dict):
+            children = list(current.values())
+        elif isinstance(current, (list, tuple)):
+            children = list(current)
+        elif type(current).__module__.startswith(
+            ("ssl_tools", "torch.utils.data")
+        ) and hasattr(current, "__dict__"):
+            children = list(vars(current).values())
+        else:
+            continue
+        # Reversed, so the children are visited in order
+        stack.extend(reversed(children))
+    return found
+
+
+def seed_worker(worker_id: int):
+    """``worker_init_fn`` for ``DataLoader``. It reseeds the global random
+    states (``random`` and ``numpy``) and every ``RandomStateMixin`` of the
+    worker's copy of the dataset (e.g., transforms), from the seed of the
+    worker and the rank of the process (see ``get_rank``). The seed of the
+    worker is derived by the ``DataLoader`` from the worker id and a base
+    seed, drawn from the torch random state whenever workers are started.
+    Thus, workers (and processes of a distributed run) do not draw the same
+    random numbers, and runs are reproducible if torch is seeded.
+
+    Workers are started at every epoch, thus reseeded with a new base seed.
+    With ``persistent_workers=True``, they are started (and reseeded) only
+    once, and their generators continue their random streams in the next
+    epochs. In both cases, each epoch draws new random numbers.
+
+    Parameters
+    ----------
+    worker_id : int
+        The id of the worker
+
+    Examples
+    --------
+    >>> loader = DataLoader(dataset, num_workers=4, worker_init_fn=seed_worker)
+    """
+    worker_info = torch.utils.data.get_worker_info()
+    seed = worker_info.seed if worker_info is not None else torch.initial_seed()
+    sequence = np.random.SeedSequence([seed % 2**32, get_rank()])
+    global_seed = int(sequence.generate_state(1)[0])
+    random.seed(global_seed)
+    np.random.seed(global_seed)
+
+    if worker_info is None:
+        return
+    states = find_random_states(worker_info.dataset)
+    for state, child in zip(states, sequence.spawn(len(states))):
+        state.reseed(child)
@@ -0,0 +1,75 @@
+from typing import Optional
+
+import numpy as np
+import torch
+
+
+def to_shared_tensor(array: np.ndarray) -> Optional[torch.Tensor]:
+    """Copy an array to shared memory, as a torch tensor. Shared tensors are
+    not copied by forked processes (e.g., the workers of a ``DataLoader``)
+    and are sent by handle (not by value) to spawned ones, by
+    ``torch.multiprocessing``.
+
+    Parameters
+    ----------
+    array : np.ndarray
+        The array
+
+    Returns
+    -------
+    Optional[torch.Tensor]
+        The tensor in shared memory, or None if the type of the array is not
+        supported by torch (e.g., strings or objects).
+    """
+    try:
+        dtype = torch.from_numpy(np.empty(0, dtype=array.dtype)).dtype
+    except TypeError:
+        return None
+    # The array is copied straight into the shared memory
+    tensor = torch.empty(array.shape, dtype=dtype).share_memory_()
+    tensor.numpy()[...] = array
+    return tensor
+
+
+class SharedMemoryMixin:
+    """Mixin for datasets that keep their arrays in shared memory. Arrays
+    are stored with ``_share`` as attributes that are numpy views of shared
+    tensors. When the dataset is pickled (e.g., sent to spawned workers),
+    only the tensors are pickled (by handle, with ``torch.multiprocessing``)
+    and the views are recreated after unpickling.
+    """
+
+    _shared_tensors: dict = None
+
+    def _share(self, name: str, array: Optional[np.ndarray]):
+        """Copy ``array`` to shared memory and store a numpy view of it in
+        the attribute ``name``. If the array is None or its type is not
+        supported (see ``to_shared_tensor``), it is stored as is.
+
+        Parameters
+        ----------
+        name : str
+            The name of the attribute
+        array : Optional[np.ndarray]
+            The array
+        """
+        tensor = to_shared_tensor(array) if array is not None else None
+        if tensor is None:
+            setattr(self, name, array)
+            return
+        if self._shared_tensors is None:
+            self._shared_tensors = {}
+        self._shared_tensors[name] = tensor
+        setattr(self, name, tensor.numpy())
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        # The views would be pickled by value
+        for name in self._shared_tensors or {}:
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        for name, tensor in (self._shared_tensors or {}).items():
+            setattr(self, name, tensor.numpy())
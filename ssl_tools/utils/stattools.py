@@ -0,0 +1,190 @@
+from typing import Tuple
+import math
+
+import numpy as np
+from scipy.stats import norm
+from statsmodels.tsa.adfvalues import (
+    _tau_largeps,
+    _tau_maxs,
+    _tau_mins,
+    _tau_smallps,
+    _tau_stars,
+)
+
+
+def _batched_ols(
+    X: np.ndarray, y: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Solve a batch of least squares problems ``y = X @ params``, as done by
+    statsmodels' ``OLS`` (using the pseudo-inverse).
+
+    Parameters
+    ----------
+    X : np.ndarray
+        The regressors, with shape (K, n, p)
+    y : np.ndarray
+        The dependent variables, with shape (K, n)
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+        A 4-element tuple with the parameters (K, p), the sum of squared
+        residuals (K, ), the rank of the regressors (K, ) and the diagonal of
+        ``pinv(X) @ pinv(X).T``, with shape (K, p), used to compute the
+        standard errors of the parameters.
+    """
+    pinv_X = np.linalg.pinv(X, rcond=1e-15)
+    params = np.einsum("kpn,kn->kp", pinv_X, y)
+    resid = y - np.einsum("knp,kp->kn", X, params)
+    ssr = np.einsum("kn,kn->k", resid, resid)
+    rank = np.linalg.matrix_rank(X)
+    cov_diag = np.einsum("kpn,kpn->kp", pinv_X, pinv_X)
+    return params, ssr, rank, cov_diag
+
+
+def _lagged_regressors(x: np.ndarray, lags: int) -> Tuple[np.ndarray, ...]:
+    """Build the ADF regression of a batch of series, with ``lags`` lagged
+    differences and a constant.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        The series, with shape (K, L)
+    lags : int
+        The number of lagged differences
+
+    Returns
+    -------
+    Tuple[np.ndarray, ...]
+        A 2-element tuple with the regressors, with shape (K, n, lags + 2),
+        and the dependent variable (the differences), with shape (K, n), where
+        ``n = L - 1 - lags``. The columns of the regressors are the lagged
+        level, the lagged differences (from lag 1 to ``lags``) and the
+        constant.
+    """
+    xdiff = np.diff(x, axis=-1)
+    nobs = xdiff.shape[-1] - lags
+    columns = [x[:, lags : lags + nobs]]
+    for lag in range(1, lags + 1):
+        columns.append(xdiff[:, lags - lag : lags - lag + nobs])
+    columns.append(np.ones_like(columns[0]))
+    return np.stack(columns, axis=-1), xdiff[:, lags:]
+
+
+def mackinnonp_batch(teststat: np.ndarray, regression: str = "c") -> np.ndarray:
+    """Vectorized version of statsmodels' ``mackinnonp``, the MacKinnon's
+    approximate p-value of ADF test statistics (with N = 1).
+
+    Parameters
+    ----------
+    teststat : np.ndarray
+        The ADF test statistics
+    regression : str, optional
+        The trend of the regression ("c", "n", "ct" or "ctt")
+
+    Returns
+    -------
+    np.ndarray
+        The p-values, with the same shape of ``teststat``. NaN statistics
+        have NaN p-values.
+    """
+    teststat = np.asarray(teststat, dtype=np.float64)
+    small_p = norm.cdf(
+        np.polyval(_tau_smallps[regression][0][::-1], teststat)
+    )
+    large_p = norm.cdf(
+        np.polyval(_tau_largeps[regression][0][::-1], teststat)
+    )
+    pvalue = np.where(
+        teststat <= _tau_stars[regression][0], small_p, large_p
+    )
+    pvalue = np.where(teststat > _tau_maxs[regression][0], 1.0, pvalue)
+    pvalue = np.where(teststat < _tau_mins[regression][0], 0.0, pvalue)
+    return np.where(np.isnan(teststat), np.nan, pvalue)
+
+
+def adfuller_batch(
+    x: np.ndarray, maxlag: int = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Augmented Dickey-Fuller test of a batch of series with the same
+    length. It is equivalent to calling ``statsmodels.tsa.stattools.adfuller``
+    (with ``regression="c"`` and ``autolag="AIC"``) on each series, but the
+    regressions of all series (and all lags of the automatic lag selection)
+    are solved with batched least squares.
+
+    Constant series, where ``adfuller`` raises an error, have NaN statistics
+    and p-values.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        The series, with shape (K, L)
+    maxlag : int, optional
+        Maximum lag included in the test. If None, it is
+        ``12*(nobs/100)^{1/4}``, as in statsmodels.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+        A 4-element tuple with the test statistics, the p-values, the number
+        of lags used and the number of observations used in the regression
+        of each series. All arrays have shape (K, ).
+
+    Examples
+    --------
+    >>> x = np.cumsum(np.random.randn(32, 120), axis=-1)
+    >>> adfstat, pvalue, usedlag, nobs = adfuller_batch(x)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    assert x.ndim == 2, "x must have shape (K, L)"
+    num_series, length = x.shape
+    ntrend = 1
+    nobs = length
+    if maxlag is None:
+        maxlag = int(math.ceil(12.0 * math.pow(nobs / 100.0, 1 / 4.0)))
+        maxlag = min(nobs // 2 - ntrend - 1, maxlag)
+    assert 0 <= maxlag <= nobs // 2 - ntrend - 1, (
+        "The series are too short to use the ADF test with the given maxlag"
+    )
+
+    adfstat = np.full(num_series, np.nan)
+    usedlag = np.zeros(num_series, dtype=int)
+    used_nobs = np.zeros(num_series, dtype=int)
+    constant = np.ptp(x, axis=-1) == 0
+    valid = np.flatnonzero(~constant)
+    if len(valid) == 0:
+        return adfstat, mackinnonp_batch(adfstat), usedlag, used_nobs
+
+    # Automatic lag selection. All lags are evaluated with the same number of
+    # observations (the ones of ``maxlag``), to have comparable AICs. As the
+    # regressions are nested (the constant, the level and the first ``lag``
+    # differences), the sum of squared residuals of all of them is obtained
+    # from a single QR decomposition of ``[X, y]``.
+    X, y = _lagged_regressors(x[valid], maxlag)
+    n = y.shape[-1]
+    X = np.concatenate([X[..., -1:], X[..., :-1], y[..., None]], axis=-1)
+    R = np.linalg.qr(X, mode="r")
+    # ssr[:, k] is the SSR of the regression with the first k columns
+    ssr = np.cumsum(R[:, ::-1, -1] ** 2, axis=-1)[:, ::-1]
+    ssr = ssr[:, 2 : maxlag + 3]
+    diag = np.abs(np.diagonal(R[..., :-1, :-1], axis1=-2, axis2=-1))
+    tol = diag.max(axis=-1, keepdims=True) * max(X.shape[-2:]) * np.finfo(
+        np.float64
+    ).eps
+    rank = np.cumsum(diag > tol, axis=-1)[:, 1 : maxlag + 2]
+    llf = -n / 2 * (np.log(2 * np.pi) + np.log(ssr / n) + 1)
+    aics = -2 * llf + 2 * rank
+    # The first minimum is the smallest lag, as in statsmodels
+    bestlag = np.argmin(aics, axis=-1)
+
+    # Run the regression again with the best lag (and all observations)
+    for lag in np.unique(bestlag):
+        selected = valid[bestlag == lag]
+        X, y = _lagged_regressors(x[selected], lag)
+        params, ssr, rank, cov_diag = _batched_ols(X, y)
+        scale = ssr / (y.shape[-1] - rank)
+        adfstat[selected] = params[:, 0] / np.sqrt(scale * cov_diag[:, 0])
+        usedlag[selected] = lag
+        used_nobs[selected] = y.shape[-1]
+
+    return adfstat, mackinnonp_batch(adfstat), usedlag, used_nobs
@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+from ssl_tools.utils.cache import atomic_write, cache_key
+
+
+def test_cache_key_does_not_depend_on_the_order_of_the_keys():
+    assert cache_key({"a": 1, "b": [1, 2]}) == cache_key({"b": [1, 2], "a": 1})
+    assert cache_key({"a": 1}) != cache_key({"a": 2})
+    assert len(cache_key({"a": 1})) == 16
+
+
+def test_atomic_write_replaces_the_file(tmp_path):
+    path = tmp_path / "index.json"
+    atomic_write(path, lambda f: json.dump({"a": 1}, f), mode="w")
+    atomic_write(path, lambda f: json.dump({"a": 2}, f), mode="w")
+    assert json.loads(path.read_text()) == {"a": 2}
+    assert sorted(tmp_path.iterdir()) == [path]
+
+
+def test_atomic_write_failure_keeps_the_previous_file(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"previous")
+
+    def writer(f):
+        f.write(b"partial")
+        raise RuntimeError("interrupted")
+
+    with pytest.raises(RuntimeError):
+        atomic_write(path, writer)
+    assert path.read_bytes() == b"previous"
+    assert sorted(tmp_path.iterdir()) == [path]
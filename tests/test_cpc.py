@@ -0,0 +1,89 @@
+import pytest
+import torch
+
+from ssl_tools.models.ssl.cpc import build_cpc
+
+
+def _model(**kwargs):
+    model = build_cpc(
+        encoding_size=8,
+        in_channels=3,
+        gru_hidden_size=6,
+        window_size=4,
+        n_size=5,
+        batched=True,
+        **kwargs,
+    )
+    model.reseed(0)
+    return model
+
+
+def _ragged_batch(lengths, num_channels: int = 3):
+    """A (B, C, T) batch padded with NaN after the length of each sample."""
+    generator = torch.Generator().manual_seed(0)
+    data = torch.randn(
+        len(lengths), num_channels, max(lengths), generator=generator
+    )
+    for i, length in enumerate(lengths):
+        data[i, :, length:] = float("nan")
+    return data, torch.tensor(lengths)
+
+
+def test_batched_step_shape_and_backward_with_ragged_lengths():
+    model = _model()
+    data, lengths = _ragged_batch([200, 64, 30, 170])
+    for _ in range(10):
+        X_N = model._batched_step(data, lengths)
+        assert X_N.shape == (4, model.n_size + 1)
+        # The crops never reach the (NaN) padding of the shorter samples
+        assert torch.isfinite(X_N).all()
+
+    model.zero_grad()
+    model.loss_function(X_N, torch.full((4,), model.n_size)).backward()
+    grads = [p.grad for p in model.parameters()]
+    assert all(g is not None and torch.isfinite(g).all() for g in grads)
+
+
+@pytest.mark.parametrize("num_windows", [6, 7, 12, 40])
+def test_batched_negatives_skip_the_neighbours_of_t(num_windows):
+    model = _model()
+    random_t = torch.arange(2, num_windows - 2).repeat(200)
+    rnd_n = model._batched_negatives(random_t, num_windows)
+    assert rnd_n.shape == (len(random_t), model.n_size)
+    assert ((rnd_n >= 0) & (rnd_n < num_windows)).all()
+    distance = (rnd_n - random_t.unsqueeze(1)).abs()
+    assert (distance > 2).all()
+    # Every candidate is drawn
+    for t in range(2, num_windows - 2):
+        drawn = set(rnd_n[random_t == t].unique().tolist())
+        expected = set(range(num_windows)) - set(range(t - 2, t + 3))
+        assert drawn == expected
+
+
+def test_batched_context_packs_the_past():
+    model = _model()
+    generator = torch.Generator().manual_seed(0)
+    encodings = torch.randn(4, 20, 8, generator=generator)
+    random_t = torch.tensor([2, 5, 10, 17])
+
+    c_t = model._batched_context(encodings, random_t)
+    for i, t in enumerate(random_t.tolist()):
+        past = encodings[i : i + 1, max(0, t - 10) : t + 1]
+        _, expected = model.auto_regressor(past)
+        torch.testing.assert_close(c_t[i], expected[-1, 0])
+
+
+@pytest.mark.parametrize("labelled", [None, False, True])
+def test_shared_step_unpacks_batches(labelled):
+    model = _model()
+    data, lengths = _ragged_batch([120, 60])
+    if labelled is None:
+        data = data[:, :, :60]
+        batch = data
+    elif labelled:
+        batch = (data, torch.zeros(2, 120), lengths)
+    else:
+        batch = (data, lengths)
+    X_N, loss = model._shared_step(batch, 0, "train")
+    assert X_N.shape == (2, model.n_size + 1)
+    assert torch.isfinite(loss)
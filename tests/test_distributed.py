@@ -0,0 +1,88 @@
+import socket
+
+import pytest
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+from ssl_tools.losses.nxtent import NTXentLoss_poly
+from ssl_tools.utils.distributed import gather_with_grad
+
+WORLD_SIZE = 2
+BATCH_SIZE = 8
+EMBEDDING_SIZE = 16
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _global_batch() -> torch.Tensor:
+    """The (zis, zjs) global batch, the same in all processes."""
+    generator = torch.Generator().manual_seed(0)
+    return torch.randn(
+        2,
+        WORLD_SIZE * BATCH_SIZE,
+        EMBEDDING_SIZE,
+        generator=generator,
+        dtype=torch.float64,
+    )
+
+
+def _check_rank(rank: int, port: int, chunk_size: int):
+    dist.init_process_group(
+        "gloo",
+        init_method=f"tcp://127.0.0.1:{port}",
+        rank=rank,
+        world_size=WORLD_SIZE,
+    )
+    try:
+        zis, zjs = _global_batch()
+        local = slice(rank * BATCH_SIZE, (rank + 1) * BATCH_SIZE)
+
+        # Each process gets the tensors of all processes, in rank order
+        torch.testing.assert_close(gather_with_grad(zis[local]), zis)
+
+        local_zis = zis[local].clone().requires_grad_()
+        local_zjs = zjs[local].clone().requires_grad_()
+        loss = NTXentLoss_poly(chunk_size=chunk_size, gather_distributed=True)(
+            local_zis, local_zjs
+        )
+        loss.backward()
+
+        # Reference: the loss over the global batch, in a single process
+        zis.requires_grad_()
+        zjs.requires_grad_()
+        reference = NTXentLoss_poly(chunk_size=chunk_size)(zis, zjs)
+        reference.backward()
+
+        # The gradient of each process is world_size times the gradient of
+        # its slice (DDP averages the gradients of the processes)
+        torch.testing.assert_close(loss, reference)
+        torch.testing.assert_close(
+            local_zis.grad, WORLD_SIZE * zis.grad[local]
+        )
+        torch.testing.assert_close(
+            local_zjs.grad, WORLD_SIZE * zjs.grad[local]
+        )
+    finally:
+        dist.destroy_process_group()
+
+
+@pytest.mark.skipif(
+    not dist.is_available(), reason="torch.distributed is not available"
+)
+@pytest.mark.parametrize("chunk_size", [None, 5])
+def test_distributed_ntxent_matches_single_process(chunk_size):
+    mp.spawn(
+        _check_rank,
+        args=(_free_port(), chunk_size),
+        nprocs=WORLD_SIZE,
+    )
+
+
+def test_gather_with_grad_single_process():
+    x = torch.randn(4, 3)
+    assert gather_with_grad(x) is x
@@ -0,0 +1,70 @@
+import lightning as L
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+from ssl_tools.data.data_modules.features import (
+    FrozenBackboneDataModule,
+    data_module_fingerprint,
+)
+
+
+class _TensorDataModule(L.LightningDataModule):
+    def __init__(self, data_path, batch_size: int = 4):
+        super().__init__()
+        self.data_path = data_path
+        self.batch_size = batch_size
+        self.datasets = {}
+
+    def setup(self, stage: str):
+        generator = torch.Generator().manual_seed(0)
+        self.datasets["train"] = TensorDataset(
+            torch.randn(10, 3, generator=generator), torch.arange(10)
+        )
+
+    def _get_loader(self, split_name: str, shuffle: bool) -> DataLoader:
+        return DataLoader(
+            self.datasets[split_name],
+            batch_size=self.batch_size,
+            shuffle=shuffle,
+        )
+
+
+def test_fingerprint_ignores_non_data_files(tmp_path):
+    (tmp_path / "train").mkdir()
+    (tmp_path / "train" / "user-1.csv").write_text("x\n1\n")
+    data_module = _TensorDataModule(tmp_path)
+    fingerprint = data_module_fingerprint(data_module)
+    assert [f[0] for f in fingerprint["files"]] == [
+        f"{tmp_path.name}/train/user-1.csv"
+    ]
+
+    (tmp_path / ".train.lengths.json").write_text("{}")
+    (tmp_path / "train" / "notes.txt").write_text("notes")
+    (tmp_path / ".cache").mkdir()
+    (tmp_path / ".cache" / "data.npy").write_bytes(b"")
+    assert data_module_fingerprint(data_module) == fingerprint
+
+    (tmp_path / "train" / "user-2.csv").write_text("x\n1\n")
+    assert data_module_fingerprint(data_module) != fingerprint
+
+
+def test_frozen_backbone_cache(tmp_path):
+    data_module = _TensorDataModule(tmp_path / "data")
+    backbone = torch.nn.Linear(3, 2)
+    cache_dir = tmp_path / "cache"
+
+    frozen = FrozenBackboneDataModule(data_module, backbone, cache_dir)
+    frozen.setup("fit")
+    features, labels = frozen.datasets["train"].tensors
+    with torch.no_grad():
+        torch.testing.assert_close(
+            features, backbone(data_module.datasets["train"].tensors[0])
+        )
+    torch.testing.assert_close(labels, torch.arange(10))
+    # Only the complete cache entry is left
+    entries = [p for p in cache_dir.rglob("*") if p.name.startswith(".")]
+    assert entries == []
+
+    cached = FrozenBackboneDataModule(data_module, backbone, cache_dir)
+    cached.setup("fit")
+    torch.testing.assert_close(cached.datasets["train"].tensors[0], features)
@@ -0,0 +1,159 @@
+import numpy as np
+import pytest
+import torch
+
+from ssl_tools.losses.nxtent import NTXentLoss_poly, NTXentQueueLoss
+
+
+def _reference_ntxent_poly(
+    zis: torch.Tensor,
+    zjs: torch.Tensor,
+    temperature: float = 0.2,
+    use_cosine_similarity: bool = True,
+) -> torch.Tensor:
+    """The NT-Xent poly loss as originally written (with the explicit
+    (2B, 2B) similarity matrix, the gathered negatives and the one-hot
+    label). The only change is the explicit number of negatives in the
+    ``view``, so that B=1 (no negatives) works."""
+    batch_size = zis.shape[0]
+    diag = np.eye(2 * batch_size)
+    l1 = np.eye((2 * batch_size), 2 * batch_size, k=-batch_size)
+    l2 = np.eye((2 * batch_size), 2 * batch_size, k=batch_size)
+    mask = (1 - torch.from_numpy(diag + l1 + l2)).type(torch.bool)
+
+    representations = torch.cat([zjs, zis], dim=0)
+    if use_cosine_similarity:
+        similarity_matrix = torch.nn.CosineSimilarity(dim=-1)(
+            representations.unsqueeze(1), representations.unsqueeze(0)
+        )
+    else:
+        similarity_matrix = torch.tensordot(
+            representations.unsqueeze(1),
+            representations.T.unsqueeze(0),
+            dims=2,
+        )
+
+    l_pos = torch.diag(similarity_matrix, batch_size)
+    r_pos = torch.diag(similarity_matrix, -batch_size)
+    positives = torch.cat([l_pos, r_pos]).view(2 * batch_size, 1)
+    negatives = similarity_matrix[mask].view(
+        2 * batch_size, 2 * batch_size - 2
+    )
+
+    logits = torch.cat((positives, negatives), dim=1)
+    logits /= temperature
+
+    labels = torch.zeros(2 * batch_size).long()
+    CE = torch.nn.CrossEntropyLoss(reduction="sum")(logits, labels)
+
+    onehot_label = torch.cat(
+        (
+            torch.ones(2 * batch_size, 1),
+            torch.zeros(2 * batch_size, negatives.shape[-1]),
+        ),
+        dim=-1,
+    ).long()
+    pt = torch.mean(onehot_label * torch.nn.functional.softmax(logits, dim=-1))
+
+    epsilon = batch_size
+    return CE / (2 * batch_size) + epsilon * (1 / batch_size - pt)
+
+
+def _views(batch_size: int, embedding_size: int = 16, seed: int = 0):
+    generator = torch.Generator().manual_seed(seed)
+    return torch.randn(
+        2, batch_size, embedding_size, generator=generator, dtype=torch.float64
+    )
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 7, 32])
+@pytest.mark.parametrize("use_cosine_similarity", [True, False])
+@pytest.mark.parametrize("chunk_size", [None, 3])
+def test_ntxent_poly_matches_reference(
+    batch_size, use_cosine_similarity, chunk_size
+):
+    zis, zjs = _views(batch_size)
+    zis.requires_grad_()
+    zjs.requires_grad_()
+    # Dot products of random vectors are large, thus a higher temperature
+    temperature = 0.2 if use_cosine_similarity else 10.0
+
+    loss = NTXentLoss_poly(
+        temperature=temperature,
+        use_cosine_similarity=use_cosine_similarity,
+        chunk_size=chunk_size,
+    )(zis, zjs)
+    grad_zis, grad_zjs = torch.autograd.grad(loss, [zis, zjs])
+
+    reference = _reference_ntxent_poly(
+        zis,
+        zjs,
+        temperature=temperature,
+        use_cosine_similarity=use_cosine_similarity,
+    )
+    reference_zis, reference_zjs = torch.autograd.grad(reference, [zis, zjs])
+
+    torch.testing.assert_close(loss, reference, rtol=1e-12, atol=1e-12)
+    torch.testing.assert_close(grad_zis, reference_zis, rtol=1e-10, atol=1e-12)
+    torch.testing.assert_close(grad_zjs, reference_zjs, rtol=1e-10, atol=1e-12)
+
+
+def test_ntxent_queue_fills_and_wraps_fifo():
+    loss = NTXentQueueLoss(queue_size=5, use_cosine_similarity=False)
+    first, second = _views(2, seed=1), _views(2, seed=2)
+    # The queue stores the 2B representations, as cat([zjs, zis])
+    first_representations = torch.cat([first[1], first[0]])
+    second_representations = torch.cat([second[1], second[0]])
+
+    loss(*first)
+    assert loss._queue_length == 4
+    torch.testing.assert_close(loss.queue[:4], first_representations)
+
+    loss(*second)
+    assert loss._queue_length == 5
+    # The oldest 3 are replaced, wrapping around the end of the queue
+    expected = torch.cat(
+        [
+            second_representations[1:4],
+            first_representations[3:4],
+            second_representations[0:1],
+        ]
+    )
+    torch.testing.assert_close(loss.queue, expected)
+
+
+def test_ntxent_queue_entries_are_detached():
+    loss = NTXentQueueLoss(queue_size=16)
+    first_zis, first_zjs = _views(4, seed=1)
+    first_zis.requires_grad_()
+    first_zjs.requires_grad_()
+    loss(first_zis, first_zjs)
+    assert not loss.queue.requires_grad
+
+    zis, zjs = _views(4, seed=2)
+    zis.requires_grad_()
+    value = loss(zis, zjs)
+    value.backward()
+    assert zis.grad is not None
+    assert first_zis.grad is None and first_zjs.grad is None
+
+
+def test_ntxent_queue_eval_mode_does_not_use_the_queue():
+    loss = NTXentQueueLoss(queue_size=16)
+    loss(*_views(4, seed=1))
+    queue = loss.queue.clone()
+
+    loss.eval()
+    zis, zjs = _views(4, seed=2)
+    torch.testing.assert_close(loss(zis, zjs), NTXentLoss_poly()(zis, zjs))
+    torch.testing.assert_close(loss.queue, queue)
+    assert loss._queue_length == 8
+
+
+@pytest.mark.parametrize("chunk_size", [None, 3])
+def test_ntxent_queue_empty_equals_ntxent_poly(chunk_size):
+    zis, zjs = _views(4)
+    loss = NTXentQueueLoss(queue_size=16, chunk_size=chunk_size)
+    torch.testing.assert_close(
+        loss(zis, zjs), NTXentLoss_poly(chunk_size=chunk_size)(zis, zjs)
+    )
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+import torch
+from torch.utils.data import DataLoader, Dataset
+
+from ssl_tools.utils.rng import RandomStateMixin, seed_worker
+
+
+class _RandomDataset(Dataset, RandomStateMixin):
+    """Each sample is a random number drawn from the dataset generator, and
+    the id of the worker that drew it."""
+
+    def __len__(self) -> int:
+        return 8
+
+    def __getitem__(self, idx: int):
+        worker_info = torch.utils.data.get_worker_info()
+        worker_id = worker_info.id if worker_info is not None else -1
+        return self.rng.random(), worker_id
+
+
+def _draw_epochs(num_epochs: int, **kwargs) -> list:
+    torch.manual_seed(0)
+    loader = DataLoader(
+        _RandomDataset(),
+        batch_size=2,
+        num_workers=2,
+        worker_init_fn=seed_worker,
+        **kwargs,
+    )
+    epochs = []
+    for _ in range(num_epochs):
+        values, workers = zip(*[batch for batch in loader])
+        epochs.append((torch.cat(values).numpy(), torch.cat(workers).numpy()))
+    return epochs
+
+
+@pytest.mark.parametrize("persistent_workers", [False, True])
+def test_seed_worker_workers_and_epochs_differ(persistent_workers):
+    epochs = _draw_epochs(2, persistent_workers=persistent_workers)
+    for values, workers in epochs:
+        assert set(workers) == {0, 1}
+    values = np.concatenate([values for values, _ in epochs])
+    assert len(np.unique(values)) == len(values)
+
+    # Reproducible if torch is seeded
+    again = _draw_epochs(2, persistent_workers=persistent_workers)
+    for (values, _), (other, _) in zip(epochs, again):
+        np.testing.assert_array_equal(values, other)
+
+
+def test_unseeded_state_depends_on_rank(monkeypatch):
+    draws = []
+    for rank in ["0", "1", "1"]:
+        monkeypatch.setenv("RANK", rank)
+        np.random.seed(0)
+        draws.append(_RandomDataset().rng.random())
+    assert draws[0] != draws[1]
+    assert draws[1] == draws[2]
@@ -0,0 +1,174 @@
+import numpy as np
+import pytest
+
+from ssl_tools.data.datasets.series_dataset import (
+    MultiModalSeriesCSVDataset,
+    SeriesFolderCSVDataset,
+    resolve_column_schema,
+)
+
+
+def _write_wide_csv(path, num_rows: int = 5, trailer: str = "") -> np.ndarray:
+    """A wide CSV with two channels of 3 time steps and a label column."""
+    data = np.arange(num_rows * 6, dtype=np.float32).reshape(num_rows, 2, 3)
+    columns = [f"{c}-{t}" for c in ["accel-x", "accel-y"] for t in range(3)]
+    lines = [",".join(columns + ["class"])]
+    for i, sample in enumerate(data):
+        lines.append(",".join([str(v) for v in sample.reshape(-1)] + [str(i)]))
+    path.write_text("\n".join(lines) + "\n" + trailer)
+    return data
+
+
+def test_multimodal_stream_blank_lines_with_cache(tmp_path):
+    csv_path = tmp_path / "data.csv"
+    expected = _write_wide_csv(csv_path, trailer="\n\n")
+
+    for _ in range(2):  # Write the cache, then load it
+        dataset = MultiModalSeriesCSVDataset(
+            csv_path,
+            label="class",
+            cache_dir=tmp_path / "cache",
+            chunk_size=2,
+        )
+        assert len(dataset) == len(expected)
+        np.testing.assert_array_equal(np.asarray(dataset.data), expected)
+        np.testing.assert_array_equal(dataset.labels, np.arange(len(expected)))
+
+    uncached = MultiModalSeriesCSVDataset(csv_path, label="class")
+    np.testing.assert_array_equal(uncached.data, expected)
+
+
+def test_resolve_column_schema_plain_columns():
+    schema = resolve_column_schema(["x", "y", "class", "z"], label="class")
+    assert schema["channels"] == ["x", "y", "z"]
+    assert schema["num_time_steps"] == 1
+    assert schema["positions"] == [[0], [1], [3]]
+
+    with pytest.raises(ValueError, match="different number of time steps"):
+        resolve_column_schema(["id", "accel-x-0", "accel-x-1"])
+    with pytest.raises(ValueError, match="both the time step 0"):
+        resolve_column_schema(["x", "x-0"])
+
+
+def test_resolve_column_schema_flat_selects_all_columns():
+    columns = (
+        [f"accel-x-{t}" for t in range(6)]
+        + ["user"]
+        + [f"accel-y-{t}" for t in range(6)]
+        + ["activity code"]
+    )
+    schema = resolve_column_schema(
+        columns, label="activity code", features_as_channels=False
+    )
+    assert schema["channels"] == columns[:-1]
+    assert schema["positions"] == [[i] for i in range(13)]
+
+    with pytest.raises(ValueError, match="different number of time steps"):
+        resolve_column_schema(columns, label="activity code")
+
+
+def test_resolve_column_schema_duplicates_of_unselected_channels():
+    columns = ["x-0", "x-1", "y", "y-0"]
+    schema = resolve_column_schema(columns, feature_prefixes=["x"])
+    assert schema["positions"] == [[0, 1]]
+
+    with pytest.raises(ValueError, match="both the time step 0 of y"):
+        resolve_column_schema(columns, feature_prefixes=["x", "y"])
+
+
+def test_multimodal_plain_columns(tmp_path):
+    csv_path = tmp_path / "data.csv"
+    csv_path.write_text("x,y,z,class\n1,2,3,0\n4,5,6,1\n")
+
+    dataset = MultiModalSeriesCSVDataset(
+        csv_path, label="class", features_as_channels=False
+    )
+    np.testing.assert_array_equal(dataset.data, [[1, 2, 3], [4, 5, 6]])
+    dataset = MultiModalSeriesCSVDataset(csv_path, label="class")
+    assert dataset[0][0].shape == (3, 1)
+
+
+@pytest.mark.parametrize(
+    "content, length",
+    [
+        ("x,y\n1,2\n3,4\n", 2),
+        ("x,y\n1,2\n3,4", 2),
+        ("x,y\r\n1,2\r\n3,4\r\n", 2),
+        ("x,y\n1,2\n\n3,4\n\n", 2),
+        ('x,y\n1,"2\n"\n3,4\n', 2),
+    ],
+)
+def test_folder_sample_lengths_lazy_and_eager(tmp_path, content, length):
+    data_path = tmp_path / "train"
+    data_path.mkdir()
+    (data_path / "sample-1.csv").write_text(content)
+    (data_path / "sample-2.csv").write_text("x,y\n1,2\n")
+
+    lazy = SeriesFolderCSVDataset(data_path, features=["x"], lazy=True)
+    eager = SeriesFolderCSVDataset(data_path, features=["x"])
+    assert lazy.sample_lengths == [length, 1]
+    assert eager.sample_lengths == lazy.sample_lengths
+    assert [lazy[i].shape[-1] for i in range(len(lazy))] == [length, 1]
+
+
+def test_folder_packed_labels_and_channels(tmp_path):
+    data_path = tmp_path / "train"
+    data_path.mkdir()
+    (data_path / "sample-1.csv").write_text("x,y,class\n1,2,0\n3,4,1\n")
+    (data_path / "sample-2.csv").write_text("x,class\n5,1\n")
+
+    dataset = SeriesFolderCSVDataset(data_path, features=["x"], label="class")
+    assert dataset._labels.shape == (3, 1)
+    data, label = dataset[0]
+    assert data.shape == (1, 2)
+    np.testing.assert_array_equal(label, [[0], [1]])
+
+    with pytest.raises(ValueError):
+        SeriesFolderCSVDataset(data_path, label="class")
+    lazy = SeriesFolderCSVDataset(data_path, label="class", lazy=True)
+    assert [lazy[i][0].shape for i in range(len(lazy))] == [(2, 2), (1, 1)]
+
+
+@pytest.mark.parametrize("labels", [["0", "1", "1"], ["a", "b", "b"]])
+def test_folder_cache_round_trip(tmp_path, labels):
+    data_path = tmp_path / "train"
+    data_path.mkdir()
+    (data_path / "sample-1.csv").write_text(
+        f"x,y,class\n1,2,{labels[0]}\n3,4,{labels[1]}\n"
+    )
+    (data_path / "sample-2.csv").write_text(f"x,y,class\n5,6,{labels[2]}\n")
+
+    uncached = SeriesFolderCSVDataset(data_path, label="class")
+    for _ in range(2):  # Write the cache, then load it
+        cached = SeriesFolderCSVDataset(
+            data_path, label="class", cache_dir=tmp_path / "cache"
+        )
+        cache_path = cached._get_cache_path()
+        assert (cache_path / "index.json").exists()
+        np.testing.assert_array_equal(cached._offsets, uncached._offsets)
+        for i in range(len(uncached)):
+            for x, y in zip(cached[i], uncached[i]):
+                np.testing.assert_array_equal(x, y)
+    # The data is memory-mapped from the cache entry
+    assert isinstance(cached._data, np.memmap)
+    assert sorted(p.name for p in cache_path.iterdir()) == [
+        "data.npy",
+        "index.json",
+        "labels.npy",
+        "offsets.npy",
+    ]
+
+
+def test_multimodal_flat_mixed_columns(tmp_path):
+    csv_path = tmp_path / "data.csv"
+    columns = ["accel-x-0", "accel-x-1", "user", "accel-y-0", "accel-y-1"]
+    csv_path.write_text(
+        ",".join(columns + ["class"]) + "\n1,2,3,4,5,0\n6,7,8,9,10,1\n"
+    )
+
+    dataset = MultiModalSeriesCSVDataset(
+        csv_path, label="class", features_as_channels=False
+    )
+    np.testing.assert_array_equal(
+        dataset.data, [[1, 2, 3, 4, 5], [6, 7, 8, 9, 10]]
+    )
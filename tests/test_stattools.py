@@ -0,0 +1,128 @@
+import math
+import warnings
+
+import numpy as np
+import pytest
+from statsmodels.tsa.stattools import adfuller
+
+from ssl_tools.data.datasets.tnc import compute_epsilons
+from ssl_tools.utils.stattools import adfuller_batch
+
+
+def _series(length: int, num_series: int = 60, seed: int = 0) -> np.ndarray:
+    """Random walks, white noises and noisy sinusoids of the same length."""
+    rng = np.random.default_rng(seed)
+    n = num_series // 3
+    t = np.arange(length)
+    return np.concatenate(
+        [
+            np.cumsum(rng.normal(size=(n, length)), axis=-1),
+            rng.normal(size=(n, length)),
+            np.sin(t / rng.uniform(2, 20, size=(num_series - 2 * n, 1)))
+            + 0.1 * rng.normal(size=(num_series - 2 * n, length)),
+        ]
+    )
+
+
+def _reference(x: np.ndarray, **kwargs) -> list:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return [adfuller(series, **kwargs) for series in x]
+
+
+def _assert_same(result: tuple, reference: list):
+    adfstat, pvalue, usedlag, nobs = result
+    np.testing.assert_array_equal(usedlag, [r[2] for r in reference])
+    np.testing.assert_array_equal(nobs, [r[3] for r in reference])
+    np.testing.assert_allclose(
+        adfstat, [r[0] for r in reference], rtol=1e-9, atol=1e-9
+    )
+    np.testing.assert_allclose(
+        pvalue, [r[1] for r in reference], rtol=0, atol=1e-9
+    )
+
+
+# Short lengths are the ones where the default maxlag is capped at
+# ``nobs // 2 - 2``
+@pytest.mark.parametrize("length", list(range(4, 41)) + [60, 120, 180])
+def test_adfuller_batch_autolag(length):
+    x = _series(length)
+    _assert_same(adfuller_batch(x), _reference(x))
+
+
+@pytest.mark.parametrize("length, maxlag", [(8, 0), (12, 3), (30, 5), (60, 1)])
+def test_adfuller_batch_maxlag(length, maxlag):
+    x = _series(length)
+    _assert_same(
+        adfuller_batch(x, maxlag=maxlag), _reference(x, maxlag=maxlag)
+    )
+
+
+@pytest.mark.parametrize("length", [2, 3])
+def test_adfuller_batch_too_short(length):
+    x = _series(length)
+    with pytest.raises(ValueError):
+        adfuller(x[0])
+    with pytest.raises(AssertionError):
+        adfuller_batch(x)
+
+
+def test_adfuller_batch_constant_series():
+    x = _series(30)
+    x[[0, 25, 50]] = 3.0
+    adfstat, pvalue, _, _ = adfuller_batch(x)
+    for i in [0, 25, 50]:
+        with pytest.raises(ValueError):
+            adfuller(x[i])
+        assert np.isnan(adfstat[i]) and np.isnan(pvalue[i])
+    valid = np.setdiff1d(np.arange(len(x)), [0, 25, 50])
+    _, pvalue_valid, _, _ = adfuller_batch(x[valid])
+    np.testing.assert_array_equal(pvalue[valid], pvalue_valid)
+    _assert_same(adfuller_batch(x[valid]), _reference(x[valid]))
+
+
+def _reference_epsilon(data, t, window_size, significance_level):
+    """The neighbourhood size of TNC, with one ``adfuller`` call per window
+    and feature."""
+    num_features, time_len = data.shape
+    corr = []
+    for wsize in range(window_size, 4 * window_size, window_size):
+        try:
+            p_val_sum = 0
+            for feat_idx in range(num_features):
+                window = data[
+                    feat_idx, max(0, t - wsize) : min(time_len, t + wsize)
+                ]
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    p_val = adfuller(window)[1]
+                p_val_sum += significance_level if math.isnan(p_val) else p_val
+            corr.append(p_val_sum / num_features)
+        except ValueError:
+            corr.append(0.6)
+    not_stationary = np.flatnonzero(np.array(corr) >= significance_level)
+    return len(corr) if len(not_stationary) == 0 else not_stationary[0] + 1
+
+
+@pytest.mark.parametrize("window_size", [2, 3, 5, 8, 20])
+def test_compute_epsilons(window_size):
+    rng = np.random.default_rng(window_size)
+    time_len = 12 * window_size
+    data = np.stack(
+        [
+            np.cumsum(rng.normal(size=time_len)),
+            rng.normal(size=time_len),
+            np.sin(np.arange(time_len) / 3) + 0.1 * rng.normal(size=time_len),
+        ]
+    )
+    data[1, : 2 * window_size] = 1.0
+    time_steps = np.arange(time_len)
+    for significance_level in [0.01, 0.05, 0.5]:
+        expected = [
+            _reference_epsilon(data, t, window_size, significance_level)
+            for t in time_steps
+        ]
+        np.testing.assert_array_equal(
+            compute_epsilons(data, time_steps, window_size, significance_level),
+            expected,
+        )
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+import torch
+from scipy.ndimage import gaussian_filter1d
+
+from ssl_tools.transforms.time_1d import (
+    AddGaussianNoise,
+    RandomSmoothing,
+    Rotate,
+    Scale,
+    TimeAmplitudeModulation,
+    _random_uniform,
+    _sample_shape,
+)
+
+
+def _sample(shape, as_tensor: bool, seed: int = 0):
+    sample = np.random.default_rng(seed).normal(size=shape)
+    return torch.from_numpy(sample) if as_tensor else sample
+
+
+def _to_numpy(x) -> np.ndarray:
+    return x.numpy() if isinstance(x, torch.Tensor) else x
+
+
+@pytest.mark.parametrize("as_tensor", [False, True])
+@pytest.mark.parametrize(
+    "shape, sigma_range",
+    [
+        ((3, 50), (1.0, 1.0)),
+        ((3, 5), (3.7, 3.7)),
+        ((4, 3, 50), (0.5, 4.0)),
+        ((4, 2, 5), (0.5, 4.0)),
+    ],
+)
+def test_random_smoothing_matches_scipy(as_tensor, shape, sigma_range):
+    sample = _sample(shape, as_tensor)
+    transform = RandomSmoothing(sigma_range=sigma_range)
+    transform.reseed(0)
+    # A transform with the same seed draws the same sigmas
+    twin = RandomSmoothing(sigma_range=sigma_range)
+    twin.reseed(0)
+    sigmas = _to_numpy(
+        _random_uniform(
+            twin, sample, *sigma_range, size=_sample_shape(sample)
+        )
+    ).reshape(-1)
+
+    smoothed = transform(sample)
+    assert type(smoothed) is type(sample)
+    assert smoothed.shape == sample.shape
+
+    samples = _to_numpy(sample).reshape((-1,) + tuple(shape[-2:]))
+    expected = np.stack(
+        [
+            gaussian_filter1d(x, sigma, axis=-1, mode="reflect")
+            for x, sigma in zip(samples, sigmas)
+        ]
+    ).reshape(shape)
+    np.testing.assert_allclose(
+        _to_numpy(smoothed), expected, rtol=1e-12, atol=1e-12
+    )
+
+
+@pytest.mark.parametrize("as_tensor", [False, True])
+@pytest.mark.parametrize(
+    "transform",
+    [
+        Scale(),
+        AddGaussianNoise(),
+        Rotate(),
+        TimeAmplitudeModulation(),
+        RandomSmoothing(sigma_range=(0.5, 4.0)),
+    ],
+    ids=lambda transform: type(transform).__name__,
+)
+def test_batch_samples_have_their_own_draws(as_tensor, transform):
+    transform.reseed(0)
+    # The same sample repeated, thus outputs differ only by the draws
+    sample = np.broadcast_to(_sample((2, 30), False), (8, 2, 30)).copy()
+    if as_tensor:
+        sample = torch.from_numpy(sample)
+
+    output = _to_numpy(transform(sample))
+    assert output.shape == (8, 2, 30)
+    for i in range(len(output)):
+        for j in range(i + 1, len(output)):
+            assert not np.allclose(output[i], output[j])